@@ -108,6 +108,14 @@ sleep 10
 echo '🔄 Running database migrations...'
 docker-compose -f docker-compose.prod.yml exec -T web python manage.py migrate
 
+# Cache table, only used with CACHE_BACKEND=db (the default is the file cache)
+docker-compose -f docker-compose.prod.yml exec -T web python manage.py createcachetable
+
+# Backfill/repair analytics rollups if they drifted from the assessments
+echo '📊 Verifying entrustment rollups...'
+docker-compose -f docker-compose.prod.yml exec -T web python manage.py rebuild_entrustment_rollups --verify || \
+    docker-compose -f docker-compose.prod.yml exec -T web python manage.py rebuild_entrustment_rollups
+
 # Collect static files
 echo '📦 Collecting static files...'
 docker-compose -f docker-compose.prod.yml exec -T web python manage.py collectstatic --noinput
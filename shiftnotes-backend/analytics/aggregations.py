@@ -0,0 +1,396 @@
+"""
+Set-based aggregation helpers for the analytics dashboards.
+
+Every function here answers one section of a dashboard with a fixed number of
+grouped queries (conditional aggregates plus GROUP BY trainee/cohort/day), so
+the number of round trips does not grow with trainees, competencies or months.
+
+Counts and averages are read from the entrustment rollup tables
+(analytics.models), so the cost of a dashboard scales with the number of
+distinct trainee-EPA-days rather than with raw assessment volume. Both rollup
+models share the program/trainee/day/status fields, so one scope Q object
+filters either of them.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, F, Max, Q, Sum
+
+from curriculum.models import CoreCompetency, SubCompetency, SubCompetencyEPA
+from users.models import User, Cohort
+from .models import TraineeDayRollup, TraineeEPADayRollup
+
+ENTRUSTMENT_LEVELS = range(1, 6)  # Entrustment levels are 1-5
+
+
+def rollup_scope(program, start_date=None, end_date=None, cohort_id=None, trainee_id=None, statuses=None):
+    """
+    Build a filter that applies to both rollup models.
+
+    Args:
+        program: Program whose trainees are reported on
+        start_date, end_date: Optional inclusive shift date bounds
+        cohort_id: Optional cohort of the trainees
+        trainee_id: Optional single trainee
+        statuses: Optional list of assessment statuses (all statuses when None)
+    """
+    scope = Q(program=program)
+    if start_date:
+        scope &= Q(day__gte=start_date)
+    if end_date:
+        scope &= Q(day__lte=end_date)
+    if cohort_id:
+        scope &= Q(trainee__cohort_id=cohort_id)
+    if trainee_id:
+        scope &= Q(trainee_id=trainee_id)
+    if statuses:
+        scope &= Q(status__in=statuses)
+    return scope
+
+
+def entrustment_totals(filter=None):
+    """
+    Aggregate expressions for the number and sum of entrustment ratings.
+
+    Averages are computed from these totals rather than with Avg() so that
+    grouped rows can be combined in Python without losing precision.
+    """
+    return {
+        'rating_count': Sum('rating_count', filter=filter),
+        'level_sum': Sum('level_sum', filter=filter),
+    }
+
+
+def average(level_sum, rating_count):
+    """Average entrustment level from summed totals (None when nothing was rated)"""
+    if not rating_count:
+        return None
+    return (level_sum or 0) / rating_count
+
+
+def milestone_level(average_entrustment):
+    """Round an average entrustment level to the nearest 0.5 milestone, clamped to 1.0-5.0"""
+    if not average_entrustment:
+        return None
+    return min(5.0, max(1.0, round(average_entrustment * 2) / 2))
+
+
+def assessment_count(scope):
+    """Total number of assessments in scope"""
+    return TraineeDayRollup.objects.filter(scope).aggregate(
+        assessment_count=Sum('assessment_count')
+    )['assessment_count'] or 0
+
+
+def rating_average(scope):
+    """Average entrustment level over every rating in scope"""
+    totals = TraineeEPADayRollup.objects.filter(scope).aggregate(**entrustment_totals())
+    return average(totals['level_sum'], totals['rating_count'])
+
+
+def summarize_assessments(scope):
+    """Headline metrics and milestone distribution in two aggregate queries"""
+    totals = TraineeEPADayRollup.objects.filter(scope).aggregate(
+        **entrustment_totals(),
+        **{f'level_{level}': Sum(f'level_{level}_count') for level in ENTRUSTMENT_LEVELS}
+    )
+
+    return {
+        'assessment_count': assessment_count(scope),
+        'average_entrustment': average(totals['level_sum'], totals['rating_count']),
+        'milestone_distribution': {
+            f'level_{level}': totals[f'level_{level}'] or 0 for level in ENTRUSTMENT_LEVELS
+        },
+    }
+
+
+def trainee_stats(scope, trainee_ids):
+    """
+    Per-trainee assessment count, latest assessment and rating totals within a scope.
+
+    Returns:
+        dict: trainee id -> {'assessment_count', 'last_created_at', 'rating_count', 'level_sum'}
+    """
+    stats = defaultdict(lambda: {
+        'assessment_count': 0, 'last_created_at': None, 'rating_count': 0, 'level_sum': 0
+    })
+
+    day_rows = TraineeDayRollup.objects.filter(scope, trainee_id__in=trainee_ids).order_by().values('trainee_id').annotate(
+        assessment_count=Sum('assessment_count'),
+        last_created_at=Max('last_created_at')
+    )
+    for row in day_rows:
+        stats[row['trainee_id']].update(
+            assessment_count=row['assessment_count'],
+            last_created_at=row['last_created_at']
+        )
+
+    epa_rows = TraineeEPADayRollup.objects.filter(scope, trainee_id__in=trainee_ids).order_by().values('trainee_id').annotate(
+        **entrustment_totals()
+    )
+    for row in epa_rows:
+        stats[row['trainee_id']].update(
+            rating_count=row['rating_count'],
+            level_sum=row['level_sum']
+        )
+
+    return stats
+
+
+def lifetime_assessment_counts(trainee_ids, statuses=None):
+    """All-time assessment counts per trainee, regardless of date or program"""
+    rollups = TraineeDayRollup.objects.filter(trainee_id__in=trainee_ids)
+    if statuses:
+        rollups = rollups.filter(status__in=statuses)
+    return dict(
+        rollups.order_by().values('trainee_id').annotate(
+            assessment_count=Sum('assessment_count')
+        ).values_list('trainee_id', 'assessment_count')
+    )
+
+
+def trainee_breakdown(scope, trainees):
+    """
+    Per-trainee assessment counts, averages and latest assessment.
+
+    Args:
+        scope: Rollup filter for the reporting period (see rollup_scope)
+        trainees: User queryset of the trainees to report on
+
+    Returns:
+        list: One dict per trainee, in the order of the trainees queryset
+    """
+    trainees = list(trainees.values('id', 'name', 'department'))
+    trainee_ids = [trainee['id'] for trainee in trainees]
+
+    period_stats = trainee_stats(scope, trainee_ids)
+    lifetime_counts = lifetime_assessment_counts(trainee_ids)
+
+    breakdown = []
+    for trainee in trainees:
+        stats = period_stats[trainee['id']]
+        trainee_avg = average(stats['level_sum'], stats['rating_count']) or 0
+        last_created_at = stats['last_created_at']
+
+        breakdown.append({
+            'id': str(trainee['id']),
+            'name': trainee['name'],
+            'department': trainee['department'] or 'Not specified',
+            'assessments_in_period': stats['assessment_count'],
+            'total_assessments': lifetime_counts.get(trainee['id'], 0),
+            'average_competency_level': round(trainee_avg, 2),
+            'is_active': stats['assessment_count'] > 0,
+            'last_assessment_date': last_created_at.isoformat() if last_created_at else None
+        })
+
+    return breakdown
+
+
+def competency_breakdown(program, scope, assessments):
+    """
+    Assessment counts and averages per core competency.
+
+    Averages come from one conditional aggregate per competency over the EPA
+    rollup. The number of distinct assessments touching a competency cannot be
+    derived from per-EPA totals, so it is counted over the assessments
+    queryset, again in a single conditional aggregate query.
+    """
+    competencies = list(CoreCompetency.objects.filter(program=program))
+
+    epas_by_competency = defaultdict(set)
+    mappings = SubCompetencyEPA.objects.filter(
+        sub_competency__core_competency__program=program
+    ).values_list('sub_competency__core_competency_id', 'epa_id')
+    for competency_id, epa_id in mappings:
+        epas_by_competency[competency_id].add(epa_id)
+
+    rating_aggregates = {}
+    assessment_aggregates = {}
+    for index, competency in enumerate(competencies):
+        epa_ids = epas_by_competency.get(competency.id)
+        if not epa_ids:
+            continue
+        rating_aggregates.update({
+            f'{name}_{index}': expression
+            for name, expression in entrustment_totals(filter=Q(epa_id__in=epa_ids)).items()
+        })
+        assessment_aggregates[f'assessments_{index}'] = Count(
+            'id', distinct=True, filter=Q(assessment_epas__epa_id__in=epa_ids)
+        )
+
+    totals = {}
+    if rating_aggregates:
+        totals.update(TraineeEPADayRollup.objects.filter(scope).aggregate(**rating_aggregates))
+        totals.update(assessments.order_by().aggregate(**assessment_aggregates))
+
+    breakdown = []
+    for index, competency in enumerate(competencies):
+        avg_level = average(totals.get(f'level_sum_{index}'), totals.get(f'rating_count_{index}')) or 0
+        breakdown.append({
+            'id': str(competency.id),
+            'name': competency.title,
+            'total_assessments': totals.get(f'assessments_{index}', 0),
+            'average_competency_level': round(avg_level, 2)
+        })
+
+    return breakdown
+
+
+def competency_grid(program, scope):
+    """
+    Average entrustment per sub-competency for the ratings in scope.
+
+    One join of the EPA rollup to sub_competency_epas, grouped by
+    sub-competency, yields every average and rating count; only EPAs that
+    belong to the program are counted, matching the EPA mapping shown in the
+    curriculum screens.
+
+    Returns:
+        list: One dict per core competency (ordered by code) with
+            'competency' and 'sub_competencies'; each sub-competency entry has
+            'sub_competency', 'average_entrustment', 'milestone_level',
+            'rating_count' and 'mapped_epas_count'
+    """
+    competencies = list(CoreCompetency.objects.filter(program=program).order_by('code'))
+
+    subcompetencies = SubCompetency.objects.filter(
+        core_competency__program=program
+    ).annotate(
+        mapped_epas_count=Count('sub_competency_epas', filter=Q(sub_competency_epas__epa__program=program))
+    ).order_by('code')
+
+    rating_rows = TraineeEPADayRollup.objects.filter(
+        scope,
+        epa__program=program,
+        epa__sub_competency_epas__isnull=False
+    ).order_by().values(
+        sub_competency_id=F('epa__sub_competency_epas__sub_competency_id')
+    ).annotate(**entrustment_totals())
+    ratings = {row['sub_competency_id']: row for row in rating_rows}
+
+    subcompetencies_by_competency = defaultdict(list)
+    for subcompetency in subcompetencies:
+        totals = ratings.get(subcompetency.id, {})
+        avg_entrustment = average(totals.get('level_sum'), totals.get('rating_count'))
+        subcompetencies_by_competency[subcompetency.core_competency_id].append({
+            'sub_competency': subcompetency,
+            'average_entrustment': avg_entrustment,
+            'milestone_level': milestone_level(avg_entrustment),
+            'rating_count': totals.get('rating_count') or 0,
+            'mapped_epas_count': subcompetency.mapped_epas_count,
+        })
+
+    return [
+        {
+            'competency': competency,
+            'sub_competencies': subcompetencies_by_competency[competency.id],
+        }
+        for competency in competencies
+    ]
+
+
+def cohort_breakdown(program, scope, cohort_id=None):
+    """Calculate average entrustment level by cohort for the given program and scope"""
+    cohorts = Cohort.objects.filter(program=program).order_by('-start_date')
+    if cohort_id:
+        cohorts = cohorts.filter(id=cohort_id)
+    cohorts = list(cohorts)
+    cohort_ids = [cohort.id for cohort in cohorts]
+
+    assessment_counts = dict(
+        TraineeDayRollup.objects.filter(scope, trainee__cohort_id__in=cohort_ids).order_by().values(
+            'trainee__cohort_id'
+        ).annotate(
+            assessment_count=Sum('assessment_count')
+        ).values_list('trainee__cohort_id', 'assessment_count')
+    )
+
+    rating_rows = TraineeEPADayRollup.objects.filter(scope, trainee__cohort_id__in=cohort_ids).order_by().values(
+        'trainee__cohort_id'
+    ).annotate(**entrustment_totals())
+    rating_totals = {row['trainee__cohort_id']: row for row in rating_rows}
+
+    trainee_counts = dict(
+        User.objects.filter(
+            role='trainee',
+            program=program,
+            cohort_id__in=cohort_ids
+        ).order_by().values('cohort_id').annotate(
+            trainee_count=Count('id')
+        ).values_list('cohort_id', 'trainee_count')
+    )
+
+    breakdown = []
+    for cohort in cohorts:
+        ratings = rating_totals.get(cohort.id, {})
+        avg_entrustment = average(ratings.get('level_sum'), ratings.get('rating_count'))
+        breakdown.append({
+            'id': str(cohort.id),
+            'name': cohort.name,
+            'start_date': cohort.start_date.isoformat() if cohort.start_date else None,
+            'trainee_count': trainee_counts.get(cohort.id, 0),
+            'assessment_count': assessment_counts.get(cohort.id, 0),
+            'average_entrustment_level': round(avg_entrustment, 2) if avg_entrustment else None
+        })
+
+    return breakdown
+
+
+def monthly_trends(scope, end_date, months):
+    """
+    Assessment volume and average entrustment for consecutive 30-day windows.
+
+    Rows are grouped by shift date in the database and folded into windows
+    here, which keeps the query independent of the number of months.
+
+    Returns:
+        tuple: (monthly_assessments, monthly_entrustment), oldest window first
+    """
+    windows = [
+        {'assessment_count': 0, 'rating_count': 0, 'level_sum': 0}
+        for _ in range(months)
+    ]
+    last_day = end_date.date()
+
+    def window_index(day):
+        # Window i covers [end - (i+1)*30 days, end - i*30 days)
+        days_back = (last_day - day).days
+        if days_back < 1:
+            return None
+        index = (days_back - 1) // 30
+        return index if index < months else None
+
+    day_rows = TraineeDayRollup.objects.filter(scope).order_by().values('day').annotate(
+        assessment_count=Sum('assessment_count')
+    )
+    for row in day_rows:
+        index = window_index(row['day'])
+        if index is not None:
+            windows[index]['assessment_count'] += row['assessment_count']
+
+    rating_rows = TraineeEPADayRollup.objects.filter(scope).order_by().values('day').annotate(
+        **entrustment_totals()
+    )
+    for row in rating_rows:
+        index = window_index(row['day'])
+        if index is not None:
+            windows[index]['rating_count'] += row['rating_count']
+            windows[index]['level_sum'] += row['level_sum']
+
+    monthly_assessments = []
+    monthly_entrustment = []
+    for index in reversed(range(months)):  # Show oldest to newest
+        window = windows[index]
+        label = (end_date - timedelta(days=(index + 1) * 30)).strftime('%b %Y')
+        window_avg = average(window['level_sum'], window['rating_count']) or 0
+
+        monthly_assessments.append({
+            'month': label,
+            'assessments': window['assessment_count']
+        })
+        monthly_entrustment.append({
+            'month': label,
+            'average_entrustment': round(window_avg, 2)
+        })
+
+    return monthly_assessments, monthly_entrustment
@@ -0,0 +1,103 @@
+"""
+Management command that compares JSON encoding speed of the stdlib encoders
+with api.renderers.dumps on representative response payloads.
+
+Payloads are synthetic (no database needed): an analytics response shaped like
+program_performance_data and an unpaginated user list like UserViewSet's.
+
+Usage:
+    python manage.py benchmark_json
+    python manage.py benchmark_json --rows 5000 --repeat 20
+"""
+
+import json
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.renderers import dumps, orjson
+
+
+def analytics_payload(rows):
+    start = date(2025, 1, 1)
+    return {
+        'program': str(uuid.uuid4()),
+        'generated_at': datetime.now(dt_timezone.utc),
+        'trainees': [
+            {
+                'id': uuid.uuid4(),
+                'name': f'Trainee {index}',
+                'cohort': f'PGY-{index % 3 + 1}',
+                'assessment_count': index % 40,
+                'average_entrustment': Decimal('3.25') + index % 2,
+                'last_assessment': start + timedelta(days=index % 365),
+                'monthly': [
+                    {'month': f'2025-{month:02d}', 'count': (index + month) % 9, 'average': 2.5 + month / 10}
+                    for month in range(1, 7)
+                ],
+            }
+            for index in range(rows)
+        ],
+    }
+
+
+def user_list_payload(rows):
+    created = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'email': f'user{index}@example.org',
+            'name': f'User {index}',
+            'role': ['trainee', 'faculty', 'leadership'][index % 3],
+            'organization': str(uuid.uuid4()),
+            'program': str(uuid.uuid4()),
+            'cohort': None,
+            'is_active': True,
+            'created_at': (created + timedelta(hours=index)).isoformat(),
+        }
+        for index in range(rows)
+    ]
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare stdlib JSON encoding with the fast API encoder on representative payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Trainees/users per payload (default: 2000)')
+        parser.add_argument('--repeat', type=int, default=10, help='Runs per encoder; the best is reported (default: 10)')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        self.stdout.write(f'Encoder: {"orjson " + orjson.__version__ if orjson else "stdlib json (orjson not installed)"}')
+
+        cases = [
+            ('Analytics JsonResponse', analytics_payload(rows), DjangoJSONEncoder),
+            ('UserViewSet list (DRF)', user_list_payload(rows), JSONEncoder),
+        ]
+        for label, payload, encoder_class in cases:
+            stdlib = best_time(
+                lambda: json.dumps(payload, cls=encoder_class, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                repeat
+            )
+            fast = best_time(lambda: dumps(payload, encoder_class), repeat)
+            size_kb = len(dumps(payload, encoder_class)) / 1024
+            self.stdout.write(
+                f'{label}: {size_kb:,.0f} KB  stdlib {stdlib * 1000:.1f} ms  fast {fast * 1000:.1f} ms  '
+                f'({stdlib / fast:.1f}x)'
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete'))
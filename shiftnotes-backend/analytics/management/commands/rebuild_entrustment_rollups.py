@@ -0,0 +1,49 @@
+"""
+Management command to rebuild and verify the entrustment rollup tables.
+
+Usage:
+    python manage.py rebuild_entrustment_rollups
+    python manage.py rebuild_entrustment_rollups --verify
+    python manage.py rebuild_entrustment_rollups --program <program_id>
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Program
+from analytics.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the entrustment rollup tables from assessments, or verify them with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--program',
+            help='Only rebuild/verify rollups for this program ID'
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare the rollups with the assessments without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        program = None
+        if options['program']:
+            try:
+                program = Program.objects.get(id=options['program'])
+            except (Program.DoesNotExist, ValueError):
+                raise CommandError(f'Program {options["program"]} not found')
+
+        if options['verify']:
+            problems = verify_rollups(program)
+            for problem in problems:
+                self.stdout.write(self.style.WARNING(problem))
+            if problems:
+                raise CommandError(f'{len(problems)} rollup bucket(s) out of date. Run without --verify to rebuild.')
+            self.stdout.write(self.style.SUCCESS('✅ Entrustment rollups match assessments'))
+            return
+
+        day_rows, epa_day_rows = rebuild_rollups(program)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt entrustment rollups: {day_rows} trainee-day rows, {epa_day_rows} trainee-EPA-day rows'
+        ))
@@ -0,0 +1,151 @@
+"""
+Program-wide trainee x sub-competency matrix.
+
+Ratings are loaded once, as a sparse trainee x EPA matrix of entrustment sums
+(S) and counts (C), from a single grouped query over the EPA rollup. The
+EPA x sub-competency incidence matrix (M) comes from SubCompetencyEPA. Every
+cell average is then (S . M) / (C . M), computed for the whole program in one
+pass instead of one query per trainee and sub-competency.
+
+Matrices are stored sparsely as {row: {column: value}}; a program has a few
+dozen EPAs and sub-competencies, so plain dictionaries are as fast as an
+array library here and add no dependency.
+"""
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from curriculum.models import SubCompetency, SubCompetencyEPA
+from .aggregations import average, milestone_level
+from .models import TraineeEPADayRollup
+
+
+def sparse_matmul(left, right):
+    """Multiply two sparse matrices stored as {row: {column: value}}"""
+    product = {}
+    for row, entries in left.items():
+        cells = defaultdict(int)
+        for inner, value in entries.items():
+            for column, weight in right.get(inner, {}).items():
+                cells[column] += value * weight
+        if cells:
+            product[row] = dict(cells)
+    return product
+
+
+class CompetencyMatrix:
+    """
+    Average entrustment for every trainee and sub-competency of a program.
+
+    Build with CompetencyMatrix.for_program(); rows follow the order of the
+    trainees passed in and columns follow sub-competency code order within
+    core competency code order.
+    """
+
+    def __init__(self, trainees, sub_competencies, sums, counts):
+        self.trainees = trainees
+        self.sub_competencies = sub_competencies
+        self.sums = sums
+        self.counts = counts
+
+    @classmethod
+    def for_program(cls, program, scope, trainees):
+        """
+        Args:
+            program: Program whose curriculum defines the columns
+            scope: Rollup filter selecting the ratings (see aggregations.rollup_scope)
+            trainees: Iterable of trainee Users, one row each
+        """
+        trainees = list(trainees)
+        trainee_ids = [trainee.id for trainee in trainees]
+
+        sub_competencies = list(
+            SubCompetency.objects.filter(
+                core_competency__program=program
+            ).select_related('core_competency').order_by('core_competency__code', 'code')
+        )
+
+        # EPA x sub-competency incidence matrix
+        incidence = defaultdict(dict)
+        mappings = SubCompetencyEPA.objects.filter(
+            sub_competency__core_competency__program=program,
+            epa__program=program
+        ).values_list('epa_id', 'sub_competency_id')
+        for epa_id, sub_competency_id in mappings:
+            incidence[epa_id][sub_competency_id] = 1
+
+        # Sparse trainee x EPA sum and count matrices
+        level_sums = defaultdict(dict)
+        rating_counts = defaultdict(dict)
+        ratings = TraineeEPADayRollup.objects.filter(
+            scope, trainee_id__in=trainee_ids
+        ).order_by().values('trainee_id', 'epa_id').annotate(
+            rating_count=Sum('rating_count'),
+            level_sum=Sum('level_sum')
+        )
+        for row in ratings:
+            level_sums[row['trainee_id']][row['epa_id']] = row['level_sum']
+            rating_counts[row['trainee_id']][row['epa_id']] = row['rating_count']
+
+        return cls(
+            trainees,
+            sub_competencies,
+            sparse_matmul(level_sums, incidence),
+            sparse_matmul(rating_counts, incidence),
+        )
+
+    def count(self, trainee_id, sub_competency_id):
+        """Number of ratings behind one cell"""
+        return self.counts.get(trainee_id, {}).get(sub_competency_id, 0)
+
+    def average(self, trainee_id, sub_competency_id):
+        """Average entrustment for one cell (None without ratings)"""
+        return average(
+            self.sums.get(trainee_id, {}).get(sub_competency_id),
+            self.count(trainee_id, sub_competency_id)
+        )
+
+    def rows(self):
+        """
+        Yield (trainee, cells) per trainee, where cells lists
+        (sub_competency, average, rating_count) in column order.
+        """
+        for trainee in self.trainees:
+            yield trainee, [
+                (
+                    sub_competency,
+                    self.average(trainee.id, sub_competency.id),
+                    self.count(trainee.id, sub_competency.id),
+                )
+                for sub_competency in self.sub_competencies
+            ]
+
+    def as_dict(self):
+        """Compact JSON-ready representation: column metadata plus one value list per trainee"""
+        trainee_rows = []
+        for trainee, cells in self.rows():
+            averages = [round(avg, 2) if avg else None for _, avg, _ in cells]
+            trainee_rows.append({
+                'id': str(trainee.id),
+                'name': trainee.name,
+                'cohort_id': str(trainee.cohort_id) if trainee.cohort_id else None,
+                'cohort_name': trainee.cohort.name if trainee.cohort else None,
+                'averages': averages,
+                'milestone_levels': [milestone_level(avg) for _, avg, _ in cells],
+                'counts': [count for _, _, count in cells],
+            })
+
+        return {
+            'sub_competencies': [
+                {
+                    'id': str(sub_competency.id),
+                    'code': sub_competency.code,
+                    'title': sub_competency.title,
+                    'core_competency_id': str(sub_competency.core_competency.id),
+                    'core_competency_code': sub_competency.core_competency.code,
+                    'core_competency_title': sub_competency.core_competency.title,
+                }
+                for sub_competency in self.sub_competencies
+            ],
+            'trainees': trainee_rows,
+        }
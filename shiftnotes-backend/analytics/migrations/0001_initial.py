@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-16 18:52
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('curriculum', '0005_make_category_description_optional'),
+        ('organizations', '0003_remove_program_acgme_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraineeDayRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField(help_text='Shift date of the rolled-up assessments')),
+                ('status', models.CharField(max_length=20)),
+                ('assessment_count', models.PositiveIntegerField(default=0)),
+                ('last_created_at', models.DateTimeField(blank=True, help_text='Most recent created_at among the rolled-up assessments', null=True)),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trainee_day_rollups', to='organizations.program')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainee_day_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'analytics_trainee_day_rollups',
+                'indexes': [models.Index(fields=['program', 'status', 'day'], name='analytics_t_program_700cd9_idx')],
+                'unique_together': {('trainee', 'day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TraineeEPADayRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField(help_text='Shift date of the rolled-up assessments')),
+                ('status', models.CharField(max_length=20)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('level_sum', models.PositiveIntegerField(default=0)),
+                ('level_sum_squares', models.PositiveIntegerField(default=0)),
+                ('level_1_count', models.PositiveIntegerField(default=0)),
+                ('level_2_count', models.PositiveIntegerField(default=0)),
+                ('level_3_count', models.PositiveIntegerField(default=0)),
+                ('level_4_count', models.PositiveIntegerField(default=0)),
+                ('level_5_count', models.PositiveIntegerField(default=0)),
+                ('epa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainee_epa_day_rollups', to='curriculum.epa')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trainee_epa_day_rollups', to='organizations.program')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainee_epa_day_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'analytics_trainee_epa_day_rollups',
+                'indexes': [models.Index(fields=['program', 'status', 'day'], name='analytics_t_program_3ef2db_idx'), models.Index(fields=['epa', 'day'], name='analytics_t_epa_id_449e3a_idx')],
+                'unique_together': {('trainee', 'epa', 'day', 'status')},
+            },
+        ),
+    ]
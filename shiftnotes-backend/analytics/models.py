@@ -0,0 +1,64 @@
+from django.db import models
+from django.conf import settings
+import uuid
+
+
+class TraineeDayRollup(models.Model):
+    """
+    Number of assessments a trainee received on one shift date, per status.
+
+    Derived from the assessments table and maintained by analytics.rollups;
+    never edit rows directly.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    program = models.ForeignKey('organizations.Program', on_delete=models.CASCADE, related_name='trainee_day_rollups', null=True, blank=True)
+    trainee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trainee_day_rollups')
+    day = models.DateField(help_text='Shift date of the rolled-up assessments')
+    status = models.CharField(max_length=20)
+    assessment_count = models.PositiveIntegerField(default=0)
+    last_created_at = models.DateTimeField(null=True, blank=True, help_text='Most recent created_at among the rolled-up assessments')
+
+    class Meta:
+        db_table = 'analytics_trainee_day_rollups'
+        unique_together = [['trainee', 'day', 'status']]
+        indexes = [
+            models.Index(fields=['program', 'status', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.trainee_id} {self.day} {self.status}: {self.assessment_count} assessments"
+
+
+class TraineeEPADayRollup(models.Model):
+    """
+    Entrustment ratings a trainee received for one EPA on one shift date, per status.
+
+    Stores count, sum and sum of squares of entrustment_level plus a count per
+    level, so averages, variances and milestone distributions can be summed
+    across rows. Maintained by analytics.rollups; never edit rows directly.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    program = models.ForeignKey('organizations.Program', on_delete=models.CASCADE, related_name='trainee_epa_day_rollups', null=True, blank=True)
+    trainee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trainee_epa_day_rollups')
+    epa = models.ForeignKey('curriculum.EPA', on_delete=models.CASCADE, related_name='trainee_epa_day_rollups')
+    day = models.DateField(help_text='Shift date of the rolled-up assessments')
+    status = models.CharField(max_length=20)
+    rating_count = models.PositiveIntegerField(default=0)
+    level_sum = models.PositiveIntegerField(default=0)
+    level_sum_squares = models.PositiveIntegerField(default=0)
+    level_1_count = models.PositiveIntegerField(default=0)
+    level_2_count = models.PositiveIntegerField(default=0)
+    level_3_count = models.PositiveIntegerField(default=0)
+    level_4_count = models.PositiveIntegerField(default=0)
+    level_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_trainee_epa_day_rollups'
+        unique_together = [['trainee', 'epa', 'day', 'status']]
+        indexes = [
+            models.Index(fields=['program', 'status', 'day']),
+            models.Index(fields=['epa', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.trainee_id} {self.epa_id} {self.day} {self.status}: {self.rating_count} ratings"
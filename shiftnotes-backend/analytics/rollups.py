@@ -0,0 +1,230 @@
+"""
+Maintenance of the entrustment rollup tables.
+
+The rollups hold one row per (trainee, shift date, status) and per
+(trainee, EPA, shift date, status). Whenever an assessment or one of its EPA
+ratings changes, only the affected trainee/day buckets are recomputed from the
+source tables, so every write touches a handful of rows and the rollups stay
+exact even for edits, status changes and deletes.
+
+Writes that touch an assessment and several of its EPA ratings run inside
+deferred_rollups(), so the signal handlers collect the affected buckets and
+each is recomputed once at the end instead of once per row.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from assessments.models import Assessment, AssessmentEPA
+from .models import TraineeDayRollup, TraineeEPADayRollup
+
+ENTRUSTMENT_LEVELS = range(1, 6)
+BATCH_SIZE = 1000
+
+_deferred = threading.local()
+
+
+def compute_day_rollups(assessments):
+    """Build (unsaved) TraineeDayRollup rows for an Assessment queryset"""
+    rows = assessments.order_by().values(
+        'trainee_id', 'trainee__program_id', 'shift_date', 'status'
+    ).annotate(
+        assessment_count=Count('id'),
+        last_created_at=Max('created_at')
+    )
+    return [
+        TraineeDayRollup(
+            program_id=row['trainee__program_id'],
+            trainee_id=row['trainee_id'],
+            day=row['shift_date'],
+            status=row['status'],
+            assessment_count=row['assessment_count'],
+            last_created_at=row['last_created_at']
+        )
+        for row in rows
+    ]
+
+
+def compute_epa_day_rollups(assessments):
+    """Build (unsaved) TraineeEPADayRollup rows for an Assessment queryset"""
+    level_counts = {
+        f'level_{level}_count': Count('id', filter=Q(entrustment_level=level))
+        for level in ENTRUSTMENT_LEVELS
+    }
+    rows = AssessmentEPA.objects.filter(assessment__in=assessments).order_by().values(
+        'assessment__trainee_id', 'assessment__trainee__program_id', 'epa_id',
+        'assessment__shift_date', 'assessment__status'
+    ).annotate(
+        rating_count=Count('id'),
+        level_sum=Sum('entrustment_level'),
+        level_sum_squares=Sum(F('entrustment_level') * F('entrustment_level')),
+        **level_counts
+    )
+    return [
+        TraineeEPADayRollup(
+            program_id=row['assessment__trainee__program_id'],
+            trainee_id=row['assessment__trainee_id'],
+            epa_id=row['epa_id'],
+            day=row['assessment__shift_date'],
+            status=row['assessment__status'],
+            rating_count=row['rating_count'],
+            level_sum=row['level_sum'],
+            level_sum_squares=row['level_sum_squares'],
+            **{name: row[name] for name in level_counts}
+        )
+        for row in rows
+    ]
+
+
+def refresh_rollups(keys):
+    """
+    Recompute the rollup buckets for the given (trainee_id, shift_date) pairs.
+
+    Call this after any write that bypasses model signals (bulk_create,
+    queryset.update, raw SQL) on assessments or assessment EPAs.
+    """
+    keys = {(trainee_id, day) for trainee_id, day in keys if trainee_id and day}
+    if not keys:
+        return
+
+    bucket_filter = Q()
+    for trainee_id, day in keys:
+        bucket_filter |= Q(trainee_id=trainee_id, day=day)
+    assessment_filter = Q()
+    for trainee_id, day in keys:
+        assessment_filter |= Q(trainee_id=trainee_id, shift_date=day)
+    assessments = Assessment.objects.filter(assessment_filter)
+
+    with transaction.atomic():
+        TraineeDayRollup.objects.filter(bucket_filter).delete()
+        TraineeEPADayRollup.objects.filter(bucket_filter).delete()
+        TraineeDayRollup.objects.bulk_create(compute_day_rollups(assessments))
+        TraineeEPADayRollup.objects.bulk_create(compute_epa_day_rollups(assessments))
+
+
+@contextmanager
+def deferred_rollups():
+    """
+    Collect the buckets queued with queue_refresh() in this block and refresh
+    them once when it exits. Nested blocks refresh with the outermost one.
+    """
+    if getattr(_deferred, 'keys', None) is not None:
+        yield
+        return
+    _deferred.keys = set()
+    try:
+        yield
+        keys = _deferred.keys
+    finally:
+        _deferred.keys = None
+    refresh_rollups(keys)
+
+
+def queue_refresh(keys):
+    """Refresh buckets now, or at the end of the enclosing deferred_rollups() block"""
+    pending = getattr(_deferred, 'keys', None)
+    if pending is None:
+        refresh_rollups(keys)
+    else:
+        pending.update(keys)
+
+
+def sync_trainee_program(trainee):
+    """Re-point a trainee's rollup rows at their current program"""
+    for model in (TraineeDayRollup, TraineeEPADayRollup):
+        model.objects.filter(trainee=trainee).exclude(
+            program_id=trainee.program_id
+        ).update(program_id=trainee.program_id)
+
+
+def _rollup_scope(program):
+    """
+    (assessments, day rollups, EPA-day rollups) that rebuild and verify cover.
+
+    For one program, stored rows count if they are filed under the program or
+    belong to one of its trainees, so rows left behind by a trainee who moved
+    program are both checked and replaced.
+    """
+    assessments = Assessment.objects.all()
+    day_rollups = TraineeDayRollup.objects.all()
+    epa_day_rollups = TraineeEPADayRollup.objects.all()
+    if program is not None:
+        in_scope = Q(program=program) | Q(trainee__program=program)
+        assessments = assessments.filter(trainee__program=program)
+        day_rollups = day_rollups.filter(in_scope)
+        epa_day_rollups = epa_day_rollups.filter(in_scope)
+    return assessments, day_rollups, epa_day_rollups
+
+
+def rebuild_rollups(program=None):
+    """
+    Recompute the rollup tables from scratch.
+
+    Args:
+        program: Optional Program to limit the rebuild to
+
+    Returns:
+        tuple: (day rows written, EPA-day rows written)
+    """
+    assessments, day_rollups, epa_day_rollups = _rollup_scope(program)
+
+    with transaction.atomic():
+        day_rollups.delete()
+        epa_day_rollups.delete()
+        day_rows = TraineeDayRollup.objects.bulk_create(
+            compute_day_rollups(assessments), batch_size=BATCH_SIZE
+        )
+        epa_day_rows = TraineeEPADayRollup.objects.bulk_create(
+            compute_epa_day_rollups(assessments), batch_size=BATCH_SIZE
+        )
+
+    return len(day_rows), len(epa_day_rows)
+
+
+def _rollup_key(rollup, fields):
+    return tuple(getattr(rollup, field) for field in fields)
+
+
+def verify_rollups(program=None):
+    """
+    Compare the stored rollups with a fresh computation.
+
+    Returns:
+        list: Human-readable descriptions of every mismatching bucket
+    """
+    assessments, day_rollups, epa_day_rollups = _rollup_scope(program)
+
+    checks = [
+        (
+            'day',
+            ('trainee_id', 'day', 'status'),
+            ('program_id', 'assessment_count', 'last_created_at'),
+            compute_day_rollups(assessments),
+            day_rollups,
+        ),
+        (
+            'epa-day',
+            ('trainee_id', 'epa_id', 'day', 'status'),
+            ('program_id', 'rating_count', 'level_sum', 'level_sum_squares')
+            + tuple(f'level_{level}_count' for level in ENTRUSTMENT_LEVELS),
+            compute_epa_day_rollups(assessments),
+            epa_day_rollups,
+        ),
+    ]
+
+    problems = []
+    for label, key_fields, value_fields, expected_rows, stored_rows in checks:
+        expected = {_rollup_key(row, key_fields): _rollup_key(row, value_fields) for row in expected_rows}
+        stored = {_rollup_key(row, key_fields): _rollup_key(row, value_fields) for row in stored_rows.iterator()}
+
+        for key in expected.keys() - stored.keys():
+            problems.append(f'missing {label} rollup {key}')
+        for key in stored.keys() - expected.keys():
+            problems.append(f'stale {label} rollup {key}')
+        for key in expected.keys() & stored.keys():
+            if expected[key] != stored[key]:
+                problems.append(f'wrong {label} rollup {key}: expected {expected[key]}, stored {stored[key]}')
+
+    return problems
@@ -0,0 +1,64 @@
+"""
+Signal handlers that keep the entrustment rollups up to date.
+
+Assessments and their EPA ratings are written through the ORM one row at a
+time (API, admin, management commands), so model signals catch every change.
+Code that writes in bulk must call analytics.rollups.refresh_rollups itself.
+Handlers queue their buckets with queue_refresh, so inside deferred_rollups()
+an assessment and its ratings refresh each bucket once.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from assessments.models import Assessment, AssessmentEPA
+from .rollups import queue_refresh, sync_trainee_program
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Assessment)
+def remember_previous_bucket(sender, instance, raw=False, **kwargs):
+    """Record the bucket an existing assessment is moving out of"""
+    instance._rollup_previous_key = None
+    if raw or instance._state.adding:
+        return
+    previous = Assessment.objects.filter(pk=instance.pk).values_list('trainee_id', 'shift_date').first()
+    instance._rollup_previous_key = previous
+
+
+@receiver(post_save, sender=Assessment)
+def refresh_assessment_rollups(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {(instance.trainee_id, instance.shift_date)}
+    previous = getattr(instance, '_rollup_previous_key', None)
+    if previous:
+        keys.add(previous)
+    queue_refresh(keys)
+
+
+@receiver(post_delete, sender=Assessment)
+def remove_assessment_rollups(sender, instance, **kwargs):
+    queue_refresh([(instance.trainee_id, instance.shift_date)])
+
+
+@receiver(post_save, sender=AssessmentEPA)
+@receiver(post_delete, sender=AssessmentEPA)
+def refresh_assessment_epa_rollups(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Look the parent up by id: during a cascading delete it may already be gone,
+    # in which case its own post_delete handler refreshes the bucket
+    key = Assessment.objects.filter(pk=instance.assessment_id).values_list('trainee_id', 'shift_date').first()
+    if key:
+        queue_refresh([key])
+
+
+@receiver(post_save, sender=User)
+def sync_rollup_program(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and 'program' not in update_fields:
+        return
+    sync_trainee_program(instance)
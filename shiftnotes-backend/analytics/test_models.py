@@ -0,0 +1,148 @@
+"""
+Tests for the entrustment rollup models and their maintenance
+"""
+import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from analytics.models import TraineeDayRollup, TraineeEPADayRollup
+from analytics import rollups
+from analytics.rollups import deferred_rollups, rebuild_rollups, verify_rollups
+from assessments.models import AssessmentEPA
+from users.models import User
+from conftest import (
+    ProgramFactory, EPAFactory, AssessmentFactory, AssessmentEPAFactory
+)
+
+
+@pytest.mark.django_db
+class TestEntrustmentRollups:
+    """Test that the rollups follow assessment writes"""
+
+    def test_create_assessment_updates_rollups(self, trainee_user, faculty_user, epa):
+        """Test that new ratings are added to the trainee's day bucket"""
+        assessment = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=2)
+        second = AssessmentFactory(
+            trainee=trainee_user, evaluator=faculty_user, status='submitted', shift_date=assessment.shift_date
+        )
+        AssessmentEPAFactory(assessment=second, epa=epa, entrustment_level=4)
+
+        day_rollup = TraineeDayRollup.objects.get(trainee=trainee_user, day=assessment.shift_date, status='submitted')
+        assert day_rollup.assessment_count == 2
+        assert day_rollup.program == trainee_user.program
+        assert day_rollup.last_created_at == second.created_at
+
+        epa_rollup = TraineeEPADayRollup.objects.get(trainee=trainee_user, epa=epa, day=assessment.shift_date)
+        assert epa_rollup.rating_count == 2
+        assert epa_rollup.level_sum == 6
+        assert epa_rollup.level_sum_squares == 20
+        assert epa_rollup.level_2_count == 1
+        assert epa_rollup.level_4_count == 1
+
+    def test_edit_moves_ratings_between_buckets(self, assessment):
+        """Test that status, date and level changes are reflected"""
+        old_date = assessment.shift_date
+        new_date = old_date - timedelta(days=1)
+
+        assessment.status = 'submitted'
+        assessment.shift_date = new_date
+        assessment.save()
+        AssessmentEPA.objects.filter(assessment=assessment).update(entrustment_level=5)
+        rating = assessment.assessment_epas.get()
+        rating.save()
+
+        assert not TraineeDayRollup.objects.filter(day=old_date).exists()
+        epa_rollup = TraineeEPADayRollup.objects.get(trainee=assessment.trainee, day=new_date)
+        assert epa_rollup.status == 'submitted'
+        assert epa_rollup.level_sum == 5
+
+    def test_delete_assessment_removes_rollups(self, assessment):
+        """Test that deleting an assessment empties its bucket"""
+        assessment.delete()
+
+        assert TraineeDayRollup.objects.count() == 0
+        assert TraineeEPADayRollup.objects.count() == 0
+
+    def test_program_change_follows_trainee(self, assessment):
+        """Test that rollups move with a trainee who changes program"""
+        trainee = assessment.trainee
+        trainee.program = ProgramFactory(org=trainee.organization)
+        trainee.save()
+
+        assert TraineeEPADayRollup.objects.get(trainee=trainee).program == trainee.program
+        assert verify_rollups() == []
+
+
+    def test_deferred_writes_refresh_each_bucket_once(self, trainee_user, faculty_user, monkeypatch):
+        """Test that an assessment and its ratings refresh the bucket once"""
+        refreshed = []
+        refresh_rollups = rollups.refresh_rollups
+        monkeypatch.setattr(rollups, 'refresh_rollups', lambda keys: refreshed.append(set(keys)) or refresh_rollups(keys))
+
+        with deferred_rollups():
+            assessment = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+            for level in (2, 3, 4):
+                AssessmentEPAFactory(assessment=assessment, entrustment_level=level)
+
+        assert refreshed == [{(trainee_user.id, assessment.shift_date)}]
+        assert TraineeDayRollup.objects.get(trainee=trainee_user).assessment_count == 1
+        assert TraineeEPADayRollup.objects.filter(trainee=trainee_user).count() == 3
+        assert verify_rollups() == []
+
+        refreshed.clear()
+        with deferred_rollups():
+            assessment.delete()
+
+        assert refreshed == [{(trainee_user.id, assessment.shift_date)}]
+        assert TraineeEPADayRollup.objects.count() == 0
+
+@pytest.mark.django_db
+class TestRebuildEntrustmentRollups:
+    """Test rebuilding and verifying the rollups"""
+
+    def test_verify_detects_and_rebuild_repairs_drift(self, assessment):
+        """Test that --verify fails on drift and a rebuild fixes it"""
+        TraineeEPADayRollup.objects.update(level_sum=99)
+        TraineeDayRollup.objects.all().delete()
+
+        assert len(verify_rollups()) == 2
+        with pytest.raises(CommandError):
+            call_command('rebuild_entrustment_rollups', '--verify')
+
+        call_command('rebuild_entrustment_rollups')
+
+        assert verify_rollups() == []
+        call_command('rebuild_entrustment_rollups', '--verify')
+
+    def test_rebuild_single_program(self, assessment, faculty_user):
+        """Test that a program rebuild leaves other programs alone"""
+        other_program = ProgramFactory()
+        other = AssessmentFactory(evaluator=faculty_user, trainee__program=other_program)
+        AssessmentEPAFactory(assessment=other, epa=EPAFactory(program=other_program))
+        TraineeEPADayRollup.objects.update(level_sum=0)
+
+        day_rows, epa_day_rows = rebuild_rollups(assessment.trainee.program)
+
+        assert (day_rows, epa_day_rows) == (1, 1)
+        assert TraineeEPADayRollup.objects.get(trainee=assessment.trainee).level_sum == 3
+        assert TraineeEPADayRollup.objects.get(trainee=other.trainee).level_sum == 0
+
+    def test_verify_and_rebuild_cover_moved_trainee(self, assessment):
+        """Test that a program's verify checks the rows its rebuild replaces"""
+        trainee = assessment.trainee
+        old_program = trainee.program
+        new_program = ProgramFactory(org=trainee.organization)
+        # Move the trainee without the signal that re-points their rollups
+        User.objects.filter(pk=trainee.pk).update(program=new_program)
+
+        problems = verify_rollups(new_program)
+        assert len(problems) == 2
+        assert all(problem.startswith('wrong ') for problem in problems)
+
+        rebuild_rollups(new_program)
+
+        assert verify_rollups(new_program) == []
+        assert verify_rollups(old_program) == []
+        assert TraineeEPADayRollup.objects.get(trainee=trainee).program == new_program
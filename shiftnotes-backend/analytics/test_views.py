@@ -0,0 +1,375 @@
+"""
+Tests for Analytics API views
+"""
+import json
+import pytest
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.renderers import FastJSONRenderer, FastJsonResponse, dumps
+
+from conftest import (
+    UserFactory, CohortFactory, EPAFactory,
+    AssessmentFactory, AssessmentEPAFactory,
+    CoreCompetencyFactory, SubCompetencyFactory, SubCompetencyEPAFactory
+)
+
+
+def create_trainee_with_assessments(user, cohort, evaluator, epas, levels, shift_date=None):
+    """Create a trainee in the user's program with one submitted assessment per level"""
+    trainee = UserFactory(
+        role='trainee',
+        organization=user.organization,
+        program=user.program,
+        cohort=cohort
+    )
+    for epa, level in zip(epas, levels):
+        assessment = AssessmentFactory(
+            trainee=trainee,
+            evaluator=evaluator,
+            status='submitted',
+            shift_date=shift_date or date.today() - timedelta(days=3)
+        )
+        AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=level)
+    return trainee
+
+
+@pytest.mark.django_db
+class TestProgramPerformanceData:
+    """Test the program performance dashboard endpoint"""
+
+    def test_metrics_and_breakdowns(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that metrics, breakdowns and trends are computed from the program's assessments"""
+        competency = CoreCompetencyFactory(program=leadership_user.program)
+        subcompetency = SubCompetencyFactory(core_competency=competency, program=leadership_user.program)
+        mapped_epa = EPAFactory(program=leadership_user.program)
+        unmapped_epa = EPAFactory(program=leadership_user.program)
+        SubCompetencyEPAFactory(sub_competency=subcompetency, epa=mapped_epa)
+
+        trainee = create_trainee_with_assessments(
+            leadership_user, cohort, faculty_user, [mapped_epa, unmapped_epa], [2, 4]
+        )
+
+        url = reverse('program_performance_data')
+        response = leadership_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        metrics = data['metrics']
+        assert metrics['assessments_in_period'] == 2
+        assert metrics['active_trainees'] == 1
+        assert metrics['average_competency_level'] == 3.0
+        assert metrics['milestone_distribution']['level_2'] == 1
+        assert metrics['milestone_distribution']['level_4'] == 1
+        assert metrics['milestone_distribution']['level_1'] == 0
+
+        trainee_row = data['trainee_breakdown'][0]
+        assert trainee_row['id'] == str(trainee.id)
+        assert trainee_row['assessments_in_period'] == 2
+        assert trainee_row['total_assessments'] == 2
+        assert trainee_row['average_competency_level'] == 3.0
+        assert trainee_row['is_active'] is True
+
+        competency_row = data['competency_breakdown'][0]
+        assert competency_row['total_assessments'] == 1
+        assert competency_row['average_competency_level'] == 2.0
+
+        cohort_row = data['cohort_breakdown'][0]
+        assert cohort_row['trainee_count'] == 1
+        assert cohort_row['assessment_count'] == 2
+        assert cohort_row['average_entrustment_level'] == 3.0
+
+        monthly = data['trends']['monthly_assessments']
+        assert len(monthly) == 6
+        assert monthly[-1]['assessments'] == 2
+        assert data['trends']['monthly_entrustment'][-1]['average_entrustment'] == 3.0
+
+    def test_query_count_independent_of_trainees_and_competencies(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that the number of queries does not grow with the size of the program"""
+        url = reverse('program_performance_data')
+
+        def add_program_data(count):
+            for _ in range(count):
+                competency = CoreCompetencyFactory(program=leadership_user.program)
+                subcompetency = SubCompetencyFactory(core_competency=competency, program=leadership_user.program)
+                epa = EPAFactory(program=leadership_user.program)
+                SubCompetencyEPAFactory(sub_competency=subcompetency, epa=epa)
+                create_trainee_with_assessments(
+                    leadership_user, cohort, faculty_user, [epa, epa], [3, 5],
+                    shift_date=date.today() - timedelta(days=45)
+                )
+
+        add_program_data(1)
+        with CaptureQueriesContext(connection) as small_program:
+            response = leadership_client.get(url, {'months': 3})
+        assert response.status_code == status.HTTP_200_OK
+
+        add_program_data(5)
+        with CaptureQueriesContext(connection) as large_program:
+            response = leadership_client.get(url, {'months': 12})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert response.json()['metrics']['active_trainees'] == 6
+        assert len(large_program.captured_queries) == len(small_program.captured_queries)
+
+    def test_requires_program(self, api_client, leadership_user):
+        """Test that users without a program get an error"""
+        from rest_framework.authtoken.models import Token
+        leadership_user.program = None
+        leadership_user.save()
+        token, _ = Token.objects.get_or_create(user=leadership_user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = api_client.get(reverse('program_performance_data'))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestTraineePerformanceData:
+    """Test the trainee performance endpoint"""
+
+    def test_only_submitted_assessments_count(self, leadership_client, leadership_user, faculty_user, cohort, epa):
+        """Test that drafts are excluded from period and lifetime totals"""
+        trainee = create_trainee_with_assessments(leadership_user, cohort, faculty_user, [epa, epa], [2, 5])
+        draft = AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='draft', shift_date=date.today())
+        AssessmentEPAFactory(assessment=draft, epa=epa, entrustment_level=1)
+        old = AssessmentFactory(
+            trainee=trainee, evaluator=faculty_user, status='submitted',
+            shift_date=date.today() - timedelta(days=400)
+        )
+        AssessmentEPAFactory(assessment=old, epa=epa, entrustment_level=1)
+
+        response = leadership_client.get(reverse('trainee_performance_data'))
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        row = next(t for t in data['trainees'] if t['id'] == str(trainee.id))
+        assert row['total_assessments'] == 2
+        assert row['lifetime_assessments'] == 3
+        assert row['avg_entrustment_level'] == 3.5
+        assert row['has_assessments'] is True
+        assert data['cohorts'][0]['trainee_count'] == 1
+
+
+@pytest.mark.django_db
+class TestCompetencyGridData:
+    """Test the per-trainee competency grid and progress endpoints"""
+
+    def build_grid(self, user, faculty_user, cohort, subcompetency_count=1):
+        """Create a competency with sub-competencies that share one rated EPA"""
+        competency = CoreCompetencyFactory(program=user.program, code='PC')
+        epa = EPAFactory(program=user.program)
+        other_program_epa = EPAFactory()
+        subcompetencies = []
+        for index in range(subcompetency_count):
+            subcompetency = SubCompetencyFactory(
+                core_competency=competency, program=user.program, code=f'PC{index}'
+            )
+            SubCompetencyEPAFactory(sub_competency=subcompetency, epa=epa)
+            SubCompetencyEPAFactory(sub_competency=subcompetency, epa=other_program_epa)
+            subcompetencies.append(subcompetency)
+        trainee = create_trainee_with_assessments(user, cohort, faculty_user, [epa, epa], [3, 4])
+        return trainee, subcompetencies
+
+    def test_grid_averages_and_milestones(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test sub-competency averages, counts and milestone rounding"""
+        trainee, subcompetencies = self.build_grid(leadership_user, faculty_user, cohort)
+
+        response = leadership_client.get(reverse('competency_grid_data'), {'trainee_id': str(trainee.id)})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        sub = data['competencies'][0]['sub_competencies'][0]
+        assert sub['id'] == str(subcompetencies[0].id)
+        assert sub['average_entrustment'] == 3.5
+        assert sub['milestone_level'] == 3.5
+        assert sub['total_assessments'] == 2
+        assert sub['mapped_epas_count'] == 1
+        assert data['summary']['total_assessments'] == 2
+        assert data['summary']['coverage_percentage'] == 100.0
+
+    def test_grid_date_filter(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that ratings outside the date range are excluded"""
+        trainee, _ = self.build_grid(leadership_user, faculty_user, cohort)
+
+        response = leadership_client.get(reverse('competency_grid_data'), {
+            'trainee_id': str(trainee.id),
+            'start_date': date.today().strftime('%Y-%m-%d')
+        })
+
+        sub = response.json()['competencies'][0]['sub_competencies'][0]
+        assert sub['has_data'] is False
+        assert sub['milestone_level'] is None
+
+    def test_grid_query_count_independent_of_subcompetencies(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that adding sub-competencies does not add queries"""
+        small_trainee, _ = self.build_grid(leadership_user, faculty_user, cohort, subcompetency_count=1)
+        with CaptureQueriesContext(connection) as small_grid:
+            leadership_client.get(reverse('competency_grid_data'), {'trainee_id': str(small_trainee.id)})
+
+        large_trainee, _ = self.build_grid(leadership_user, faculty_user, cohort, subcompetency_count=8)
+        with CaptureQueriesContext(connection) as large_grid:
+            response = leadership_client.get(reverse('competency_grid_data'), {'trainee_id': str(large_trainee.id)})
+
+        assert response.json()['summary']['total_subcompetencies'] == 9
+        assert len(large_grid.captured_queries) == len(small_grid.captured_queries)
+
+    def test_progress_matches_grid(self, authenticated_client, trainee_user, faculty_user, cohort):
+        """Test that the trainee progress view shares the grid computation"""
+        competency = CoreCompetencyFactory(program=trainee_user.program)
+        subcompetency = SubCompetencyFactory(core_competency=competency, program=trainee_user.program)
+        epa = EPAFactory(program=trainee_user.program)
+        SubCompetencyEPAFactory(sub_competency=subcompetency, epa=epa)
+        for level in (2, 5):
+            assessment = AssessmentFactory(
+                trainee=trainee_user, evaluator=faculty_user, status='submitted', shift_date=date.today()
+            )
+            AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=level)
+
+        response = authenticated_client.get(reverse('competency_progress_data'))
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        sub = data['competencies'][0]['subcompetencies'][0]
+        assert sub['avg_entrustment_level'] == 3.5
+        assert sub['assessment_count'] == 2
+        assert sub['epas_count'] == 1
+        assert data['competencies'][0]['avg_entrustment_level'] == 3.5
+        assert data['summary']['overall_avg_entrustment'] == 3.5
+        assert data['summary']['recent_avg_entrustment'] == 3.5
+        assert data['summary']['total_assessments'] == 2
+
+
+@pytest.mark.django_db
+class TestCompetencyMatrixData:
+    """Test the program-wide trainee x sub-competency matrix endpoint"""
+
+    def build_curriculum(self, program, subcompetency_count=2):
+        """Create sub-competencies where the first shares an EPA with all others"""
+        competency = CoreCompetencyFactory(program=program, code='PC')
+        shared_epa = EPAFactory(program=program)
+        own_epa = EPAFactory(program=program)
+        subcompetencies = []
+        for index in range(subcompetency_count):
+            subcompetency = SubCompetencyFactory(core_competency=competency, program=program, code=f'PC{index}')
+            SubCompetencyEPAFactory(sub_competency=subcompetency, epa=shared_epa)
+            subcompetencies.append(subcompetency)
+        SubCompetencyEPAFactory(sub_competency=subcompetencies[0], epa=own_epa)
+        return shared_epa, own_epa, subcompetencies
+
+    def test_matrix_matches_per_trainee_grid(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that every cell equals the per-trainee grid average"""
+        shared_epa, own_epa, subcompetencies = self.build_curriculum(leadership_user.program)
+        first = create_trainee_with_assessments(
+            leadership_user, cohort, faculty_user, [shared_epa, own_epa], [2, 5]
+        )
+        first.name = 'A Trainee'
+        first.save()
+        second = create_trainee_with_assessments(leadership_user, cohort, faculty_user, [shared_epa], [4])
+        second.name = 'B Trainee'
+        second.save()
+
+        response = leadership_client.get(reverse('competency_matrix_data'))
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [sub['id'] for sub in data['sub_competencies']] == [str(sub.id) for sub in subcompetencies]
+        first_row, second_row = data['trainees']
+        assert first_row['id'] == str(first.id)
+        assert first_row['averages'] == [3.5, 2.0]
+        assert first_row['counts'] == [2, 1]
+        assert first_row['milestone_levels'] == [3.5, 2.0]
+        assert second_row['averages'] == [4.0, 4.0]
+
+        grid = leadership_client.get(reverse('competency_grid_data'), {'trainee_id': str(first.id)}).json()
+        grid_averages = [sub['average_entrustment'] for sub in grid['competencies'][0]['sub_competencies']]
+        assert grid_averages == first_row['averages']
+
+    def test_cohort_and_date_filters(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that cohort and date filters restrict rows and ratings"""
+        shared_epa, _, _ = self.build_curriculum(leadership_user.program, subcompetency_count=1)
+        trainee = create_trainee_with_assessments(leadership_user, cohort, faculty_user, [shared_epa], [3])
+        other_cohort = CohortFactory(program=leadership_user.program)
+        create_trainee_with_assessments(leadership_user, other_cohort, faculty_user, [shared_epa], [5])
+
+        response = leadership_client.get(reverse('competency_matrix_data'), {'cohort': str(cohort.id)})
+        rows = response.json()['trainees']
+        assert [row['id'] for row in rows] == [str(trainee.id)]
+        assert rows[0]['averages'] == [3.0]
+
+        response = leadership_client.get(reverse('competency_matrix_data'), {
+            'cohort': str(cohort.id),
+            'start_date': date.today().strftime('%Y-%m-%d')
+        })
+        assert response.json()['trainees'][0]['averages'] == [None]
+        assert response.json()['trainees'][0]['counts'] == [0]
+
+    def test_query_count_independent_of_program_size(self, leadership_client, leadership_user, faculty_user, cohort):
+        """Test that the matrix is built with a fixed number of queries"""
+        shared_epa, own_epa, _ = self.build_curriculum(leadership_user.program, subcompetency_count=1)
+        create_trainee_with_assessments(leadership_user, cohort, faculty_user, [shared_epa], [3])
+        with CaptureQueriesContext(connection) as small_program:
+            leadership_client.get(reverse('competency_matrix_data'))
+
+        self.build_curriculum(leadership_user.program, subcompetency_count=6)
+        for _ in range(5):
+            create_trainee_with_assessments(leadership_user, cohort, faculty_user, [shared_epa, own_epa], [2, 4])
+        with CaptureQueriesContext(connection) as large_program:
+            response = leadership_client.get(reverse('competency_matrix_data'))
+
+        assert len(response.json()['trainees']) == 6
+        assert len(large_program.captured_queries) == len(small_program.captured_queries)
+
+    def test_requires_leadership(self, faculty_client):
+        """Test that faculty cannot read the program matrix"""
+        response = faculty_client.get(reverse('competency_matrix_data'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestFastJsonEncoding:
+    """Test that the fast encoder writes the same JSON as the stdlib encoders"""
+    
+    payload = {
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'day': date(2025, 3, 1),
+        'at': datetime(2025, 3, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'average': Decimal('3.50'),
+        'levels': {1: 'I had to do it', 2: 'I helped a lot'},
+        'names': ['Zoë', 'Łukasz'],
+    }
+    
+    @pytest.mark.parametrize('encoder_class', [DjangoJSONEncoder, JSONEncoder])
+    def test_matches_stdlib(self, encoder_class):
+        """Test that special types are written like the stdlib encoder writes them"""
+        expected = json.dumps(self.payload, cls=encoder_class, ensure_ascii=False)
+        
+        assert json.loads(dumps(self.payload, encoder_class)) == json.loads(expected)
+    
+    def test_json_response(self):
+        """Test that FastJsonResponse behaves like JsonResponse"""
+        response = FastJsonResponse({'id': self.payload['id']}, status=201)
+        
+        assert response.status_code == 201
+        assert response['Content-Type'] == 'application/json'
+        assert json.loads(response.content) == {'id': '12345678-1234-5678-1234-567812345678'}
+        with pytest.raises(TypeError):
+            FastJsonResponse([1, 2])
+        assert json.loads(FastJsonResponse([1, 2], safe=False).content) == [1, 2]
+    
+    @pytest.mark.django_db
+    def test_api_uses_fast_renderer(self, admin_client):
+        """Test that DRF responses are rendered by the fast renderer"""
+        response = admin_client.get(reverse('user-list'))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert isinstance(response.accepted_renderer, FastJSONRenderer)
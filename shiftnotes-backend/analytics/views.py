@@ -1,53 +1,16 @@
-from django.http import JsonResponse
 from django.db.models import Count, Avg, Q, Max, Min, F, ExpressionWrapper, DurationField
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import timedelta, datetime
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from api.renderers import FastJsonResponse
 from assessments.models import Assessment
 from users.models import User, Cohort
 from organizations.models import Program
-from curriculum.models import CoreCompetency, SubCompetency, EPA
 import calendar
-
-def get_cohort_breakdown(program, assessments, cohort_id=None):
-    """Calculate average entrustment level by cohort for the given program and assessments"""
-    # Get cohorts for this program - filter by specific cohort if provided
-    cohorts = Cohort.objects.filter(program=program).order_by('-start_date')
-    if cohort_id:
-        cohorts = cohorts.filter(id=cohort_id)
-    
-    cohort_breakdown = []
-    for cohort in cohorts:
-        # Get assessments for trainees in this cohort
-        cohort_assessments = assessments.filter(trainee__cohort=cohort)
-        
-        # Calculate average entrustment level for this cohort
-        avg_entrustment = cohort_assessments.aggregate(
-            avg_entrustment=Avg('assessment_epas__entrustment_level')
-        )['avg_entrustment']
-        
-        # Count trainees in this cohort
-        trainee_count = User.objects.filter(
-            role='trainee',
-            cohort=cohort,
-            program=program
-        ).count()
-        
-        # Count assessments for this cohort
-        assessment_count = cohort_assessments.count()
-        
-        cohort_breakdown.append({
-            'id': str(cohort.id),
-            'name': cohort.name,
-            'start_date': cohort.start_date.isoformat(),
-            'trainee_count': trainee_count,
-            'assessment_count': assessment_count,
-            'average_entrustment_level': round(avg_entrustment, 2) if avg_entrustment else None
-        })
-    
-    return cohort_breakdown
+from . import aggregations
+from .matrix import CompetencyMatrix
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -58,7 +21,7 @@ def program_performance_data(request):
     
     # Get the user's program
     if not request.user.program:
-        return JsonResponse({'error': 'User is not assigned to a program'}, status=400)
+        return FastJsonResponse({'error': 'User is not assigned to a program'}, status=400)
     
     program = request.user.program
     
@@ -79,7 +42,7 @@ def program_performance_data(request):
             cohort = Cohort.objects.get(id=cohort_id, program=program)
             assessments = assessments.filter(trainee__cohort=cohort)
         except Cohort.DoesNotExist:
-            return JsonResponse({'error': 'Cohort not found'}, status=404)
+            return FastJsonResponse({'error': 'Cohort not found'}, status=404)
     
     # Apply trainee filter if provided
     if trainee_id:
@@ -87,13 +50,13 @@ def program_performance_data(request):
             trainee = User.objects.get(id=trainee_id, program=program, role='trainee')
             assessments = assessments.filter(trainee=trainee)
         except User.DoesNotExist:
-            return JsonResponse({'error': 'Trainee not found'}, status=404)
+            return FastJsonResponse({'error': 'Trainee not found'}, status=404)
     
     # Get active trainees (those with assessments in timeframe) - filtered by cohort/trainee if provided
     active_trainees_query = User.objects.filter(
         role='trainee',
         program=program,
-        assessments_received__shift_date__gte=start_date.date()
+        trainee_day_rollups__day__gte=start_date.date()
     )
     
     # Apply same filters to trainee query
@@ -104,10 +67,6 @@ def program_performance_data(request):
     
     active_trainees = active_trainees_query.distinct()
     
-    # Calculate metrics
-    total_assessments = assessments.count()
-    active_trainee_count = active_trainees.count()
-    
     # Calculate total trainees respecting filters
     total_trainees_query = User.objects.filter(role='trainee', program=program)
     if cohort_id:
@@ -115,90 +74,22 @@ def program_performance_data(request):
     if trainee_id:
         total_trainees_query = total_trainees_query.filter(id=trainee_id)
     total_trainees = total_trainees_query.count()
-    avg_competency_level = assessments.aggregate(avg_score=Avg('assessment_epas__entrustment_level'))['avg_score'] or 0
-    
-    # Assessment distribution by entrustment level
-    milestone_distribution = {}
-    for level in range(1, 6):  # Entrustment levels are 1-5, not 1-6
-        count = assessments.filter(assessment_epas__entrustment_level=level).count()
-        milestone_distribution[f'level_{level}'] = count
-    
-    # Competency breakdown by core competencies
-    from curriculum.models import CoreCompetency
-    competency_breakdown = []
-    core_competencies = CoreCompetency.objects.filter(program=program)
-    
-    for competency in core_competencies:
-        # Get assessments for EPAs that belong to this competency's sub-competencies  
-        competency_assessments = assessments.filter(
-            assessment_epas__epa__sub_competencies__core_competency=competency
-        ).distinct()
-        
-        total_assessments = competency_assessments.count()
-        avg_level = competency_assessments.aggregate(
-            avg_score=Avg('assessment_epas__entrustment_level')
-        )['avg_score'] or 0
-        
-        competency_breakdown.append({
-            'id': str(competency.id),
-            'name': competency.title,  # Changed from .name to .title
-            'total_assessments': total_assessments,
-            'average_competency_level': round(avg_level, 2)
-        })
-    
-    # Trainee breakdown
-    trainee_breakdown = []
-    for trainee in active_trainees:
-        trainee_assessments = assessments.filter(trainee=trainee)
-        trainee_count = trainee_assessments.count()
-        trainee_avg = trainee_assessments.aggregate(
-            avg_score=Avg('assessment_epas__entrustment_level')
-        )['avg_score'] or 0
-        
-        last_assessment = trainee_assessments.order_by('-created_at').first()
-        
-        trainee_breakdown.append({
-            'id': str(trainee.id),
-            'name': trainee.name,
-            'department': trainee.department or 'Not specified',
-            'assessments_in_period': trainee_count,
-            'total_assessments': trainee.assessments_received.count(),
-            'average_competency_level': round(trainee_avg, 2),
-            'is_active': trainee_count > 0,
-            'last_assessment_date': last_assessment.created_at.isoformat() if last_assessment else None
-        })
     
-    # Monthly assessment trends
-    monthly_data = []
-    monthly_entrustment_data = []
-    for i in range(months):
-        month_start = end_date - timedelta(days=(i+1) * 30)
-        month_end = end_date - timedelta(days=i * 30)
-        month_assessments_queryset = assessments.filter(
-            shift_date__gte=month_start.date(),
-            shift_date__lt=month_end.date()
-        )
-        month_assessments_count = month_assessments_queryset.count()
-        
-        # Calculate average entrustment level for this month
-        month_avg_entrustment = month_assessments_queryset.aggregate(
-            avg_entrustment=Avg('assessment_epas__entrustment_level')
-        )['avg_entrustment'] or 0
-        
-        monthly_data.append({
-            'month': month_start.strftime('%b %Y'),
-            'assessments': month_assessments_count
-        })
-        
-        monthly_entrustment_data.append({
-            'month': month_start.strftime('%b %Y'),
-            'average_entrustment': round(month_avg_entrustment, 2)
-        })
-    
-    monthly_data.reverse()  # Show oldest to newest
-    monthly_entrustment_data.reverse()  # Show oldest to newest
+    # Each section below is a fixed number of grouped queries over the
+    # entrustment rollups, independent of the number of trainees, competencies
+    # or months in scope
+    scope = aggregations.rollup_scope(
+        program,
+        start_date=start_date.date(),
+        end_date=end_date.date(),
+        cohort_id=cohort_id,
+        trainee_id=trainee_id
+    )
+    summary = aggregations.summarize_assessments(scope)
+    trainee_breakdown = aggregations.trainee_breakdown(scope, active_trainees)
+    monthly_data, monthly_entrustment_data = aggregations.monthly_trends(scope, end_date, months)
     
-    return JsonResponse({
+    return FastJsonResponse({
         'program': {
             'id': program.id,
             'name': program.name,
@@ -211,15 +102,15 @@ def program_performance_data(request):
         },
         'metrics': {
             'total_trainees': total_trainees,
-            'active_trainees': active_trainee_count,
-            'assessments_in_period': total_assessments,
-            'total_lifetime_assessments': total_assessments,  # Same as assessments_in_period for now
-            'average_competency_level': round(avg_competency_level, 2),
-            'milestone_distribution': milestone_distribution
+            'active_trainees': len(trainee_breakdown),
+            'assessments_in_period': summary['assessment_count'],
+            'total_lifetime_assessments': summary['assessment_count'],  # Same as assessments_in_period for now
+            'average_competency_level': round(summary['average_entrustment'] or 0, 2),
+            'milestone_distribution': summary['milestone_distribution']
         },
         'trainee_breakdown': trainee_breakdown,
-        'competency_breakdown': competency_breakdown,
-        'cohort_breakdown': get_cohort_breakdown(program, assessments, cohort_id),
+        'competency_breakdown': aggregations.competency_breakdown(program, scope, assessments),
+        'cohort_breakdown': aggregations.cohort_breakdown(program, scope, cohort_id),
         'trends': {
             'monthly_assessments': monthly_data,
             'monthly_entrustment': monthly_entrustment_data
@@ -235,7 +126,7 @@ def faculty_dashboard_data(request):
     """
     # Get the user's program
     if not request.user.program:
-        return JsonResponse({'error': 'User is not assigned to a program'}, status=400)
+        return FastJsonResponse({'error': 'User is not assigned to a program'}, status=400)
     
     program = request.user.program
     
@@ -254,13 +145,13 @@ def faculty_dashboard_data(request):
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         except ValueError:
-            return JsonResponse({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, status=400)
+            return FastJsonResponse({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, status=400)
     
     if end_date_str:
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         except ValueError:
-            return JsonResponse({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, status=400)
+            return FastJsonResponse({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, status=400)
     
     # Build faculty queryset with proper ordering
     faculty_queryset = User.objects.filter(
@@ -399,7 +290,7 @@ def faculty_dashboard_data(request):
     total_faculty = len(faculty_stats)
     total_assessments = sum(f['total_assessments'] for f in faculty_stats)
     
-    return JsonResponse({
+    return FastJsonResponse({
         'faculty_stats': faculty_stats,
         'date_range': {
             'start_date': start_date.isoformat(),
@@ -417,57 +308,35 @@ def competency_progress_data(request):
     
     # Only trainees can access their own competency progress
     if user.role != 'trainee':
-        return JsonResponse({'error': 'Only trainees can access competency progress'}, status=403)
+        return FastJsonResponse({'error': 'Only trainees can access competency progress'}, status=403)
     
     if not user.program:
-        return JsonResponse({'error': 'User is not assigned to a program'}, status=400)
-    
-    # Get all assessments for this trainee
-    trainee_assessments = Assessment.objects.filter(
-        trainee=user,
-        status='submitted'
-    ).select_related('trainee', 'evaluator').prefetch_related('assessment_epas__epa__sub_competencies')
+        return FastJsonResponse({'error': 'User is not assigned to a program'}, status=400)
     
-    # Get all competencies for this program
-    competencies = CoreCompetency.objects.filter(program=user.program).prefetch_related('sub_competencies')
+    # Average entrustment per sub-competency for all submitted assessments
+    scope = aggregations.rollup_scope(user.program, trainee_id=user.id, statuses=['submitted'])
+    grid = aggregations.competency_grid(user.program, scope)
     
     competency_data = []
     overall_avg = 0
     total_assessments = 0
     
-    for competency in competencies:
+    for entry in grid:
+        competency = entry['competency']
         subcompetency_data = []
         competency_total = 0
         competency_count = 0
         
-        for subcompetency in competency.sub_competencies.all():
-            # Get EPAs that map to this subcompetency
-            epas_for_subcompetency = EPA.objects.filter(
-                sub_competencies=subcompetency,
-                program=user.program
-            )
-            
-            # Get assessments for EPAs that map to this subcompetency
-            subcompetency_assessments = trainee_assessments.filter(
-                assessment_epas__epa__in=epas_for_subcompetency
-            )
+        for sub in entry['sub_competencies']:
+            avg_entrustment = sub['average_entrustment']
             
-            # Calculate average entrustment level for this subcompetency
-            avg_entrustment = subcompetency_assessments.aggregate(
-                avg=Avg('assessment_epas__entrustment_level')
-            )['avg']
-            
-            assessment_count = subcompetency_assessments.count()
-            
-            subcompetency_info = {
-                'id': str(subcompetency.id),
-                'title': subcompetency.title,
+            subcompetency_data.append({
+                'id': str(sub['sub_competency'].id),
+                'title': sub['sub_competency'].title,
                 'avg_entrustment_level': round(avg_entrustment, 2) if avg_entrustment else None,
-                'assessment_count': assessment_count,
-                'epas_count': epas_for_subcompetency.count(),
-            }
-            
-            subcompetency_data.append(subcompetency_info)
+                'assessment_count': sub['rating_count'],
+                'epas_count': sub['mapped_epas_count'],
+            })
             
             if avg_entrustment:
                 competency_total += avg_entrustment
@@ -496,12 +365,16 @@ def competency_progress_data(request):
     
     # Get recent assessment trend (last 3 months)
     three_months_ago = timezone.now() - timedelta(days=90)
-    recent_assessments = trainee_assessments.filter(shift_date__gte=three_months_ago.date())
-    recent_avg = recent_assessments.aggregate(
-        avg=Avg('assessment_epas__entrustment_level')
-    )['avg']
+    recent_avg = aggregations.rating_average(
+        aggregations.rollup_scope(
+            user.program,
+            start_date=three_months_ago.date(),
+            trainee_id=user.id,
+            statuses=['submitted']
+        )
+    )
     
-    return JsonResponse({
+    return FastJsonResponse({
         'trainee': {
             'id': str(user.id),
             'name': user.name,
@@ -526,79 +399,56 @@ def competency_grid_data(request):
     end_date_str = request.GET.get('end_date')
     
     if not trainee_id:
-        return JsonResponse({'error': 'trainee_id parameter is required'}, status=400)
+        return FastJsonResponse({'error': 'trainee_id parameter is required'}, status=400)
     
     # Get the trainee
     try:
         trainee = User.objects.get(id=trainee_id, role='trainee')
     except User.DoesNotExist:
-        return JsonResponse({'error': 'Trainee not found'}, status=404)
+        return FastJsonResponse({'error': 'Trainee not found'}, status=404)
     
     # Security: ensure user can access this trainee's data (program-level isolation)
     if request.user.program != trainee.program:
-        return JsonResponse({'error': 'Access denied'}, status=403)
+        return FastJsonResponse({'error': 'Access denied'}, status=403)
     
     # Parse date filters
-    assessments_filter = Q(trainee=trainee, status='submitted')
+    start_date = None
+    end_date = None
     
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            assessments_filter &= Q(shift_date__gte=start_date)
         except ValueError:
-            return JsonResponse({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, status=400)
+            return FastJsonResponse({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, status=400)
     
     if end_date_str:
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            assessments_filter &= Q(shift_date__lte=end_date)
         except ValueError:
-            return JsonResponse({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, status=400)
-    
-    # Get all assessments for this trainee (with date filtering if provided)
-    trainee_assessments = Assessment.objects.filter(assessments_filter)
+            return FastJsonResponse({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, status=400)
     
     # Get all competencies for this program
     if not trainee.program:
-        return JsonResponse({'error': 'Trainee is not assigned to a program'}, status=400)
-    
-    competencies = CoreCompetency.objects.filter(program=trainee.program).prefetch_related(
-        'sub_competencies__sub_competency_epas__epa'
-    ).order_by('code')
+        return FastJsonResponse({'error': 'Trainee is not assigned to a program'}, status=400)
+    
+    # Submitted assessments for this trainee (with date filtering if provided)
+    scope = aggregations.rollup_scope(
+        trainee.program,
+        start_date=start_date,
+        end_date=end_date,
+        trainee_id=trainee.id,
+        statuses=['submitted']
+    )
     
     grid_data = []
     
-    for competency in competencies:
+    for entry in aggregations.competency_grid(trainee.program, scope):
+        competency = entry['competency']
         subcompetency_data = []
         
-        for subcompetency in competency.sub_competencies.all().order_by('code'):
-            # Get all EPAs mapped to this sub-competency
-            mapped_epas = EPA.objects.filter(
-                sub_competency_epas__sub_competency=subcompetency,
-                program=trainee.program
-            ).distinct()
-            
-            # Get assessments for EPAs mapped to this sub-competency
-            subcompetency_assessments = trainee_assessments.filter(
-                assessment_epas__epa__in=mapped_epas
-            ).distinct()
-            
-            # Calculate average entrustment level
-            avg_entrustment = subcompetency_assessments.aggregate(
-                avg=Avg('assessment_epas__entrustment_level')
-            )['avg']
-            
-            # Count total assessment EPAs (not just assessments, since one assessment can have multiple EPAs)
-            total_epa_assessments = trainee_assessments.filter(
-                assessment_epas__epa__in=mapped_epas
-            ).aggregate(
-                count=Count('assessment_epas__id')
-            )['count'] or 0
-            
-            # Round up to nearest 0.5 for milestone level (matching frontend logic)
-            milestone_level = None
-            if avg_entrustment:
-                milestone_level = min(5.0, max(1.0, round(avg_entrustment * 2) / 2))
+        for sub in entry['sub_competencies']:
+            subcompetency = sub['sub_competency']
+            avg_entrustment = sub['average_entrustment']
             
             subcompetency_data.append({
                 'id': str(subcompetency.id),
@@ -606,9 +456,9 @@ def competency_grid_data(request):
                 'title': subcompetency.title,
                 'core_competency_code': competency.code,
                 'average_entrustment': round(avg_entrustment, 2) if avg_entrustment else None,
-                'milestone_level': milestone_level,
-                'total_assessments': total_epa_assessments,
-                'mapped_epas_count': mapped_epas.count(),
+                'milestone_level': sub['milestone_level'],
+                'total_assessments': sub['rating_count'],
+                'mapped_epas_count': sub['mapped_epas_count'],
                 'has_data': avg_entrustment is not None
             })
         
@@ -628,7 +478,7 @@ def competency_grid_data(request):
         total_avg = sum(sub['average_entrustment'] for sub in subcompetencies_with_data)
         overall_avg = round(total_avg / len(subcompetencies_with_data), 2)
     
-    return JsonResponse({
+    return FastJsonResponse({
         'trainee': {
             'id': str(trainee.id),
             'name': trainee.name,
@@ -642,7 +492,7 @@ def competency_grid_data(request):
             'subcompetencies_with_data': len(subcompetencies_with_data),
             'coverage_percentage': round((len(subcompetencies_with_data) / len(all_subcompetencies)) * 100, 1) if all_subcompetencies else 0,
             'overall_average_entrustment': overall_avg,
-            'total_assessments': trainee_assessments.count(),
+            'total_assessments': aggregations.assessment_count(scope),
             'date_range': {
                 'start_date': start_date_str,
                 'end_date': end_date_str
@@ -650,6 +500,71 @@ def competency_grid_data(request):
         }
     })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def competency_matrix_data(request):
+    """Get the trainee x sub-competency average entrustment matrix for the whole program"""
+    if request.user.role not in ['leadership', 'admin']:
+        return FastJsonResponse({'error': 'Only leadership can view the competency matrix'}, status=403)
+    
+    if not request.user.program:
+        return FastJsonResponse({'error': 'User is not assigned to a program'}, status=400)
+    
+    program = request.user.program
+    cohort_id = request.GET.get('cohort')
+    start_date_str = request.GET.get('start_date')
+    end_date_str = request.GET.get('end_date')
+    
+    # Parse date filters
+    start_date = None
+    end_date = None
+    
+    if start_date_str:
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return FastJsonResponse({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, status=400)
+    
+    if end_date_str:
+        try:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return FastJsonResponse({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, status=400)
+    
+    trainees_query = User.objects.filter(
+        role='trainee',
+        program=program
+    ).select_related('cohort').order_by('name')
+    
+    # Apply cohort filter if provided
+    if cohort_id:
+        try:
+            cohort = Cohort.objects.get(id=cohort_id, program=program)
+            trainees_query = trainees_query.filter(cohort=cohort)
+        except (Cohort.DoesNotExist, ValidationError):
+            return FastJsonResponse({'error': 'Cohort not found'}, status=404)
+    
+    scope = aggregations.rollup_scope(
+        program,
+        start_date=start_date,
+        end_date=end_date,
+        statuses=['submitted']
+    )
+    matrix = CompetencyMatrix.for_program(program, scope, trainees_query)
+    
+    return FastJsonResponse({
+        'program': {
+            'id': str(program.id),
+            'name': program.name
+        },
+        'filters': {
+            'cohort_id': cohort_id,
+            'start_date': start_date.strftime('%Y-%m-%d') if start_date else None,
+            'end_date': end_date.strftime('%Y-%m-%d') if end_date else None
+        },
+        **matrix.as_dict()
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def trainee_performance_data(request):
@@ -657,7 +572,7 @@ def trainee_performance_data(request):
     
     # Get the user's program
     if not request.user.program:
-        return JsonResponse({'error': 'User is not assigned to a program'}, status=400)
+        return FastJsonResponse({'error': 'User is not assigned to a program'}, status=400)
     
     program = request.user.program
     
@@ -671,20 +586,12 @@ def trainee_performance_data(request):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=months * 30)
     
-    # Filter assessments by date range
-    assessments_filter = Q(
-        trainee__program=program, 
-        status='submitted',
-        shift_date__gte=start_date.date(),
-        shift_date__lte=end_date.date()
-    )
-    
     # Get trainees query
     trainees_query = User.objects.filter(
         role='trainee',
         program=program,
         deactivated_at__isnull=True  # Only active trainees
-    )
+    ).select_related('cohort')
     
     # Apply cohort filter if provided
     if cohort_id:
@@ -692,31 +599,29 @@ def trainee_performance_data(request):
             cohort = Cohort.objects.get(id=cohort_id, program=program)
             trainees_query = trainees_query.filter(cohort=cohort)
         except Cohort.DoesNotExist:
-            return JsonResponse({'error': 'Cohort not found'}, status=404)
+            return FastJsonResponse({'error': 'Cohort not found'}, status=404)
+    
+    trainees = list(trainees_query)
+    trainee_ids = [trainee.id for trainee in trainees]
+    
+    # Submitted assessments in the date range, read from the entrustment rollups
+    scope = aggregations.rollup_scope(
+        program,
+        start_date=start_date.date(),
+        end_date=end_date.date(),
+        statuses=['submitted']
+    )
+    period_stats = aggregations.trainee_stats(scope, trainee_ids)
+    lifetime_counts = aggregations.lifetime_assessment_counts(trainee_ids, statuses=['submitted'])
     
     # Get trainee performance data
     trainee_performance = []
     
-    for trainee in trainees_query:
-        # Get assessments for this trainee with date filtering
-        trainee_assessments = Assessment.objects.filter(
-            assessments_filter & Q(trainee=trainee)
-        )
-        
-        # Calculate metrics
-        total_assessments = trainee_assessments.count()
-        avg_entrustment = trainee_assessments.aggregate(
-            avg=Avg('assessment_epas__entrustment_level')
-        )['avg']
-        
-        # Get latest assessment date
-        latest_assessment = trainee_assessments.order_by('-created_at').first()
-        
-        # Get all-time assessment count (not filtered by date)
-        lifetime_assessments = Assessment.objects.filter(
-            trainee=trainee,
-            status='submitted'
-        ).count()
+    for trainee in trainees:
+        stats = period_stats[trainee.id]
+        total_assessments = stats['assessment_count']
+        avg_entrustment = aggregations.average(stats['level_sum'], stats['rating_count'])
+        latest_assessment_date = stats['last_created_at']
         
         trainee_performance.append({
             'id': str(trainee.id),
@@ -724,9 +629,9 @@ def trainee_performance_data(request):
             'cohort_id': str(trainee.cohort.id) if trainee.cohort else None,
             'cohort_name': trainee.cohort.name if trainee.cohort else 'No Cohort',
             'total_assessments': total_assessments,
-            'lifetime_assessments': lifetime_assessments,
+            'lifetime_assessments': lifetime_counts.get(trainee.id, 0),
             'avg_entrustment_level': round(avg_entrustment, 2) if avg_entrustment else None,
-            'latest_assessment_date': latest_assessment.created_at.isoformat() if latest_assessment else None,
+            'latest_assessment_date': latest_assessment_date.isoformat() if latest_assessment_date else None,
             'has_assessments': total_assessments > 0
         })
     
@@ -763,17 +668,19 @@ def trainee_performance_data(request):
         )
     
     # Get cohorts for filter dropdown
-    cohorts = Cohort.objects.filter(program=program).order_by('-start_date')
+    cohorts = Cohort.objects.filter(program=program).order_by('-start_date').annotate(
+        trainee_count=Count('users', filter=Q(users__role='trainee'))
+    )
     cohort_options = [
         {
             'id': str(cohort.id),
             'name': cohort.name,
-            'trainee_count': User.objects.filter(role='trainee', cohort=cohort).count()
+            'trainee_count': cohort.trainee_count
         }
         for cohort in cohorts
     ]
     
-    return JsonResponse({
+    return FastJsonResponse({
         'trainees': trainee_performance,
         'cohorts': cohort_options,
         'summary': {
@@ -0,0 +1,119 @@
+"""
+Helpers for the shared cache tier (settings.CACHES['default']).
+
+The lockout counters (users.lockout), session activity stamps
+(users.authentication) and any response caching all live in the default
+cache, which is shared by every worker unless CACHE_BACKEND=locmem.
+
+Counters need an atomic increment. Redis and the local memory backend provide
+one; the database and file backends implement incr() as a read and a write, so
+with those backends counters are kept in the cache_counters table
+(users.CacheCounter) and incremented with a single UPDATE.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+# Backends whose add() and incr() are single atomic operations
+ATOMIC_COUNTER_BACKENDS = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def counters_in_cache():
+    """Whether counters can live in the default cache itself"""
+    return settings.CACHES['default']['BACKEND'] in ATOMIC_COUNTER_BACKENDS
+
+
+def increment(key, delta=1, timeout=DEFAULT_TIMEOUT):
+    """
+    Atomically add delta to a counter, creating it when missing.
+
+    Concurrent workers never lose an increment: on Redis and the local memory
+    backend add() and incr() are atomic, and on the other backends the counter
+    row is updated in place with `value = value + delta`.
+
+    Args:
+        key: Cache key of the counter
+        delta: Amount to add
+        timeout: Seconds until the counter expires, restarted on every
+            increment (default: the cache's TIMEOUT; None never expires)
+
+    Returns:
+        int: The new value
+    """
+    if not counters_in_cache():
+        return _increment_row(key, delta, timeout)
+
+    for _ in range(3):
+        if cache.add(key, delta, timeout):
+            return delta
+        try:
+            value = cache.incr(key, delta)
+        except ValueError:
+            continue  # Expired between add() and incr()
+        # incr() keeps the expiry on some backends and resets it on others
+        cache.touch(key, timeout)
+        return value
+    raise RuntimeError(f'Could not increment cache key {key}')
+
+
+def get_count(key):
+    """Current value of a counter kept with increment(), 0 when missing or expired"""
+    if counters_in_cache():
+        return cache.get(key, 0)
+
+    from users.models import CacheCounter
+    value = CacheCounter.objects.filter(_live(timezone.now()), key=key).values_list('value', flat=True).first()
+    return value or 0
+
+
+def reset_count(key):
+    """Delete a counter kept with increment()"""
+    if counters_in_cache():
+        cache.delete(key)
+    else:
+        from users.models import CacheCounter
+        CacheCounter.objects.filter(key=key).delete()
+
+
+def purge_expired_counters(now=None):
+    """Delete expired counter rows; returns the number deleted"""
+    from users.models import CacheCounter
+    deleted, _ = CacheCounter.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+def _live(now):
+    return Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+
+
+def _increment_row(key, delta, timeout):
+    from users.models import CacheCounter
+
+    expiry = cache.get_backend_timeout(timeout)
+    expires_at = None if expiry is None else datetime.fromtimestamp(expiry, tz=dt_timezone.utc)
+    for _ in range(3):
+        now = timezone.now()
+        counters = CacheCounter.objects.filter(key=key)
+        with transaction.atomic():
+            # The UPDATE holds the row lock until commit, so the value read back is this increment's
+            if counters.filter(_live(now)).update(value=F('value') + delta, expires_at=expires_at):
+                return counters.values_list('value', flat=True).get()
+            # Only one concurrent increment restarts an expired counter; the others retry
+            if counters.filter(expires_at__lte=now).update(value=delta, expires_at=expires_at):
+                return delta
+            try:
+                with transaction.atomic():
+                    CacheCounter.objects.create(key=key, value=delta, expires_at=expires_at)
+                return delta
+            except IntegrityError:
+                continue  # Created by a concurrent increment
+    raise RuntimeError(f'Could not increment counter {key}')
@@ -0,0 +1,70 @@
+"""
+Fast JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Types JSON has no notation for (UUIDs, Decimals, dates, times,
+datetimes, lazy strings) are handed to the same encoder the stdlib path uses:
+DRF's JSONEncoder for the renderer and DjangoJSONEncoder for JsonResponse, so
+switching encoders does not change how values are written.
+
+- FastJSONRenderer: DRF renderer (REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'])
+- FastJsonResponse: drop-in replacement for django.http.JsonResponse
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+if orjson is not None:
+    # Dates go through the encoder (millisecond precision, 'Z' for UTC); dict keys
+    # such as the entrustment level numbers are allowed to be non-strings
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoders = {}
+
+
+def dumps(data, encoder_class=DjangoJSONEncoder):
+    """Encode data as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        if encoder_class not in _encoders:
+            _encoders[encoder_class] = encoder_class()
+        return orjson.dumps(data, default=_encoders[encoder_class].default, option=ORJSON_OPTIONS)
+    return json.dumps(data, cls=encoder_class, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer using dumps(); indented output (browsable API, ?indent) keeps the stdlib path"""
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, self.encoder_class)
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    JsonResponse encoded with dumps().
+
+    Args:
+        data: Data to encode; must be a dict unless safe=False
+        safe: Refuse non-dict data, like JsonResponse
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
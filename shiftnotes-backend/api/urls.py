@@ -6,8 +6,11 @@ from users.support_views import submit_support_request
 from users.contact_views import submit_contact_form
 from organizations.views import OrganizationViewSet, ProgramViewSet, SiteViewSet
 from curriculum.views import EPACategoryViewSet, EPAViewSet, CoreCompetencyViewSet, SubCompetencyViewSet, SubCompetencyEPAViewSet
-from assessments.views import AssessmentViewSet, export_assessments, export_competency_grid
-from analytics.views import program_performance_data, faculty_dashboard_data, competency_progress_data, competency_grid_data, trainee_performance_data
+from assessments.views import (
+    AssessmentViewSet, export_assessments, export_competency_grid,
+    create_export_job, export_job_status, download_export_job
+)
+from analytics.views import program_performance_data, faculty_dashboard_data, competency_progress_data, competency_grid_data, competency_matrix_data, trainee_performance_data
 
 router = DefaultRouter()
 
@@ -46,8 +49,12 @@ urlpatterns = [
     path('analytics/faculty-dashboard/', faculty_dashboard_data, name='faculty_dashboard_data'),
     path('analytics/competency-progress/', competency_progress_data, name='competency_progress_data'),
     path('analytics/competency-grid/', competency_grid_data, name='competency_grid_data'),
+    path('analytics/competency-matrix/', competency_matrix_data, name='competency_matrix_data'),
     path('analytics/trainee-performance/', trainee_performance_data, name='trainee_performance_data'),
     # Export endpoints
     path('exports/assessments/', export_assessments, name='export_assessments'),
     path('exports/competency-grid/', export_competency_grid, name='export_competency_grid'),
+    path('exports/jobs/', create_export_job, name='create_export_job'),
+    path('exports/jobs/<uuid:job_id>/', export_job_status, name='export_job_status'),
+    path('exports/jobs/<uuid:job_id>/download/', download_export_job, name='download_export_job'),
 ]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Assessment, AssessmentEPA
+from .models import Assessment, AssessmentEPA, ExportJob, IdempotencyKey
 
 
 class AssessmentEPAInline(admin.TabularInline):
@@ -67,3 +67,26 @@ class AssessmentEPAAdmin(admin.ModelAdmin):
         """Optimize query to reduce database hits"""
         qs = super().get_queryset(request)
         return qs.select_related('assessment', 'epa', 'assessment__trainee', 'epa__program')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'export_type', 'status', 'requested_by', 'program', 'rows_written', 'created_at', 'expires_at']
+    list_filter = ['export_type', 'status', 'program', 'created_at']
+    search_fields = ['requested_by__name', 'requested_by__email']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'started_at', 'completed_at']
+    
+    def get_queryset(self, request):
+        """Optimize query to reduce database hits"""
+        qs = super().get_queryset(request)
+        return qs.select_related('requested_by', 'program')
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'status_code', 'created_at', 'expires_at']
+    search_fields = ['key', 'user__name', 'user__email']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at']
+    list_select_related = ['user']
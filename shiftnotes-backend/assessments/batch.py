@@ -0,0 +1,97 @@
+"""
+Batch assessment submission.
+
+Faculty often complete several assessments after a shift and submit them from
+the mobile app in one request. Each item is validated on its own, referenced
+trainees and EPAs are resolved with one query each for the whole batch, and all
+valid items are inserted with bulk_create in a single transaction.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from analytics.rollups import refresh_rollups
+from curriculum.models import EPA
+from .mailbox import adjust_unread, is_mailbox_assessment
+from .models import Assessment, AssessmentEPA
+from .search import index_assessments
+from .serializers import AssessmentBatchItemSerializer
+
+User = get_user_model()
+
+MAX_BATCH_SIZE = 50
+
+
+def create_assessment_batch(evaluator, items):
+    """
+    Create the valid assessments of a batch, evaluated by `evaluator`.
+
+    Args:
+        evaluator: User submitting the batch; must belong to a program
+        items: List of assessment payloads
+
+    Returns:
+        List with one result per item, in order: {'index', 'status': 'created', 'id'}
+        or {'index', 'status': 'error', 'errors'}
+    """
+    results = [None] * len(items)
+    validated = []
+    for index, item in enumerate(items):
+        serializer = AssessmentBatchItemSerializer(data=item)
+        if serializer.is_valid():
+            validated.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    trainee_ids = {data['trainee'] for _, data in validated}
+    epa_ids = {rating['epa'] for _, data in validated for rating in data['assessment_epas']}
+    trainees = set(User.objects.filter(
+        id__in=trainee_ids, program=evaluator.program, role='trainee'
+    ).values_list('id', flat=True))
+    epas = set(EPA.objects.filter(
+        id__in=epa_ids, program=evaluator.program, is_active=True
+    ).values_list('id', flat=True))
+
+    assessments = []
+    ratings = []
+    for index, data in validated:
+        errors = {}
+        if data['trainee'] not in trainees:
+            errors['trainee'] = ['Trainee not found in your program.']
+        unknown_epas = [str(rating['epa']) for rating in data['assessment_epas'] if rating['epa'] not in epas]
+        if unknown_epas:
+            errors['assessment_epas'] = [f'EPA not found in your program: {epa_id}' for epa_id in unknown_epas]
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+            continue
+
+        assessment = Assessment(
+            trainee_id=data['trainee'],
+            evaluator=evaluator,
+            shift_date=data['shift_date'],
+            location=data['location'],
+            status=data['status'],
+            private_comments=data['private_comments'],
+            what_went_well=data['what_went_well'],
+            what_could_improve=data['what_could_improve'],
+        )
+        assessments.append(assessment)
+        ratings.extend(
+            AssessmentEPA(assessment=assessment, epa_id=rating['epa'], entrustment_level=rating['entrustment_level'])
+            for rating in data['assessment_epas']
+        )
+        results[index] = {'index': index, 'status': 'created', 'id': str(assessment.id)}
+
+    if assessments:
+        with transaction.atomic():
+            Assessment.objects.bulk_create(assessments)
+            AssessmentEPA.objects.bulk_create(ratings)
+            # bulk_create skips the model signals that keep the rollups, mailbox counters
+            # and search index current
+            refresh_rollups({(assessment.trainee_id, assessment.shift_date) for assessment in assessments})
+            adjust_unread(evaluator.program_id, sum(
+                1 for assessment in assessments
+                if is_mailbox_assessment(assessment.status, assessment.private_comments)
+            ))
+            index_assessments(assessments)
+
+    return results
@@ -0,0 +1,426 @@
+"""
+Row generators for the assessment exports.
+
+Each export is produced as an iterator of CSV rows so views can stream it with
+StreamingHttpResponse instead of building the whole file in memory. The
+assessment export can also be written as Parquet, one row group per chunk.
+"""
+import csv
+import tempfile
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from analytics.aggregations import rollup_scope
+from analytics.matrix import CompetencyMatrix
+from curriculum.models import SubCompetency
+from users.models import User
+from .models import AssessmentEPA, ExportJob
+
+
+# Rows fetched per round trip when streaming; keeps worker memory flat for any date range
+EXPORT_CHUNK_SIZE = 2000
+
+ASSESSMENT_EXPORT_FORMATS = ['csv', 'parquet']
+
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+
+# (CSV header, Parquet column) in export order
+ASSESSMENT_EXPORT_COLUMNS = [
+    ('Trainee Name', 'trainee_name'),
+    ('Trainee Email', 'trainee_email'),
+    ('Cohort', 'cohort'),
+    ('Evaluator Name', 'evaluator_name'),
+    ('Assessment Date', 'assessment_date'),
+    ('Location', 'location'),
+    ('EPA Code', 'epa_code'),
+    ('EPA Title', 'epa_title'),
+    ('EPA Category', 'epa_category'),
+    ('Entrustment Level', 'entrustment_level'),
+    ('What Went Well', 'what_went_well'),
+    ('What Could Improve', 'what_could_improve'),
+    ('Private Comments', 'private_comments'),
+    ('Assessment Created', 'assessment_created'),
+]
+
+ASSESSMENT_EXPORT_HEADER = [header for header, _ in ASSESSMENT_EXPORT_COLUMNS]
+
+COMPETENCY_GRID_LAYOUTS = ['long', 'wide']
+
+COMPETENCY_GRID_HEADER = [
+    'Trainee Name',
+    'Cohort',
+    'Core Competency',
+    'Sub-Competency',
+    'Avg Entrustment',
+    'Assessment Count',
+]
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield each row as an encoded CSV line"""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row).encode('utf-8')
+
+
+def assessment_export_queryset(program, start_date, end_date, cohort_id=None, trainee_id=None):
+    """AssessmentEPAs of completed assessments in the program, with everything the export reads"""
+    assessment_epas = AssessmentEPA.objects.filter(
+        assessment__trainee__program=program,
+        assessment__shift_date__gte=start_date,
+        assessment__shift_date__lte=end_date,
+        assessment__status__in=['submitted', 'locked']  # Only completed assessments
+    ).select_related(
+        'assessment',
+        'assessment__trainee',
+        'assessment__trainee__cohort',
+        'assessment__evaluator',
+        'epa',
+        'epa__category'
+    ).order_by('assessment__shift_date', 'assessment__trainee__name')
+
+    if cohort_id:
+        assessment_epas = assessment_epas.filter(assessment__trainee__cohort_id=cohort_id)
+    if trainee_id:
+        assessment_epas = assessment_epas.filter(assessment__trainee_id=trainee_id)
+
+    return assessment_epas
+
+
+def assessment_records(assessment_epas):
+    """
+    Yield one tuple of typed values per AssessmentEPA, in ASSESSMENT_EXPORT_COLUMNS order.
+
+    The queryset is read with a chunked cursor (server-side on PostgreSQL), so
+    only EXPORT_CHUNK_SIZE rows are held in memory at a time.
+    """
+    for assessment_epa in assessment_epas.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        assessment = assessment_epa.assessment
+        yield (
+            assessment.trainee.name,
+            assessment.trainee.email,
+            assessment.trainee.cohort.name if assessment.trainee.cohort else '',
+            assessment.evaluator.name,
+            assessment.shift_date,
+            assessment.location,
+            assessment_epa.epa.code,
+            assessment_epa.epa.title,
+            assessment_epa.epa.category.title if assessment_epa.epa.category else '',
+            assessment_epa.entrustment_level,
+            assessment.what_went_well,
+            assessment.what_could_improve,
+            assessment.private_comments,  # Leadership can see private comments
+            assessment.created_at,
+        )
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def assessment_rows(assessment_epas):
+    """Yield the assessment CSV export, header first, one row per AssessmentEPA"""
+    yield ASSESSMENT_EXPORT_HEADER
+
+    for record in assessment_records(assessment_epas):
+        yield [_csv_value(value) for value in record]
+
+
+def write_assessments_parquet(assessment_epas, output, on_row_group=None):
+    """
+    Write the assessment export to a binary file object as Parquet.
+
+    Columns are typed (dates, timestamps, int8 entrustment level) and the
+    repetitive strings (cohort, location, EPA) are dictionary-encoded so they
+    load as categoricals. Each EXPORT_CHUNK_SIZE rows become one row group.
+
+    Args:
+        on_row_group: Optional callback receiving the running row count
+    Returns:
+        Number of rows written
+    """
+    # Imported here so web workers that never export Parquet don't load pyarrow
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    string_dictionary = pa.dictionary(pa.int32(), pa.string())
+    column_types = {
+        'cohort': string_dictionary,
+        'assessment_date': pa.date32(),
+        'location': string_dictionary,
+        'epa_code': string_dictionary,
+        'epa_title': string_dictionary,
+        'epa_category': string_dictionary,
+        'entrustment_level': pa.int8(),
+        'assessment_created': pa.timestamp('us', tz='UTC'),
+    }
+    schema = pa.schema([
+        (name, column_types.get(name, pa.string())) for _, name in ASSESSMENT_EXPORT_COLUMNS
+    ])
+
+    def record_batch(records):
+        arrays = []
+        for field, values in zip(schema, zip(*records)):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    rows_written = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        records = []
+        for record in assessment_records(assessment_epas):
+            records.append(record)
+            if len(records) == EXPORT_CHUNK_SIZE:
+                writer.write_batch(record_batch(records))
+                rows_written += len(records)
+                records = []
+                if on_row_group:
+                    on_row_group(rows_written)
+        if records:
+            writer.write_batch(record_batch(records))
+            rows_written += len(records)
+
+    return rows_written
+
+
+def competency_grid_rows(program, start_date=None, end_date=None, cohort_id=None, layout='long'):
+    """
+    Yield the competency grid export, header first.
+
+    Args:
+        program: Program to export
+        start_date, end_date: Optional inclusive shift date bounds
+        cohort_id: Optional cohort filter
+        layout: 'long' for one row per trainee and sub-competency,
+            'wide' for one row per trainee and one column per sub-competency
+    """
+    trainees = User.objects.filter(
+        role='trainee',
+        program=program
+    ).select_related('cohort').order_by('name')
+
+    if cohort_id:
+        trainees = trainees.filter(cohort_id=cohort_id)
+
+    scope = rollup_scope(program, start_date=start_date, end_date=end_date, statuses=['submitted'])
+    matrix = CompetencyMatrix.for_program(program, scope, trainees)
+
+    if layout == 'wide':
+        yield ['Trainee Name', 'Cohort'] + [
+            f'{sub_competency.core_competency.title} - {sub_competency.title}'
+            for sub_competency in matrix.sub_competencies
+        ]
+    else:
+        yield COMPETENCY_GRID_HEADER
+
+    for trainee, cells in matrix.rows():
+        cohort_name = trainee.cohort.name if trainee.cohort else ''
+
+        if layout == 'wide':
+            yield [trainee.name, cohort_name] + [
+                round(avg_entrustment, 2) if avg_entrustment else ''
+                for _, avg_entrustment, _ in cells
+            ]
+            continue
+
+        for sub_competency, avg_entrustment, rating_count in cells:
+            yield [
+                trainee.name,
+                cohort_name,
+                sub_competency.core_competency.title,
+                sub_competency.title,
+                round(avg_entrustment, 2) if avg_entrustment else '',
+                rating_count,
+            ]
+
+
+def validate_export_parameters(export_type, data):
+    """
+    Validate the query parameters of an export and return them as a JSON-safe dict.
+
+    Raises:
+        ValueError: With a message suitable for the API response
+    """
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+
+    if export_type == 'assessments' and (not start_date or not end_date):
+        raise ValueError('start_date and end_date are required parameters')
+
+    for name, value in (('start_date', start_date), ('end_date', end_date)):
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid {name} format. Use YYYY-MM-DD')
+
+    parameters = {
+        'start_date': start_date or None,
+        'end_date': end_date or None,
+        'cohort_id': data.get('cohort_id') or None,
+    }
+
+    if export_type == 'assessments':
+        parameters['trainee_id'] = data.get('trainee_id') or None
+        export_format = data.get('format') or 'csv'
+        if export_format not in ASSESSMENT_EXPORT_FORMATS:
+            raise ValueError(f'Invalid format. Use one of: {", ".join(ASSESSMENT_EXPORT_FORMATS)}')
+        parameters['format'] = export_format
+    else:
+        layout = data.get('layout') or 'long'
+        if layout not in COMPETENCY_GRID_LAYOUTS:
+            raise ValueError(f'Invalid layout. Use one of: {", ".join(COMPETENCY_GRID_LAYOUTS)}')
+        parameters['layout'] = layout
+
+    return parameters
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def job_assessment_queryset(job):
+    """The AssessmentEPAs selected by an assessments export job"""
+    parameters = job.parameters
+    return assessment_export_queryset(
+        job.program,
+        _parse_date(parameters['start_date']),
+        _parse_date(parameters['end_date']),
+        cohort_id=parameters.get('cohort_id'),
+        trainee_id=parameters.get('trainee_id')
+    )
+
+
+def export_job_rows(job):
+    """Return (rows, total_data_rows) for a job, from its stored parameters"""
+    parameters = job.parameters
+    start_date = _parse_date(parameters.get('start_date'))
+    end_date = _parse_date(parameters.get('end_date'))
+    cohort_id = parameters.get('cohort_id')
+
+    if job.export_type == 'assessments':
+        assessment_epas = job_assessment_queryset(job)
+        return assessment_rows(assessment_epas), assessment_epas.count()
+
+    trainees = User.objects.filter(role='trainee', program=job.program)
+    if cohort_id:
+        trainees = trainees.filter(cohort_id=cohort_id)
+    total_rows = trainees.count()
+    if parameters.get('layout') != 'wide':
+        total_rows *= SubCompetency.objects.filter(core_competency__program=job.program).count()
+
+    rows = competency_grid_rows(
+        job.program,
+        start_date=start_date,
+        end_date=end_date,
+        cohort_id=cohort_id,
+        layout=parameters.get('layout', 'long')
+    )
+    return rows, total_rows
+
+
+def claim_export_job(job_id):
+    """
+    Mark a pending job as running and return it (None when another worker has
+    it or it has already finished).
+
+    A job still marked running is only taken over once it has been running
+    for TASK_LOCK_TIMEOUT_MINUTES, the point where the task queue presumes
+    its worker dead.
+    """
+    now = timezone.now()
+    abandoned = now - timedelta(minutes=settings.TASK_LOCK_TIMEOUT_MINUTES)
+    claimed = ExportJob.objects.filter(
+        Q(status='pending') | Q(status='running', started_at__lt=abandoned), id=job_id
+    ).update(status='running', started_at=now)
+    if not claimed:
+        return None
+    return ExportJob.objects.get(id=job_id)
+
+
+def run_export_job(job, final=True):
+    """
+    Write a job's file (CSV, or Parquet for assessments with format=parquet)
+    to a temporary file, then attach it to the job.
+
+    Progress is saved every EXPORT_CHUNK_SIZE rows so clients polling the job
+    can show it. A failure is recorded on the job. On the final attempt the
+    job is marked failed; otherwise it goes back to pending and the error is
+    raised so the task is retried.
+    """
+    def save_progress(rows_written):
+        ExportJob.objects.filter(id=job.id).update(rows_written=rows_written)
+
+    try:
+        export_format = job.parameters.get('format', 'csv')
+
+        with tempfile.TemporaryFile(mode='w+b') as output:
+            if export_format == 'parquet':
+                assessment_epas = job_assessment_queryset(job)
+                total_rows = assessment_epas.count()
+                ExportJob.objects.filter(id=job.id).update(total_rows=total_rows)
+                rows_written = write_assessments_parquet(assessment_epas, output, on_row_group=save_progress)
+            else:
+                rows, total_rows = export_job_rows(job)
+                ExportJob.objects.filter(id=job.id).update(total_rows=total_rows)
+
+                lines = stream_csv(rows)
+                rows_written = 0
+                output.write(next(lines))  # Header row, not counted
+                for line in lines:
+                    output.write(line)
+                    rows_written += 1
+                    if rows_written % EXPORT_CHUNK_SIZE == 0:
+                        save_progress(rows_written)
+
+            timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+            output.seek(0)
+            job.file.save(f'{job.export_type}_export_{timestamp}.{export_format}', File(output), save=False)
+
+        job.total_rows = total_rows
+        job.rows_written = rows_written
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.expires_at = job.completed_at + timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+        job.save()
+    except Exception as e:
+        job.error = str(e)
+        if not final:
+            job.status = 'pending'
+            job.save(update_fields=['status', 'error'])
+            raise
+        job.status = 'failed'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+
+    return job
+
+
+def purge_expired_exports(now=None):
+    """Delete the files of jobs past their retention period; returns the number purged"""
+    now = now or timezone.now()
+    purged = 0
+    for job in ExportJob.objects.filter(status='completed', expires_at__lte=now):
+        if job.file:
+            job.file.delete(save=False)
+        job.status = 'expired'
+        job.save(update_fields=['status', 'file'])
+        purged += 1
+    return purged
@@ -0,0 +1,133 @@
+"""
+Idempotency-Key support for assessment writes.
+
+Mobile clients retry a write when the connection drops before the response
+arrives. If the write is sent with an `Idempotency-Key` header, the first
+response is stored and replayed to every retry with the same key (for the same
+user) until IDEMPOTENCY_KEY_TTL_HOURS have passed, without running the write
+again. Replayed responses carry an `Idempotent-Replayed: true` header.
+
+- Reusing a key for a different request (method, path or body) returns 422.
+- A retry that arrives while the original is still running returns 409. A
+  request holds its key for IDEMPOTENCY_KEY_LEASE_MINUTES; after that the
+  worker is presumed dead (killed by a timeout, OOM or redeploy) and a retry
+  takes the key over and runs the write.
+- Responses with a 5xx status or an exception (validation errors included) are
+  not stored, so the request can be retried with the same key.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    raw = f'{request.method} {request.path}\n{body}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def reserve_key(user, key, fingerprint):
+    """
+    Claim a key for a new request.
+
+    Returns:
+        (record, created); an expired record, or one whose request has held it
+        past the lease without finishing, is replaced and counts as created
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, request_fingerprint=fingerprint, expires_at=expires_at
+            ), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.get(user=user, key=key)
+    lease_cutoff = now - timedelta(minutes=settings.IDEMPOTENCY_KEY_LEASE_MINUTES)
+    abandoned = record.status_code is None and record.created_at < lease_cutoff
+    if record.expires_at > now and not abandoned:
+        return record, False
+
+    # Only one concurrent retry wins the expired or abandoned record
+    lease_expired = Q(status_code__isnull=True, created_at__lt=lease_cutoff)
+    replaced = IdempotencyKey.objects.filter(
+        Q(expires_at__lte=now) | lease_expired, pk=record.pk, created_at=record.created_at
+    ).update(
+        request_fingerprint=fingerprint, status_code=None, response_body=None,
+        created_at=now, expires_at=expires_at
+    )
+    record.refresh_from_db()
+    return record, bool(replaced)
+
+
+def idempotent(view_method):
+    """Decorator for viewset write methods honouring the Idempotency-Key header"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        # partial_update calls update internally; only the outer call handles the key
+        if not key or getattr(request, '_idempotency_handled', False):
+            return view_method(self, request, *args, **kwargs)
+        request._idempotency_handled = True
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, created = reserve_key(request.user, key, fingerprint)
+
+        if not created:
+            if record.request_fingerprint != fingerprint:
+                return Response(
+                    {'detail': 'Idempotency-Key was already used for a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status_code is None:
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key is still being processed.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            response = Response(record.response_body, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys(now=None):
+    """Delete keys past their TTL; returns the number deleted"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
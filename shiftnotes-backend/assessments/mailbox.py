@@ -0,0 +1,180 @@
+"""
+Leadership mailbox: submitted assessments with private comments, per program.
+
+Each leadership/admin user's unread count is kept in MailboxCounter so that
+mailbox/count is a primary-key lookup instead of an anti-join over every
+submitted assessment. Counters are created lazily on first read (see
+unread_count) and adjusted by the signal handlers in assessments.signals
+whenever an assessment enters or leaves a mailbox or is marked read. Code
+that writes in bulk (bulk_create, queryset.update) must call adjust_unread
+itself, as mark_read does; reconcile_mailbox_counters repairs any drift.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, OuterRef, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Assessment, MailboxCounter
+from .pagination import decode_cursor
+
+User = get_user_model()
+
+MAILBOX_ROLES = ['leadership', 'admin']
+MARK_READ_BATCH_SIZE = 5000  # Acknowledgements per INSERT
+
+
+def mailbox_assessments(program_id):
+    """
+    Assessments that appear in the mailbox of the program's leadership.
+
+    Filters on the generated in_mailbox flag (submitted, non-empty private
+    comments) to match the assessments_mailbox_idx partial index, so the
+    database walks only mailbox rows, newest first.
+    """
+    if not program_id:
+        return Assessment.objects.none()
+    return Assessment.objects.filter(in_mailbox=True, trainee__program_id=program_id)
+
+
+def read_by(user):
+    """Correlated EXISTS on the acknowledged_by join table for the outer assessment"""
+    return Exists(Assessment.acknowledged_by.through.objects.filter(
+        assessment_id=OuterRef('pk'), user_id=user.id
+    ))
+
+
+def unread_mailbox(user):
+    return mailbox_assessments(user.program_id).filter(~read_by(user))
+
+
+def read_mailbox(user):
+    return mailbox_assessments(user.program_id).filter(read_by(user))
+
+
+def is_mailbox_assessment(status, private_comments):
+    return status == 'submitted' and bool(private_comments)
+
+
+def count_unread(user):
+    """Live count of the user's unread mailbox assessments"""
+    return unread_mailbox(user).count()
+
+
+def unread_count(user):
+    """
+    The user's unread count from their counter, computed and stored on first use.
+
+    The counter row is committed empty (unread_count null) before the count
+    is taken, then locked while it is counted. adjust_unread updates empty
+    rows too, so a concurrent adjustment either holds the row until its
+    transaction commits (and the count then includes it) or waits for the
+    count and applies on top of it.
+    """
+    stored = MailboxCounter.objects.filter(user=user).values_list('unread_count', flat=True).first()
+    if stored is not None:
+        return stored
+
+    try:
+        with transaction.atomic():
+            MailboxCounter.objects.get_or_create(user=user)
+    except IntegrityError:
+        pass  # Created by a concurrent request
+
+    with transaction.atomic():
+        counter = MailboxCounter.objects.select_for_update().get(user=user)
+        if counter.unread_count is None:
+            counter.unread_count = count_unread(user)
+            counter.save(update_fields=['unread_count'])
+    return counter.unread_count
+
+
+def adjust_unread(program_id, delta, user_ids=None, exclude_user_ids=()):
+    """
+    Add delta to the counters of the program's leadership/admin users.
+
+    Args:
+        program_id: Program whose mailbox changed
+        delta: Change in unread assessments (negative when read or removed)
+        user_ids: Only adjust these users (default: everyone in the program)
+        exclude_user_ids: Users to skip, e.g. those who already read the assessment
+    """
+    if not program_id or not delta:
+        return
+    counters = MailboxCounter.objects.filter(user__program_id=program_id, user__role__in=MAILBOX_ROLES)
+    if user_ids is not None:
+        counters = counters.filter(user_id__in=user_ids)
+    if exclude_user_ids:
+        counters = counters.exclude(user_id__in=exclude_user_ids)
+    # Empty counters stay empty, but are still updated so the row lock orders this against unread_count()
+    counters.update(unread_count=Case(
+        When(unread_count__isnull=True, then=Value(None)),
+        default=Greatest(F('unread_count') + delta, Value(0)),
+        output_field=PositiveIntegerField(),
+    ))
+
+
+def mark_read(user, assessment_ids=None, up_to=None):
+    """
+    Mark many mailbox assessments read by the user.
+
+    The acknowledgements are written straight to the join table, bypassing the
+    m2m signal handlers, so this is one INSERT (per MARK_READ_BATCH_SIZE
+    rows), one UPDATE of updated_at for delta sync and one counter adjustment
+    however many assessments are marked.
+
+    Args:
+        user: Leadership/admin user
+        assessment_ids: Only these assessments (ids outside the user's unread
+            mailbox are ignored); None for every unread assessment
+        up_to: Mailbox pagination cursor; only assessments listed before it
+            (newer than or equal to its position) are marked
+
+    Returns:
+        Number of assessments marked read
+
+    Raises:
+        ValueError: For an invalid cursor
+    """
+    unread = unread_mailbox(user)
+    if assessment_ids is not None:
+        unread = unread.filter(pk__in=assessment_ids)
+    if up_to:
+        created_at, assessment_id = decode_cursor(up_to)
+        unread = unread.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=assessment_id))
+
+    ids = list(unread.order_by().values_list('pk', flat=True))
+    if not ids:
+        return 0
+
+    Acknowledgement = Assessment.acknowledged_by.through
+    with transaction.atomic():
+        Acknowledgement.objects.bulk_create(
+            [Acknowledgement(assessment_id=pk, user_id=user.pk) for pk in ids],
+            batch_size=MARK_READ_BATCH_SIZE,
+            ignore_conflicts=True,  # Marked read by a concurrent request
+        )
+        Assessment.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+        adjust_unread(user.program_id, -len(ids), user_ids=[user.pk])
+    return len(ids)
+
+
+def reconcile_mailbox_counters():
+    """
+    Recompute every stored counter from the assessments.
+
+    Returns:
+        Number of counters that were wrong (or stale, and deleted)
+    """
+    repaired = 0
+    for counter in MailboxCounter.objects.select_related('user'):
+        user = counter.user
+        if user.role not in MAILBOX_ROLES or not user.program_id:
+            counter.delete()
+            repaired += 1
+            continue
+        count = count_unread(user)
+        if counter.unread_count != count:
+            MailboxCounter.objects.filter(pk=counter.pk).update(unread_count=count)
+            repaired += 1
+    return repaired
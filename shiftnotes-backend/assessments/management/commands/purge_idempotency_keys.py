@@ -0,0 +1,17 @@
+"""
+Management command that deletes stored Idempotency-Key responses past their TTL.
+
+Usage:
+    python manage.py purge_idempotency_keys
+"""
+
+from django.core.management.base import BaseCommand
+from assessments.idempotency import purge_expired_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_HOURS'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} expired idempotency key(s)'))
@@ -0,0 +1,23 @@
+"""
+Management command that repopulates the assessment full-text search index.
+
+Only needed on SQLite, whose FTS5 table is maintained by signal handlers; on
+PostgreSQL the search column is generated by the database.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from assessments.search import rebuild_search_index, uses_fts5
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the SQLite full-text search table from assessment comments'
+
+    def handle(self, *args, **options):
+        if not uses_fts5():
+            self.stdout.write(self.style.SUCCESS('✅ Search column is generated by PostgreSQL; nothing to rebuild'))
+            return
+        indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {indexed} assessment(s)'))
@@ -0,0 +1,17 @@
+"""
+Management command that recomputes the leadership mailbox unread counters.
+
+Usage:
+    python manage.py reconcile_mailbox_counters
+"""
+
+from django.core.management.base import BaseCommand
+from assessments.mailbox import reconcile_mailbox_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored mailbox unread counters from the assessments and fix any that drifted'
+
+    def handle(self, *args, **options):
+        repaired = reconcile_mailbox_counters()
+        self.stdout.write(self.style.SUCCESS(f'✅ Mailbox counters reconciled ({repaired} repaired)'))
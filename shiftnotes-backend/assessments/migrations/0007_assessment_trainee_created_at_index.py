@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_export_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['trainee', 'created_at'], name='assessments_trainee_e65f0f_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:29
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0007_assessment_trainee_created_at_index'),
+        ('curriculum', '0005_make_category_description_optional'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentTombstone',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('object_type', models.CharField(choices=[('assessment', 'Assessment'), ('assessment_epa', 'Assessment EPA')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('assessment_id', models.UUIDField()),
+                ('program_id', models.UUIDField(blank=True, null=True)),
+                ('trainee_id', models.UUIDField()),
+                ('evaluator_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'assessment_tombstones',
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='assessmentepa',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['updated_at'], name='assessments_updated_de06ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessmentepa',
+            index=models.Index(fields=['updated_at'], name='assessment__updated_4dc84e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessmenttombstone',
+            index=models.Index(fields=['deleted_at'], name='assessment__deleted_56f80f_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0009_idempotency_key'),
+        ('users', '0009_add_login_attempt_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mailbox_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'mailbox_counters',
+            },
+        ),
+    ]
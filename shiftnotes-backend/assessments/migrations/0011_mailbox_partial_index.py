@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0010_mailbox_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='in_mailbox',
+            field=models.GeneratedField(db_persist=True, expression=models.ExpressionWrapper(models.Q(('private_comments__gt', ''), ('status', 'submitted')), output_field=models.BooleanField()), help_text='Submitted with private comments: shown in the leadership mailbox', output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(condition=models.Q(('in_mailbox', True)), fields=['-created_at'], name='assessments_mailbox_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Full-text search over narrative comments (see assessments.search)
+
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE assessments ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(what_went_well, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(what_could_improve, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(private_comments, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX assessments_search_vector_idx ON assessments USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS assessments_search_vector_idx",
+    "ALTER TABLE assessments DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE assessment_search USING fts5(
+        assessment_id UNINDEXED, what_went_well, what_could_improve, private_comments,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO assessment_search (assessment_id, what_went_well, what_could_improve, private_comments)
+    SELECT id, what_went_well, what_could_improve, private_comments FROM assessments
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS assessment_search",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0011_mailbox_partial_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
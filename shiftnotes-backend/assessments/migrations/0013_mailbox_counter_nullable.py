@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0012_assessment_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mailboxcounter',
+            name='unread_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,71 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Avg, Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from curriculum.models import EPA
 import uuid
 
 User = get_user_model()
 
+class AssessmentQuerySet(models.QuerySet):
+    def with_list_data(self, user, fields=None):
+        """
+        Load everything AssessmentSerializer reads, so a page serializes with a
+        fixed number of queries: trainee/evaluator joined, ratings (with EPA and
+        category) and acknowledgers prefetched, and epa_count,
+        average_entrustment and is_read_by_current_user annotated.
+
+        With `fields` (a sparse fieldset of AssessmentSerializer field names)
+        only the columns, joins, prefetches and annotations those fields need
+        are loaded, and ratings are loaded for the compact representation.
+        """
+        def wants(*names):
+            return fields is None or any(name in fields for name in names)
+
+        queryset = self
+        related = [name for name in ('trainee', 'evaluator') if wants(f'{name}_name')]
+        if related:
+            queryset = queryset.select_related(*related)
+
+        prefetches = []
+        if wants('assessment_epas'):
+            ratings_queryset = AssessmentEPA.objects.select_related('epa__category')
+            if fields is not None:
+                ratings_queryset = AssessmentEPA.objects.select_related('epa').only(
+                    'id', 'assessment', 'epa', 'entrustment_level', 'epa__code'
+                )
+            prefetches.append(Prefetch('assessment_epas', queryset=ratings_queryset))
+        if wants('acknowledged_by', 'acknowledged_by_names'):
+            prefetches.append(Prefetch('acknowledged_by', queryset=User.objects.only('id', 'name')))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+
+        ratings = AssessmentEPA.objects.filter(assessment=OuterRef('pk')).order_by().values('assessment')
+        annotations = {}
+        if wants('epa_count'):
+            annotations['epa_count'] = Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), 0)
+        if wants('average_entrustment'):
+            annotations['average_entrustment'] = Subquery(
+                ratings.annotate(average=Avg('entrustment_level', output_field=models.FloatField())).values('average')
+            )
+        if wants('is_read_by_current_user'):
+            annotations['is_read_by_current_user'] = Exists(
+                Assessment.acknowledged_by.through.objects.filter(assessment_id=OuterRef('pk'), user_id=user.id)
+            )
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        if fields is not None:
+            # id and created_at for ordering and cursors, evaluator and created_at for can_edit/can_delete
+            columns = {'id', 'created_at', 'evaluator'}
+            columns.update(field.name for field in self.model._meta.concrete_fields if field.name in fields)
+            columns.update(related)
+            columns.update(f'{name}__name' for name in related)
+            queryset = queryset.only(*columns)
+        return queryset
+
+
 class Assessment(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -24,15 +85,36 @@ class Assessment(models.Model):
     acknowledged_by = models.ManyToManyField(User, blank=True, related_name='assessments_acknowledged', help_text="Leadership users who have acknowledged this assessment")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Computed by the database, so bulk writes keep it current too. Filtering on the
+    # bare flag lets SQLite match the mailbox partial index, which it cannot do for
+    # conditions with bound parameters.
+    in_mailbox = models.GeneratedField(
+        expression=models.ExpressionWrapper(
+            models.Q(status='submitted', private_comments__gt=''), output_field=models.BooleanField()
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+        help_text="Submitted with private comments: shown in the leadership mailbox"
+    )
+
+    objects = AssessmentQuerySet.as_manager()
 
     class Meta:
         db_table = 'assessments'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['trainee', 'shift_date']),
+            models.Index(fields=['trainee', 'created_at']),
             models.Index(fields=['evaluator', 'created_at']),
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['shift_date']),
+            models.Index(fields=['updated_at']),
+            # Leadership mailbox (assessments.mailbox): only submitted assessments with private comments
+            models.Index(
+                fields=['-created_at'],
+                name='assessments_mailbox_idx',
+                condition=models.Q(in_mailbox=True),
+            ),
         ]
 
     def __str__(self):
@@ -51,15 +133,159 @@ class AssessmentEPA(models.Model):
         (5, 'I didn\'t need to be there at all (No supervision required)'),
     ])
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'assessment_epas'
         unique_together = [['assessment', 'epa']]
         indexes = [
             models.Index(fields=['assessment', 'epa']),
+            models.Index(fields=['updated_at']),
             models.Index(fields=['epa', 'entrustment_level']),
             models.Index(fields=['entrustment_level']),
         ]
 
     def __str__(self):
         return f"AssessmentEPA {self.id} - {self.epa.code} (Level {self.entrustment_level})"
+
+
+
+class AssessmentTombstone(models.Model):
+    """
+    Record of an assessment (or one of its EPA ratings) deleted through the API,
+    so delta sync clients can drop their local copy.
+
+    The owners are kept as plain ids because the rows they pointed at may be
+    gone by the time a client syncs.
+    """
+    OBJECT_TYPE_CHOICES = [
+        ('assessment', 'Assessment'),
+        ('assessment_epa', 'Assessment EPA'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPE_CHOICES)
+    object_id = models.UUIDField()
+    assessment_id = models.UUIDField()
+    program_id = models.UUIDField(null=True, blank=True)
+    trainee_id = models.UUIDField()
+    evaluator_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'assessment_tombstones'
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"Tombstone {self.object_type} {self.object_id}"
+
+    @classmethod
+    def record_deletion(cls, assessment):
+        """Create tombstones for an assessment and its ratings (call before deleting it)"""
+        owners = {
+            'assessment_id': assessment.id,
+            'program_id': assessment.trainee.program_id,
+            'trainee_id': assessment.trainee_id,
+            'evaluator_id': assessment.evaluator_id,
+        }
+        tombstones = [cls(object_type='assessment', object_id=assessment.id, **owners)]
+        tombstones += [
+            cls(object_type='assessment_epa', object_id=epa_id, **owners)
+            for epa_id in assessment.assessment_epas.values_list('id', flat=True)
+        ]
+        return cls.objects.bulk_create(tombstones)
+
+
+class ExportJob(models.Model):
+    """An export generated outside the request cycle by the run_worker process"""
+    EXPORT_TYPE_CHOICES = [
+        ('assessments', 'Assessments'),
+        ('competency_grid', 'Competency Grid'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    program = models.ForeignKey('organizations.Program', on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    export_type = models.CharField(max_length=30, choices=EXPORT_TYPE_CHOICES)
+    parameters = models.JSONField(default=dict, blank=True, help_text="Validated query parameters of the export")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="When the generated file is deleted")
+
+    class Meta:
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['requested_by', 'created_at']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"ExportJob {self.id} - {self.export_type} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of rows written, None until the row count is known"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return None
+        return min(99, int(self.rows_written * 100 / self.total_rows))
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response to a write sent with an Idempotency-Key header, replayed to
+    retries of the same request until expires_at. status_code is null while
+    the original request is still being processed.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64, help_text="SHA-256 of method, path and body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"IdempotencyKey {self.key} ({self.user_id})"
+
+
+class MailboxCounter(models.Model):
+    """
+    Denormalized unread mailbox count of a leadership/admin user, maintained by
+    assessments.mailbox and the signal handlers in assessments.signals.
+    unread_count is null while the first count is being taken.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='mailbox_counter')
+    unread_count = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'mailbox_counters'
+
+    def __str__(self):
+        return f"MailboxCounter {self.user_id}: {self.unread_count}"
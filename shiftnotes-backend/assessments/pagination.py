@@ -0,0 +1,131 @@
+"""
+Pagination for the assessment list actions.
+
+Two modes share one response shape:
+- page mode (default): ?page=N&limit=M with Django's Paginator, always counted
+- cursor mode: ?cursor= (empty for the first page) or ?pagination=cursor.
+  Pages are keyset ranges on (created_at, id), newest first, so any page costs
+  the same as the first one. The total count is only computed with
+  ?include_count=true.
+"""
+import base64
+import uuid
+from datetime import datetime
+
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(assessment):
+    """Opaque cursor pointing just after the given assessment"""
+    raw = f'{assessment.created_at.isoformat()}|{assessment.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        (created_at, id) of the last assessment of the previous page
+
+    Raises:
+        ValueError: If the cursor was not issued by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, assessment_id = raw.split('|')
+        return datetime.fromisoformat(created_at), uuid.UUID(assessment_id)
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    Return (assessments, next_cursor) for one page of queryset, newest first.
+
+    Uses a range condition on (created_at, id) instead of OFFSET, so the
+    database walks the (..., created_at) index from the cursor position.
+    """
+    if cursor:
+        created_at, assessment_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=assessment_id)
+        )
+
+    assessments = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+    if len(assessments) > limit:
+        assessments = assessments[:limit]
+        return assessments, encode_cursor(assessments[-1])
+    return assessments, None
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+def uses_cursor(request):
+    return 'cursor' in request.GET or request.GET.get('pagination') == 'cursor'
+
+
+def paginate_assessments(request, queryset):
+    """
+    Paginate an assessment queryset in page or cursor mode.
+
+    Returns:
+        (assessments, pagination) where pagination holds count (None when not
+        requested in cursor mode), next, previous and, in cursor mode, next_cursor
+
+    Raises:
+        ValueError: For an invalid cursor
+    """
+    page_size = get_page_size(request)
+    request_url = request.build_absolute_uri(request.path)
+    query_params = request.GET.copy()
+
+    if uses_cursor(request):
+        assessments, next_cursor = keyset_page(queryset, request.GET.get('cursor'), page_size)
+
+        next_url = None
+        if next_cursor:
+            query_params['cursor'] = next_cursor
+            query_params.pop('page', None)
+            next_url = f"{request_url}?{query_params.urlencode()}"
+
+        include_count = request.GET.get('include_count', '').lower() in ['1', 'true', 'yes']
+        return assessments, {
+            'count': queryset.count() if include_count else None,
+            'next': next_url,
+            'previous': None,
+            'next_cursor': next_cursor,
+        }
+
+    paginator = Paginator(queryset, page_size)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    next_url = None
+    if page.has_next():
+        query_params['page'] = page.next_page_number()
+        next_url = f"{request_url}?{query_params.urlencode()}"
+
+    previous_url = None
+    if page.has_previous():
+        query_params['page'] = page.previous_page_number()
+        previous_url = f"{request_url}?{query_params.urlencode()}"
+
+    return page.object_list, {
+        'count': paginator.count,
+        'next': next_url,
+        'previous': previous_url,
+    }
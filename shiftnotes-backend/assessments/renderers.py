@@ -0,0 +1,28 @@
+"""
+Renderers for the export endpoints.
+
+The exports build their own file responses; these renderers only register the
+file formats with DRF content negotiation so ?format=csv / ?format=parquet
+reach the view instead of being rejected as unknown formats.
+"""
+from rest_framework.renderers import BaseRenderer
+
+from .exports import PARQUET_CONTENT_TYPE
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Return data unchanged; the view sets the response body itself"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ParquetRenderer(PassthroughRenderer):
+    media_type = PARQUET_CONTENT_TYPE
+    format = 'parquet'
+    charset = None
@@ -0,0 +1,177 @@
+"""
+Full-text search over assessment narrative comments.
+
+what_went_well, what_could_improve and private_comments are indexed per
+database backend (see migration 0012_assessment_search):
+
+- PostgreSQL: a generated `search_vector` tsvector column on assessments with a
+  GIN index. The database keeps it current on every write, bulk ones included.
+- SQLite (development and tests): an FTS5 table, `assessment_search`, kept
+  current by the signal handlers in assessments.signals. Code that writes in
+  bulk must call index_assessments itself; rebuild_search_index repopulates it.
+
+Both backends stem English words and match every search term, and rank and
+highlight matches in the database. Highlights are wrapped in
+SNIPPET_START/SNIPPET_END as plain text.
+"""
+import re
+import uuid
+
+from django.db import connection
+
+from .models import Assessment
+
+
+SEARCH_FIELDS = ['what_went_well', 'what_could_improve', 'private_comments']
+SNIPPET_START = '**'
+SNIPPET_END = '**'
+SNIPPET_WORDS = 16
+
+POSTGRES_SEARCH_SQL = """
+    SELECT a.id,
+           ts_rank(a.search_vector, query) AS search_rank,
+           ts_headline('english', concat_ws(' ... ', a.what_went_well, a.what_could_improve, a.private_comments), query,
+                       %s) AS snippet
+    FROM assessments a
+    JOIN users u ON u.id = a.trainee_id,
+         plainto_tsquery('english', %s) query
+    WHERE u.program_id = %s AND a.status = 'submitted' AND a.search_vector @@ query
+    ORDER BY search_rank DESC, a.created_at DESC
+    LIMIT %s OFFSET %s
+"""
+
+POSTGRES_COUNT_SQL = """
+    SELECT COUNT(*)
+    FROM assessments a
+    JOIN users u ON u.id = a.trainee_id
+    WHERE u.program_id = %s AND a.status = 'submitted'
+      AND a.search_vector @@ plainto_tsquery('english', %s)
+"""
+
+# FTS5 tables have a hidden "rank" column, hence the search_rank alias
+SQLITE_SEARCH_SQL = """
+    SELECT assessment_search.assessment_id,
+           -bm25(assessment_search) AS search_rank,
+           snippet(assessment_search, -1, %s, %s, '...', %s) AS snippet
+    FROM assessment_search
+    JOIN assessments a ON a.id = assessment_search.assessment_id
+    JOIN users u ON u.id = a.trainee_id
+    WHERE assessment_search MATCH %s AND u.program_id = %s AND a.status = 'submitted'
+    ORDER BY search_rank DESC, a.created_at DESC
+    LIMIT %s OFFSET %s
+"""
+
+SQLITE_COUNT_SQL = """
+    SELECT COUNT(*)
+    FROM assessment_search
+    JOIN assessments a ON a.id = assessment_search.assessment_id
+    JOIN users u ON u.id = a.trainee_id
+    WHERE assessment_search MATCH %s AND u.program_id = %s AND a.status = 'submitted'
+"""
+
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+def search_terms(query):
+    """Words of a user-entered query; operators and punctuation are ignored"""
+    return re.findall(r'\w+', query)
+
+
+def _fts5_query(terms):
+    # Quoted terms are matched literally, so user input cannot form FTS5 syntax
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _db_id(assessment_id):
+    """UUIDs are stored as 32 hex digits in SQLite"""
+    return uuid.UUID(str(assessment_id)).hex
+
+
+def search_assessments(program_id, query, limit, offset=0):
+    """
+    Rank the program's submitted assessments against a text query.
+
+    Returns:
+        (total matches, [(assessment_id, rank, snippet), ...] for the page);
+        a higher rank is a better match
+    """
+    terms = search_terms(query)
+    if not program_id or not terms:
+        return 0, []
+
+    with connection.cursor() as cursor:
+        if uses_fts5():
+            match = _fts5_query(terms)
+            program = _db_id(program_id)
+            cursor.execute(SQLITE_COUNT_SQL, [match, program])
+            total = cursor.fetchone()[0]
+            cursor.execute(SQLITE_SEARCH_SQL, [
+                SNIPPET_START, SNIPPET_END, SNIPPET_WORDS, match, program, limit, offset
+            ])
+        else:
+            text = ' '.join(terms)
+            cursor.execute(POSTGRES_COUNT_SQL, [program_id, text])
+            total = cursor.fetchone()[0]
+            headline_options = (
+                f'StartSel="{SNIPPET_START}", StopSel="{SNIPPET_END}", '
+                f'MaxWords={SNIPPET_WORDS}, MinWords=5, MaxFragments=2'
+            )
+            cursor.execute(POSTGRES_SEARCH_SQL, [headline_options, text, program_id, limit, offset])
+        rows = cursor.fetchall()
+
+    return total, [(uuid.UUID(str(assessment_id)), float(rank), snippet) for assessment_id, rank, snippet in rows]
+
+
+def index_assessments(assessments):
+    """Add or refresh assessments in the SQLite FTS5 table (PostgreSQL needs no maintenance)"""
+    if not uses_fts5():
+        return
+    rows = [
+        (_db_id(assessment.id), *(getattr(assessment, field) or '' for field in SEARCH_FIELDS))
+        for assessment in assessments
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM assessment_search WHERE assessment_id = %s', [row[:1] for row in rows])
+        cursor.executemany(
+            'INSERT INTO assessment_search (assessment_id, what_went_well, what_could_improve, private_comments) '
+            'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def remove_from_index(assessment_ids):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM assessment_search WHERE assessment_id = %s',
+            [(_db_id(assessment_id),) for assessment_id in assessment_ids]
+        )
+
+
+def rebuild_search_index():
+    """
+    Repopulate the SQLite FTS5 table from the assessments.
+
+    Returns:
+        Number of assessments indexed (0 on PostgreSQL, where the column is generated)
+    """
+    if not uses_fts5():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM assessment_search')
+    indexed = 0
+    assessments = Assessment.objects.only('id', *SEARCH_FIELDS).order_by()
+    batch = []
+    for assessment in assessments.iterator(chunk_size=2000):
+        batch.append(assessment)
+        if len(batch) == 2000:
+            index_assessments(batch)
+            indexed += len(batch)
+            batch = []
+    index_assessments(batch)
+    return indexed + len(batch)
@@ -1,8 +1,26 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
+from analytics.rollups import deferred_rollups
 from .models import Assessment, AssessmentEPA
 from users.serializers import UserSerializer
 from curriculum.serializers import EPASerializer
 
+# Generic entrustment level descriptions, consistent across all EPAs
+ENTRUSTMENT_LEVEL_DESCRIPTIONS = {
+    1: "I had to do it (Requires constant direct supervision and myself or others' hands-on action for completion)",
+    2: "I helped a lot (Requires considerable direct supervision and myself or others' guidance for completion)",
+    3: "I helped a little (Requires minimal direct supervision or guidance from myself or others for completion)",
+    4: "I needed to be there but did not help (Requires indirect supervision and no guidance by myself or others)",
+    5: "I didn't need to be there at all (Does not require any supervision or guidance by myself or others)"
+}
+
+# Fields of ?view=compact on the assessment list endpoints
+COMPACT_ASSESSMENT_FIELDS = [
+    'id', 'trainee', 'trainee_name', 'evaluator', 'evaluator_name', 'shift_date', 'location', 'status',
+    'is_read_by_current_user', 'created_at', 'assessment_epas', 'epa_count', 'average_entrustment'
+]
+
 class AssessmentEPASerializer(serializers.ModelSerializer):
     epa_code = serializers.CharField(source='epa.code', read_only=True)
     epa_title = serializers.CharField(source='epa.title', read_only=True)
@@ -19,15 +37,16 @@ class AssessmentEPASerializer(serializers.ModelSerializer):
     
     def get_entrustment_level_description(self, obj):
         """Always use generic entrustment level descriptions for consistency"""
-        # Use consistent generic descriptions across all EPAs
-        generic_descriptions = {
-            1: "I had to do it (Requires constant direct supervision and myself or others' hands-on action for completion)",
-            2: "I helped a lot (Requires considerable direct supervision and myself or others' guidance for completion)",
-            3: "I helped a little (Requires minimal direct supervision or guidance from myself or others for completion)",
-            4: "I needed to be there but did not help (Requires indirect supervision and no guidance by myself or others)",
-            5: "I didn't need to be there at all (Does not require any supervision or guidance by myself or others)"
-        }
-        return generic_descriptions.get(obj.entrustment_level, "Unknown level")
+        return ENTRUSTMENT_LEVEL_DESCRIPTIONS.get(obj.entrustment_level, "Unknown level")
+
+class CompactAssessmentEPASerializer(serializers.ModelSerializer):
+    """EPA rating for sparse assessment lists; descriptions are sent once as a legend"""
+    epa_code = serializers.CharField(source='epa.code', read_only=True)
+
+    class Meta:
+        model = AssessmentEPA
+        fields = ['id', 'epa', 'epa_code', 'entrustment_level']
+        read_only_fields = fields
 
 class AssessmentSerializer(serializers.ModelSerializer):
     trainee_name = serializers.CharField(source='trainee.name', read_only=True)
@@ -52,35 +71,54 @@ class AssessmentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def __init__(self, *args, fields=None, **kwargs):
+        """
+        fields: Optional sparse fieldset. Other fields (SerializerMethodFields
+        included) are dropped, and ratings use the compact representation.
+        """
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+            if 'assessment_epas' in self.fields:
+                self.fields['assessment_epas'] = CompactAssessmentEPASerializer(many=True, read_only=True)
+
+    # epa_count, average_entrustment and is_read_by_current_user are annotated by
+    # Assessment.objects.with_list_data(); the fallbacks only run for instances
+    # loaded without it.
+
     def get_epa_count(self, obj):
-        return obj.assessment_epas.count()
+        if hasattr(obj, 'epa_count'):
+            return obj.epa_count
+        return len(obj.assessment_epas.all())
 
     def get_average_entrustment(self, obj):
-        epas = obj.assessment_epas.all()
-        if not epas.exists():
+        if hasattr(obj, 'average_entrustment'):
+            return float(obj.average_entrustment) if obj.average_entrustment is not None else None
+        levels = [epa.entrustment_level for epa in obj.assessment_epas.all()]
+        if not levels:
             return None
-        return sum(epa.entrustment_level for epa in epas) / epas.count()
+        return sum(levels) / len(levels)
     
     def get_acknowledged_by_names(self, obj):
         return [user.name for user in obj.acknowledged_by.all()]
     
     def get_is_read_by_current_user(self, obj):
+        if hasattr(obj, 'is_read_by_current_user'):
+            return obj.is_read_by_current_user
         request = self.context.get('request')
         if request and request.user:
             return obj.acknowledged_by.filter(id=request.user.id).exists()
         return False
     
-    def get_can_delete(self, obj):
-        """Check if current user can delete this assessment"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
+    def _is_editable_by_current_user(self, obj):
+        """The evaluator (creator) can edit or delete an assessment for 7 days"""
         request = self.context.get('request')
         if not request or not request.user:
             return False
         
         # Must be the evaluator (creator)
-        if obj.evaluator != request.user:
+        if obj.evaluator_id != request.user.id:
             return False
         
         # Must be less than 7 days old
@@ -90,25 +128,13 @@ class AssessmentSerializer(serializers.ModelSerializer):
         
         return True
     
+    def get_can_delete(self, obj):
+        """Check if current user can delete this assessment"""
+        return self._is_editable_by_current_user(obj)
+    
     def get_can_edit(self, obj):
         """Check if current user can edit this assessment"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        request = self.context.get('request')
-        if not request or not request.user:
-            return False
-        
-        # Must be the evaluator (creator)
-        if obj.evaluator != request.user:
-            return False
-        
-        # Must be less than 7 days old
-        assessment_age = timezone.now() - obj.created_at
-        if assessment_age > timedelta(days=7):
-            return False
-        
-        return True
+        return self._is_editable_by_current_user(obj)
 
 class AssessmentCreateSerializer(serializers.ModelSerializer):
     assessment_epas = AssessmentEPASerializer(many=True)
@@ -122,9 +148,35 @@ class AssessmentCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         assessment_epas_data = validated_data.pop('assessment_epas')
-        assessment = Assessment.objects.create(**validated_data)
-        
-        for epa_data in assessment_epas_data:
-            AssessmentEPA.objects.create(assessment=assessment, **epa_data)
+        # Refresh the trainee's rollup bucket once, not once per rating
+        with deferred_rollups():
+            assessment = Assessment.objects.create(**validated_data)
+            
+            for epa_data in assessment_epas_data:
+                AssessmentEPA.objects.create(assessment=assessment, **epa_data)
         
         return assessment
+
+class AssessmentBatchEPASerializer(serializers.Serializer):
+    epa = serializers.UUIDField()
+    entrustment_level = serializers.ChoiceField(choices=[1, 2, 3, 4, 5])
+
+class AssessmentBatchItemSerializer(serializers.Serializer):
+    """
+    One assessment of a batch submission. Trainee and EPA ids are only checked
+    for shape here; assessments.batch resolves them for the whole batch at once.
+    """
+    trainee = serializers.UUIDField()
+    shift_date = serializers.DateField()
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    status = serializers.ChoiceField(choices=['draft', 'submitted'], default='draft')
+    private_comments = serializers.CharField(required=False, allow_blank=True, default='')
+    what_went_well = serializers.CharField(required=False, allow_blank=True, default='')
+    what_could_improve = serializers.CharField(required=False, allow_blank=True, default='')
+    assessment_epas = AssessmentBatchEPASerializer(many=True)
+
+    def validate_assessment_epas(self, value):
+        epa_ids = [rating['epa'] for rating in value]
+        if len(set(epa_ids)) != len(epa_ids):
+            raise serializers.ValidationError('Each EPA can only be rated once per assessment.')
+        return value
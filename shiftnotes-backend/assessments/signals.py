@@ -0,0 +1,147 @@
+"""
+Signal handlers for assessments.
+
+Acknowledging an assessment only writes to the acknowledged_by join table, so
+the assessment's updated_at is bumped here to make the change visible to delta
+sync clients.
+
+The leadership mailbox counters (assessments.mailbox) are adjusted here when
+an assessment enters or leaves a program's mailbox and when it is marked read,
+and the SQLite full-text index (assessments.search) follows comment changes.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .mailbox import MAILBOX_ROLES, adjust_unread, is_mailbox_assessment, mailbox_assessments
+from .models import Assessment, MailboxCounter
+from .search import SEARCH_FIELDS, index_assessments, remove_from_index
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=Assessment.acknowledged_by.through)
+def touch_acknowledged_assessments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.assessments_acknowledged.add(...): pk_set holds assessment ids
+        # (None on clear, when the affected rows are no longer known)
+        if not pk_set:
+            return
+        assessments = Assessment.objects.filter(pk__in=pk_set)
+    else:
+        if action != 'post_clear' and not pk_set:
+            return
+        assessments = Assessment.objects.filter(pk=instance.pk)
+    assessments.update(updated_at=timezone.now())
+
+
+def _mailbox_program(assessment_id):
+    """Program whose mailbox the assessment is in, or None"""
+    row = Assessment.objects.filter(pk=assessment_id).values_list(
+        'status', 'private_comments', 'trainee__program_id'
+    ).first()
+    if row and is_mailbox_assessment(row[0], row[1]):
+        return row[2]
+    return None
+
+
+@receiver(pre_save, sender=Assessment)
+def remember_mailbox_program(sender, instance, raw=False, **kwargs):
+    instance._mailbox_previous_program = None
+    if raw or instance._state.adding:
+        return
+    instance._mailbox_previous_program = _mailbox_program(instance.pk)
+
+
+@receiver(post_save, sender=Assessment)
+def update_mailbox_counters(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_mailbox_previous_program', None)
+    current = None
+    if is_mailbox_assessment(instance.status, instance.private_comments):
+        current = User.objects.filter(pk=instance.trainee_id).values_list('program_id', flat=True).first()
+    if previous == current:
+        return
+    readers = [] if created else list(instance.acknowledged_by.values_list('id', flat=True))
+    adjust_unread(previous, -1, exclude_user_ids=readers)
+    adjust_unread(current, 1, exclude_user_ids=readers)
+
+
+@receiver(pre_delete, sender=Assessment)
+def remove_from_mailbox(sender, instance, **kwargs):
+    # The acknowledgements are deleted with the assessment, so read them first
+    program_id = _mailbox_program(instance.pk)
+    if program_id:
+        readers = list(instance.acknowledged_by.values_list('id', flat=True))
+        adjust_unread(program_id, -1, exclude_user_ids=readers)
+
+
+@receiver(m2m_changed, sender=Assessment.acknowledged_by.through)
+def count_mailbox_reads(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The cleared rows are no longer known after the clear
+        related = instance.assessments_acknowledged if reverse else instance.acknowledged_by
+        instance._mailbox_cleared = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set, sign = getattr(instance, '_mailbox_cleared', set()), 1
+    elif action in ('post_add', 'post_remove'):
+        sign = -1 if action == 'post_add' else 1
+    else:
+        return
+    if not pk_set:
+        return
+
+    if reverse:
+        # user.assessments_acknowledged.add(...): instance is the reader
+        if instance.role not in MAILBOX_ROLES or not instance.program_id:
+            return
+        read = mailbox_assessments(instance.program_id).filter(pk__in=pk_set).count()
+        adjust_unread(instance.program_id, sign * read, user_ids=[instance.pk])
+    else:
+        program_id = _mailbox_program(instance.pk)
+        adjust_unread(program_id, sign, user_ids=pk_set)
+
+
+@receiver(pre_save, sender=User)
+def remember_mailbox_membership(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._mailbox_previous_membership = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'role', 'program'} & set(update_fields):
+        return
+    instance._mailbox_previous_membership = User.objects.filter(pk=instance.pk).values_list('role', 'program_id').first()
+
+
+@receiver(post_save, sender=User)
+def reset_mailbox_counters(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Drop counters invalidated by a role or program change; they are recomputed
+    on next read. Moving a trainee changes the mailbox of both programs.
+    """
+    previous = getattr(instance, '_mailbox_previous_membership', None)
+    if raw or created or previous is None:
+        return
+    previous_role, previous_program_id = previous
+    if previous_program_id != instance.program_id:
+        MailboxCounter.objects.filter(user__program_id__in=[previous_program_id, instance.program_id]).delete()
+    if previous_role != instance.role or previous_program_id != instance.program_id:
+        MailboxCounter.objects.filter(user=instance).delete()
+
+
+@receiver(post_save, sender=Assessment)
+def index_assessment_comments(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    index_assessments([instance])
+
+
+@receiver(post_delete, sender=Assessment)
+def unindex_assessment_comments(sender, instance, **kwargs):
+    remove_from_index([instance.pk])
@@ -0,0 +1,26 @@
+"""
+Background tasks of the assessments app, run by the run_worker command.
+"""
+from tasks.queue import task
+from .exports import claim_export_job, purge_expired_exports, run_export_job
+
+
+@task(bind=True)
+def generate_export(task, job_id):
+    """
+    Generate the file of an ExportJob; queued by create_export_job.
+
+    A failed attempt leaves the job pending and raises, so the queue retries
+    it; the job is marked failed on the last attempt (or when called directly).
+    """
+    job = claim_export_job(job_id)
+    if job is None:
+        return None  # Running elsewhere or already finished
+    final = task is None or task.attempts >= task.max_attempts
+    return run_export_job(job, final=final).status
+
+
+@task(every=3600)
+def purge_exports():
+    """Delete export files past their retention period; returns the number purged"""
+    return purge_expired_exports()
@@ -1,10 +1,20 @@
 """
 Tests for Assessment and AssessmentEPA models
 """
+import csv
+import os
 import pytest
-from datetime import date
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
 
-from assessments.models import Assessment, AssessmentEPA
+from assessments.exports import claim_export_job, run_export_job, purge_expired_exports
+from assessments.tasks import generate_export
+from tasks.models import Task
+from tasks.queue import claim_task, run_task
+from assessments.mailbox import count_unread, unread_count
+from assessments.models import Assessment, AssessmentEPA, ExportJob, MailboxCounter
 from conftest import (
     OrganizationFactory, ProgramFactory, CohortFactory, 
     UserFactory, EPAFactory, EPACategoryFactory,
@@ -235,3 +245,241 @@ class TestAssessmentEPAModel:
         
         assert assessment.assessment_epas.count() == 3
 
+
+
+@pytest.mark.django_db
+class TestExportJobs:
+    """Test generating and expiring background export jobs"""
+    
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+    
+    def create_job(self, leadership_user, export_type='assessments', **parameters):
+        return ExportJob.objects.create(
+            program=leadership_user.program,
+            requested_by=leadership_user,
+            export_type=export_type,
+            parameters={
+                'start_date': (date.today() - timedelta(days=1)).strftime('%Y-%m-%d'),
+                'end_date': date.today().strftime('%Y-%m-%d'),
+                **parameters
+            }
+        )
+    
+    def test_worker_generates_assessment_export(self, leadership_user, faculty_user):
+        """Test that the worker writes the same CSV as the synchronous export"""
+        epa = EPAFactory(program=leadership_user.program)
+        for level in (2, 4):
+            assessment = AssessmentFactory(
+                trainee__program=leadership_user.program,
+                trainee__organization=leadership_user.organization,
+                evaluator=faculty_user,
+                status='submitted',
+                shift_date=date.today()
+            )
+            AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=level)
+        job = self.create_job(leadership_user)
+        generate_export.delay(str(job.id))
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        job.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.rows_written == job.total_rows == 2
+        assert job.progress == 100
+        assert job.expires_at > job.completed_at
+        with job.file.open('rb') as export_file:
+            rows = list(csv.reader(export_file.read().decode('utf-8').splitlines()))
+        assert rows[0][:2] == ['Trainee Name', 'Trainee Email']
+        assert len(rows) == 3
+    
+    def test_worker_generates_wide_competency_grid(self, leadership_user):
+        """Test that competency grid jobs honour their layout"""
+        UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        job = self.create_job(leadership_user, export_type='competency_grid', layout='wide')
+        
+        job = run_export_job(claim_export_job(job.id))
+        
+        assert job.status == 'completed'
+        assert job.total_rows == job.rows_written == 1
+    
+    def test_worker_generates_parquet_export(self, leadership_user, faculty_user):
+        """Test that assessment jobs can produce Parquet files"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        assessment = AssessmentFactory(
+            trainee__program=leadership_user.program,
+            trainee__organization=leadership_user.organization,
+            evaluator=faculty_user,
+            status='submitted',
+            shift_date=date.today()
+        )
+        AssessmentEPAFactory(assessment=assessment, epa=EPAFactory(program=leadership_user.program), entrustment_level=4)
+        job = self.create_job(leadership_user, format='parquet')
+        
+        job = run_export_job(claim_export_job(job.id))
+        
+        assert job.status == 'completed'
+        assert job.file.name.endswith('.parquet')
+        assert job.rows_written == 1
+        with job.file.open('rb') as export_file:
+            table = pq.read_table(export_file)
+        assert table.column('entrustment_level').to_pylist() == [4]
+    
+    def test_failed_job_records_error(self, leadership_user):
+        """Test that a failing export is marked failed instead of crashing the worker"""
+        job = self.create_job(leadership_user, cohort_id='not-a-uuid')
+        
+        assert generate_export(str(job.id)) == 'failed'
+        
+        job.refresh_from_db()
+        assert job.status == 'failed'
+        assert job.error
+        assert not job.file
+    
+    def test_failed_attempt_is_retried_by_the_queue(self, leadership_user, settings):
+        """Test that a failing export is left pending for a retry and failed on the last attempt"""
+        job = self.create_job(leadership_user, cohort_id='not-a-uuid')
+        queued = generate_export.apply_async(args=[str(job.id)], max_attempts=2)
+        
+        run_task(claim_task('worker'))
+        job.refresh_from_db()
+        queued.refresh_from_db()
+        assert queued.status == 'pending'
+        assert job.status == 'pending'
+        assert job.error
+        
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        run_task(claim_task('worker'))
+        job.refresh_from_db()
+        assert job.status == 'failed'
+    
+    def test_running_job_is_not_claimed_twice(self, leadership_user, settings):
+        """Test that only a job running past the task lock timeout is taken over"""
+        job = self.create_job(leadership_user)
+        
+        assert claim_export_job(job.id) is not None
+        assert claim_export_job(job.id) is None
+        
+        ExportJob.objects.filter(id=job.id).update(
+            started_at=timezone.now() - timedelta(minutes=settings.TASK_LOCK_TIMEOUT_MINUTES + 1)
+        )
+        assert claim_export_job(job.id) is not None
+    
+    def test_expired_exports_are_deleted(self, leadership_user, settings):
+        """Test that files are removed after the retention period"""
+        settings.EXPORT_RETENTION_HOURS = 1
+        job = self.create_job(leadership_user)
+        job = run_export_job(claim_export_job(job.id))
+        path = job.file.path
+        
+        assert purge_expired_exports() == 0
+        assert purge_expired_exports(now=timezone.now() + timedelta(hours=2)) == 1
+        
+        job.refresh_from_db()
+        assert job.status == 'expired'
+        assert not job.file
+        assert not os.path.exists(path)
+
+
+@pytest.mark.django_db
+class TestMailboxCounters:
+    """Test that stored mailbox unread counters follow assessment changes"""
+    
+    def setup_program(self):
+        org = OrganizationFactory()
+        program = ProgramFactory(org=org)
+        cohort = CohortFactory(org=org, program=program)
+        leader = UserFactory(role='leadership', organization=org, program=program)
+        trainee = UserFactory(role='trainee', organization=org, program=program, cohort=cohort)
+        evaluator = UserFactory(role='faculty', organization=org, program=program)
+        return leader, trainee, evaluator
+    
+    def assert_counter_matches(self, leader):
+        assert MailboxCounter.objects.get(user=leader).unread_count == count_unread(leader)
+    
+    def test_counter_is_created_on_first_read(self):
+        """Test that the counter is computed once and then read from the table"""
+        leader, trainee, evaluator = self.setup_program()
+        AssessmentFactory(trainee=trainee, evaluator=evaluator, status='submitted', private_comments='Note')
+        AssessmentFactory(trainee=trainee, evaluator=evaluator, status='submitted', private_comments='')
+        
+        assert unread_count(leader) == 1
+        assert MailboxCounter.objects.get(user=leader).unread_count == 1
+    
+    def test_empty_counter_is_not_adjusted(self):
+        """Test that a counter still being initialised ignores adjustments and is then counted"""
+        leader, trainee, evaluator = self.setup_program()
+        MailboxCounter.objects.create(user=leader)
+        
+        AssessmentFactory(trainee=trainee, evaluator=evaluator, status='submitted', private_comments='Note')
+        assert MailboxCounter.objects.get(user=leader).unread_count is None
+        
+        assert unread_count(leader) == 1
+        self.assert_counter_matches(leader)
+    
+    def test_counter_follows_submissions_and_reads(self):
+        """Test that submitting, reading, unreading and deleting adjust the counter"""
+        leader, trainee, evaluator = self.setup_program()
+        unread_count(leader)
+        
+        draft = AssessmentFactory(trainee=trainee, evaluator=evaluator, status='draft', private_comments='Note')
+        assert MailboxCounter.objects.get(user=leader).unread_count == 0
+        
+        draft.status = 'submitted'
+        draft.save()
+        assert MailboxCounter.objects.get(user=leader).unread_count == 1
+        
+        draft.acknowledged_by.add(leader)
+        draft.acknowledged_by.add(leader)
+        assert MailboxCounter.objects.get(user=leader).unread_count == 0
+        
+        draft.acknowledged_by.clear()
+        assert MailboxCounter.objects.get(user=leader).unread_count == 1
+        
+        leader.assessments_acknowledged.add(draft)
+        assert MailboxCounter.objects.get(user=leader).unread_count == 0
+        leader.assessments_acknowledged.remove(draft)
+        
+        draft.private_comments = ''
+        draft.save()
+        self.assert_counter_matches(leader)
+        
+        draft.private_comments = 'Back again'
+        draft.save()
+        draft.delete()
+        self.assert_counter_matches(leader)
+    
+    def test_other_programs_are_not_counted(self):
+        """Test that assessments in another program leave the counter alone"""
+        leader, trainee, evaluator = self.setup_program()
+        unread_count(leader)
+        
+        AssessmentFactory(status='submitted', private_comments='Elsewhere')
+        
+        assert MailboxCounter.objects.get(user=leader).unread_count == 0
+    
+    def test_program_change_resets_counters(self):
+        """Test that moving a trainee to another program drops the affected counters"""
+        leader, trainee, evaluator = self.setup_program()
+        AssessmentFactory(trainee=trainee, evaluator=evaluator, status='submitted', private_comments='Note')
+        unread_count(leader)
+        
+        trainee.program = ProgramFactory(org=trainee.organization)
+        trainee.save()
+        
+        assert not MailboxCounter.objects.filter(user=leader).exists()
+        assert unread_count(leader) == 0
+    
+    def test_reconcile_command_repairs_drift(self):
+        """Test that the reconciliation command fixes counters changed behind its back"""
+        leader, trainee, evaluator = self.setup_program()
+        AssessmentFactory(trainee=trainee, evaluator=evaluator, status='submitted', private_comments='Note')
+        unread_count(leader)
+        MailboxCounter.objects.filter(user=leader).update(unread_count=7)
+        
+        out = StringIO()
+        call_command('reconcile_mailbox_counters', stdout=out)
+        
+        assert MailboxCounter.objects.get(user=leader).unread_count == 1
+        assert '1 repaired' in out.getvalue()
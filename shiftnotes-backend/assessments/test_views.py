@@ -3,11 +3,22 @@ Tests for Assessment API views
 """
 import pytest
 import csv
+import gzip
+from io import BytesIO, StringIO
 from datetime import date, timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 
-from assessments.models import Assessment, AssessmentEPA
+from analytics.models import TraineeDayRollup
+from assessments.mailbox import unread_mailbox
+from assessments.models import Assessment, AssessmentEPA, ExportJob, IdempotencyKey
+from assessments.serializers import COMPACT_ASSESSMENT_FIELDS
+from assessments.sync import encode_sync_cursor
 from conftest import (
     OrganizationFactory, ProgramFactory, CohortFactory,
     UserFactory, EPAFactory, EPACategoryFactory,
@@ -196,6 +207,817 @@ class TestAssessmentListViews:
         assert str(different_program_assessment.id) not in assessment_ids
 
 
+@pytest.mark.django_db
+class TestAssessmentListQueries:
+    """Test that assessment lists serialize with a fixed number of queries"""
+    
+    def create_assessments(self, leadership_user, faculty_user, count):
+        """Create submitted assessments with two rated EPAs and some acknowledgements"""
+        category = EPACategoryFactory(program=leadership_user.program)
+        epas = [EPAFactory(program=leadership_user.program, category=category) for _ in range(2)]
+        assessments = []
+        for index in range(count):
+            assessment = AssessmentFactory(
+                trainee__program=leadership_user.program,
+                trainee__organization=leadership_user.organization,
+                evaluator=faculty_user,
+                status='submitted',
+                private_comments='Needs follow-up'
+            )
+            AssessmentEPAFactory(assessment=assessment, epa=epas[0], entrustment_level=2)
+            AssessmentEPAFactory(assessment=assessment, epa=epas[1], entrustment_level=5)
+            assessment.acknowledged_by.add(faculty_user)
+            if index % 2:
+                assessment.acknowledged_by.add(leadership_user)
+            assessments.append(assessment)
+        return assessments
+    
+    def test_list_fields_from_annotations(self, leadership_client, leadership_user, faculty_user):
+        """Test that counts, averages and read state are still correct"""
+        unread, read = self.create_assessments(leadership_user, faculty_user, 2)
+        
+        response = leadership_client.get(reverse('assessment-list'))
+        
+        results = {row['id']: row for row in response.data['results']}
+        assert results[str(unread.id)]['epa_count'] == 2
+        assert results[str(unread.id)]['average_entrustment'] == 3.5
+        assert results[str(unread.id)]['is_read_by_current_user'] is False
+        assert results[str(read.id)]['is_read_by_current_user'] is True
+        assert sorted(results[str(read.id)]['acknowledged_by_names']) == sorted([faculty_user.name, leadership_user.name])
+        assert results[str(read.id)]['assessment_epas'][0]['epa_category']
+    
+    @pytest.mark.parametrize('url_name', ['assessment-list', 'assessment-mailbox'])
+    def test_leadership_list_query_count_is_constant(self, leadership_client, leadership_user, faculty_user, url_name):
+        """Test that the number of queries does not grow with the page size"""
+        url = reverse(url_name)
+        self.create_assessments(leadership_user, faculty_user, 2)
+        with CaptureQueriesContext(connection) as small_page:
+            leadership_client.get(url)
+        
+        self.create_assessments(leadership_user, faculty_user, 10)
+        with CaptureQueriesContext(connection) as large_page:
+            response = leadership_client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) > 2
+        assert len(large_page.captured_queries) == len(small_page.captured_queries)
+    
+    @pytest.mark.parametrize('url_name', ['assessment-my-assessments', 'assessment-given-assessments'])
+    def test_faculty_list_query_count_is_constant(self, faculty_client, leadership_user, faculty_user, url_name):
+        """Test that the faculty list actions serialize without per-row queries"""
+        url = reverse(url_name)
+        self.create_assessments(leadership_user, faculty_user, 2)
+        with CaptureQueriesContext(connection) as small_page:
+            faculty_client.get(url)
+        
+        self.create_assessments(leadership_user, faculty_user, 10)
+        with CaptureQueriesContext(connection) as large_page:
+            response = faculty_client.get(url)
+        
+        assert len(response.data['results']) == 12
+        assert len(large_page.captured_queries) == len(small_page.captured_queries) <= 10
+
+
+@pytest.mark.django_db
+class TestAssessmentCursorPagination:
+    """Test keyset pagination of the assessment list actions"""
+    
+    def create_received(self, trainee_user, faculty_user, count):
+        """Create assessments for the trainee, several sharing one created_at"""
+        assessments = [
+            AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+            for _ in range(count)
+        ]
+        Assessment.objects.filter(id__in=[a.id for a in assessments[:3]]).update(
+            created_at=assessments[0].created_at
+        )
+        return assessments
+    
+    def test_cursor_walks_every_assessment_once(self, authenticated_client, trainee_user, faculty_user):
+        """Test that following next_cursor returns each assessment exactly once, newest first"""
+        assessments = self.create_received(trainee_user, faculty_user, 7)
+        url = reverse('assessment-received-assessments')
+        
+        seen = []
+        params = {'cursor': '', 'limit': 2}
+        while True:
+            response = authenticated_client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data['count'] is None
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            assert 'cursor=' in response.data['next']
+            params['cursor'] = response.data['next_cursor']
+        
+        expected = Assessment.objects.filter(id__in=[a.id for a in assessments]).order_by('-created_at', '-id')
+        assert seen == [str(a.id) for a in expected]
+    
+    def test_count_is_opt_in(self, authenticated_client, trainee_user, faculty_user):
+        """Test that the total is only computed when include_count is set"""
+        self.create_received(trainee_user, faculty_user, 3)
+        url = reverse('assessment-my-assessments')
+        
+        response = authenticated_client.get(url, {'pagination': 'cursor', 'include_count': 'true'})
+        
+        assert response.data['count'] == 3
+        assert response.data['next_cursor'] is None
+    
+    def test_deep_page_costs_the_same_as_first_page(self, faculty_client, trainee_user, faculty_user):
+        """Test that later pages run the same queries as the first one and no COUNT"""
+        self.create_received(trainee_user, faculty_user, 9)
+        url = reverse('assessment-given-assessments')
+        
+        with CaptureQueriesContext(connection) as first_page:
+            response = faculty_client.get(url, {'cursor': '', 'limit': 3})
+        with CaptureQueriesContext(connection) as last_page:
+            response = faculty_client.get(url, {'cursor': response.data['next_cursor'], 'limit': 3})
+            response = faculty_client.get(url, {'cursor': response.data['next_cursor'], 'limit': 3})
+        
+        assert len(response.data['results']) == 3
+        assert len(last_page.captured_queries) == 2 * len(first_page.captured_queries)
+        assert not any(query['sql'].startswith('SELECT COUNT(*)') for query in first_page.captured_queries)
+    
+    def test_invalid_cursor(self, authenticated_client):
+        """Test that a tampered cursor is rejected"""
+        response = authenticated_client.get(reverse('assessment-my-assessments'), {'cursor': 'not-a-cursor'})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_page_mode_still_counts(self, leadership_client, leadership_user, faculty_user):
+        """Test that page-number pagination keeps its count and links for the mailbox"""
+        for _ in range(3):
+            AssessmentFactory(
+                trainee__program=leadership_user.program,
+                trainee__organization=leadership_user.organization,
+                evaluator=faculty_user,
+                status='submitted',
+                private_comments='Please review'
+            )
+        
+        response = leadership_client.get(reverse('assessment-mailbox'), {'page': 1, 'limit': 2})
+        
+        assert response.data['count'] == response.data['unread_count'] == 3
+        assert 'page=2' in response.data['next']
+        assert response.data['previous'] is None
+
+
+@pytest.mark.django_db
+class TestAssessmentDeltaSync:
+    """Test the assessments/changes delta sync endpoint"""
+    
+    def age_everything(self):
+        """Move existing rows an hour into the past and return a cursor from half an hour ago"""
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Assessment.objects.update(updated_at=an_hour_ago)
+        AssessmentEPA.objects.update(updated_at=an_hour_ago)
+        return encode_sync_cursor(timezone.now() - timedelta(minutes=30))
+    
+    def test_without_since_returns_only_a_cursor(self, authenticated_client, trainee_user, faculty_user):
+        """Test that the first call hands out a cursor without data"""
+        AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        
+        response = authenticated_client.get(reverse('assessment-changes'))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['assessments'] == []
+        assert response.data['cursor']
+    
+    def test_returns_only_changed_rows(self, authenticated_client, trainee_user, faculty_user, epa):
+        """Test that unchanged assessments are left out and new ones and ratings are returned"""
+        unchanged = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        AssessmentEPAFactory(assessment=unchanged, epa=epa)
+        since = self.age_everything()
+        
+        created = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        rating = AssessmentEPAFactory(assessment=created, epa=epa)
+        
+        response = authenticated_client.get(reverse('assessment-changes'), {'since': since})
+        
+        assert [row['id'] for row in response.data['assessments']] == [str(created.id)]
+        assert [row['id'] for row in response.data['assessment_epas']] == [str(rating.id)]
+        assert response.data['assessment_epas'][0]['assessment'] == str(created.id)
+    
+    def test_acknowledgement_is_a_change(self, leadership_client, leadership_user, faculty_user):
+        """Test that marking an assessment read makes it show up again"""
+        assessment = AssessmentFactory(
+            trainee__program=leadership_user.program,
+            trainee__organization=leadership_user.organization,
+            evaluator=faculty_user,
+            status='submitted',
+            private_comments='Please review'
+        )
+        since = self.age_everything()
+        
+        leadership_client.post(reverse('assessment-mark-read', args=[assessment.id]))
+        response = leadership_client.get(reverse('assessment-changes'), {'since': since})
+        
+        assert [row['id'] for row in response.data['assessments']] == [str(assessment.id)]
+        assert response.data['assessments'][0]['is_read_by_current_user'] is True
+    
+    def test_destroy_leaves_tombstones(self, faculty_client, faculty_user, trainee_user, epa, api_client):
+        """Test that deleted assessments and ratings are reported to the people who could see them"""
+        assessment = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        rating = AssessmentEPAFactory(assessment=assessment, epa=epa)
+        since = self.age_everything()
+        
+        response = faculty_client.delete(reverse('assessment-detail', args=[assessment.id]))
+        assert response.status_code == status.HTTP_200_OK
+        
+        response = faculty_client.get(reverse('assessment-changes'), {'since': since})
+        assert response.data['deleted'] == {
+            'assessments': [str(assessment.id)],
+            'assessment_epas': [str(rating.id)],
+        }
+        
+        outsider = UserFactory(role='trainee')
+        token, _ = Token.objects.get_or_create(user=outsider)
+        faculty_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = faculty_client.get(reverse('assessment-changes'), {'since': since})
+        assert response.data['deleted'] == {'assessments': [], 'assessment_epas': []}
+    
+    def test_invalid_since(self, authenticated_client):
+        """Test that a cursor not issued by the server is rejected"""
+        response = authenticated_client.get(reverse('assessment-changes'), {'since': '2025-01-01'})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestAssessmentBatchCreate:
+    """Test batch assessment submission"""
+    
+    def make_trainee(self, faculty_user):
+        cohort = CohortFactory(org=faculty_user.organization, program=faculty_user.program)
+        return UserFactory(
+            role='trainee',
+            organization=faculty_user.organization,
+            program=faculty_user.program,
+            cohort=cohort
+        )
+    
+    def item(self, trainee, epa, level=3):
+        return {
+            'trainee': str(trainee.id),
+            'shift_date': str(date.today()),
+            'status': 'submitted',
+            'what_went_well': 'Great work',
+            'assessment_epas': [{'epa': str(epa.id), 'entrustment_level': level}],
+        }
+    
+    def test_batch_create(self, faculty_client, faculty_user):
+        """Test that every valid item is created with its ratings and rollups"""
+        trainee = self.make_trainee(faculty_user)
+        epa = EPAFactory(program=faculty_user.program)
+        
+        response = faculty_client.post(
+            reverse('assessment-batch'),
+            {'assessments': [self.item(trainee, epa, 2), self.item(trainee, epa, 4)]},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 2
+        assert [result['index'] for result in response.data['results']] == [0, 1]
+        assessments = Assessment.objects.filter(trainee=trainee)
+        assert assessments.count() == 2
+        assert all(assessment.evaluator == faculty_user for assessment in assessments)
+        assert AssessmentEPA.objects.filter(assessment__trainee=trainee).count() == 2
+        
+        rollup = TraineeDayRollup.objects.get(trainee=trainee, day=date.today(), status='submitted')
+        assert rollup.assessment_count == 2
+    
+    def test_batch_uses_constant_queries(self, faculty_client, faculty_user, django_assert_max_num_queries):
+        """Test that the number of queries does not grow with the batch size"""
+        trainees = [self.make_trainee(faculty_user) for _ in range(5)]
+        epa = EPAFactory(program=faculty_user.program)
+        items = [self.item(trainee, epa) for trainee in trainees]
+        
+        with django_assert_max_num_queries(20):
+            response = faculty_client.post(reverse('assessment-batch'), {'assessments': items}, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+    
+    def test_batch_reports_failures_per_item(self, faculty_client, faculty_user):
+        """Test that invalid items are reported while valid ones are created"""
+        trainee = self.make_trainee(faculty_user)
+        epa = EPAFactory(program=faculty_user.program)
+        other_program_epa = EPAFactory()
+        outsider = UserFactory(role='trainee')
+        invalid_level = self.item(trainee, epa)
+        invalid_level['assessment_epas'][0]['entrustment_level'] = 9
+        
+        response = faculty_client.post(
+            reverse('assessment-batch'),
+            {'assessments': [
+                self.item(trainee, epa),
+                self.item(outsider, epa),
+                self.item(trainee, other_program_epa),
+                invalid_level,
+            ]},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        results = response.data['results']
+        assert [result['status'] for result in results] == ['created', 'error', 'error', 'error']
+        assert 'trainee' in results[1]['errors']
+        assert 'assessment_epas' in results[2]['errors']
+        assert 'assessment_epas' in results[3]['errors']
+        assert Assessment.objects.filter(trainee=trainee).count() == 1
+    
+    def test_batch_reports_repeated_epa_per_item(self, faculty_client, faculty_user):
+        """Test that an item rating the same EPA twice fails alone"""
+        trainee = self.make_trainee(faculty_user)
+        epa = EPAFactory(program=faculty_user.program)
+        repeated = self.item(trainee, epa)
+        repeated['assessment_epas'].append({'epa': str(epa.id), 'entrustment_level': 4})
+        
+        response = faculty_client.post(
+            reverse('assessment-batch'),
+            {'assessments': [self.item(trainee, epa), repeated]},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        results = response.data['results']
+        assert [result['status'] for result in results] == ['created', 'error']
+        assert 'assessment_epas' in results[1]['errors']
+        assert Assessment.objects.filter(trainee=trainee).count() == 1
+    
+    def test_batch_rejects_bad_envelope(self, faculty_client, faculty_user):
+        """Test that an empty or oversized batch is rejected"""
+        trainee = self.make_trainee(faculty_user)
+        epa = EPAFactory(program=faculty_user.program)
+        url = reverse('assessment-batch')
+        
+        assert faculty_client.post(url, {'assessments': []}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+        response = faculty_client.post(url, {'assessments': [self.item(trainee, epa)] * 51}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Assessment.objects.exists()
+    
+    def test_trainee_cannot_batch(self, authenticated_client):
+        """Test that trainees cannot submit assessments"""
+        response = authenticated_client.post(reverse('assessment-batch'), {'assessments': [{}]}, format='json')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestIdempotencyKeys:
+    """Test that writes sent with an Idempotency-Key header are not repeated"""
+    
+    def create_payload(self, faculty_user, **overrides):
+        cohort = CohortFactory(org=faculty_user.organization, program=faculty_user.program)
+        trainee = UserFactory(
+            role='trainee',
+            organization=faculty_user.organization,
+            program=faculty_user.program,
+            cohort=cohort
+        )
+        epa = EPAFactory(program=faculty_user.program)
+        data = {
+            'trainee': str(trainee.id),
+            'evaluator': str(faculty_user.id),
+            'shift_date': str(date.today()),
+            'status': 'submitted',
+            'assessment_epas': [{'epa': str(epa.id), 'entrustment_level': 3}],
+        }
+        data.update(overrides)
+        return data
+    
+    def test_retried_create_is_replayed(self, faculty_client, faculty_user):
+        """Test that a retry gets the stored response without creating a duplicate"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        
+        first = faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        retry = faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        
+        assert first.status_code == status.HTTP_201_CREATED
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert retry.json() == first.json()
+        assert Assessment.objects.filter(evaluator=faculty_user).count() == 1
+        assert IdempotencyKey.objects.get(key='shift-1').status_code == 201
+    
+    def test_without_key_each_request_writes(self, faculty_client, faculty_user):
+        """Test that requests without the header behave as before"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        
+        faculty_client.post(url, data, format='json')
+        faculty_client.post(url, data, format='json')
+        
+        assert Assessment.objects.filter(evaluator=faculty_user).count() == 2
+        assert not IdempotencyKey.objects.exists()
+    
+    def test_key_reused_for_different_request(self, faculty_client, faculty_user):
+        """Test that reusing a key with another body is rejected"""
+        url = reverse('assessment-list')
+        faculty_client.post(url, self.create_payload(faculty_user), format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        
+        response = faculty_client.post(
+            url, self.create_payload(faculty_user, location='ICU'), format='json', HTTP_IDEMPOTENCY_KEY='shift-1'
+        )
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Assessment.objects.filter(evaluator=faculty_user).count() == 1
+    
+    def test_failed_validation_is_not_stored(self, faculty_client, faculty_user):
+        """Test that a request rejected by validation can be retried with the same key"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        
+        response = faculty_client.post(
+            url, {**data, 'shift_date': 'not-a-date'}, format='json', HTTP_IDEMPOTENCY_KEY='shift-1'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not IdempotencyKey.objects.exists()
+    
+    def test_retried_partial_update_is_replayed(self, faculty_client, faculty_user):
+        """Test that partial updates honour the key"""
+        assessment = AssessmentFactory(evaluator=faculty_user, status='submitted')
+        url = reverse('assessment-detail', args=[assessment.id])
+        
+        first = faculty_client.patch(url, {'location': 'ICU'}, format='json', HTTP_IDEMPOTENCY_KEY='edit-1')
+        retry = faculty_client.patch(url, {'location': 'ICU'}, format='json', HTTP_IDEMPOTENCY_KEY='edit-1')
+        
+        assert first.status_code == status.HTTP_200_OK
+        assert retry.status_code == status.HTTP_200_OK
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first
+    
+    def test_in_progress_key_conflicts(self, faculty_client, faculty_user):
+        """Test that a retry racing the original request gets a conflict"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        # Put the key back in the state it has while the original is running
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        
+        response = faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert Assessment.objects.filter(evaluator=faculty_user).count() == 1
+    
+    def test_abandoned_key_is_taken_over(self, faculty_client, faculty_user):
+        """Test that a key held past the lease by a request that never finished can be retried"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        # The worker died mid-request: the key is unfinished and older than the lease
+        IdempotencyKey.objects.update(
+            status_code=None, response_body=None, created_at=timezone.now() - timedelta(hours=1)
+        )
+        
+        response = faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'Idempotent-Replayed' not in response
+        assert IdempotencyKey.objects.get(key='shift-1').status_code == 201
+    
+    def test_expired_key_runs_again(self, faculty_client, faculty_user):
+        """Test that a key past its TTL is treated as new, and purged by the command"""
+        data = self.create_payload(faculty_user)
+        url = reverse('assessment-list')
+        faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        
+        response = faculty_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='shift-1')
+        
+        assert 'Idempotent-Replayed' not in response
+        assert Assessment.objects.filter(evaluator=faculty_user).count() == 2
+        
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        assert not IdempotencyKey.objects.exists()
+
+
+@pytest.mark.django_db
+class TestMailboxQueries:
+    """Test the SQL behind the mailbox lists"""
+    
+    def test_unread_mailbox_uses_not_exists(self, leadership_client, leadership_user, faculty_user):
+        """Test that the unread list is an index-backed NOT EXISTS scoped by program"""
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        read = AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', private_comments='Read')
+        unread = AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', private_comments='Unread')
+        read.acknowledged_by.add(leadership_user)
+        AssessmentFactory(status='submitted', private_comments='Another program')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = leadership_client.get(reverse('assessment-mailbox'))
+        
+        assert [row['id'] for row in response.data['results']] == [str(unread.id)]
+        page_sql = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "assessments"') and 'LIMIT' in query['sql'])
+        assert 'NOT EXISTS' in page_sql
+        
+        response = leadership_client.get(reverse('assessment-mailbox-read'))
+        assert [row['id'] for row in response.data['results']] == [str(read.id)]
+    
+    def test_mailbox_query_uses_partial_index(self, leadership_user):
+        """Test that the database plans the unread list on the mailbox partial index"""
+        if connection.vendor != 'sqlite':
+            pytest.skip('Query plan check is written for SQLite')
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        AssessmentFactory.create_batch(30, trainee=trainee, status='submitted', private_comments='')
+        AssessmentFactory.create_batch(3, trainee=trainee, status='submitted', private_comments='Note')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        sql, params = unread_mailbox(leadership_user).order_by('-created_at')[:20].query.sql_with_params()
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        
+        assert 'assessments_mailbox_idx' in plan
+    
+    def test_mailbox_without_program_is_empty(self, leadership_client, leadership_user):
+        """Test that a leadership user without a program has an empty mailbox"""
+        AssessmentFactory(trainee__program=None, status='submitted', private_comments='Note')
+        leadership_user.program = None
+        leadership_user.save()
+        
+        assert leadership_client.get(reverse('assessment-mailbox')).data['results'] == []
+        assert leadership_client.get(reverse('assessment-mailbox-count')).data['unread_count'] == 0
+
+
+@pytest.mark.django_db
+class TestMailboxBulkMarkRead:
+    """Test marking many mailbox assessments read at once"""
+    
+    def make_unread(self, leadership_user, faculty_user, count):
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        return [
+            AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', private_comments='Note')
+            for _ in range(count)
+        ]
+    
+    def test_mark_ids_read(self, leadership_client, leadership_user, faculty_user):
+        """Test that the listed assessments are acknowledged and the new count returned"""
+        assessments = self.make_unread(leadership_user, faculty_user, 3)
+        other_program = AssessmentFactory(status='submitted', private_comments='Elsewhere')
+        
+        response = leadership_client.post(
+            reverse('assessment-mailbox-mark-read'),
+            {'ids': [str(assessments[0].id), str(assessments[1].id), str(other_program.id)]},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'marked_read': 2, 'unread_count': 1}
+        assert set(leadership_user.assessments_acknowledged.all()) == {assessments[0], assessments[1]}
+        assert not other_program.acknowledged_by.exists()
+    
+    def test_mark_all_read_in_constant_queries(self, leadership_client, leadership_user, faculty_user, django_assert_max_num_queries):
+        """Test that marking everything read does not run per-assessment queries"""
+        self.make_unread(leadership_user, faculty_user, 25)
+        since = encode_sync_cursor(timezone.now() - timedelta(seconds=30))
+        
+        with django_assert_max_num_queries(12):
+            response = leadership_client.post(reverse('assessment-mailbox-mark-read'), {'all': True}, format='json')
+        
+        assert response.data == {'marked_read': 25, 'unread_count': 0}
+        assert leadership_client.get(reverse('assessment-mailbox')).data['results'] == []
+        # Delta sync clients see the acknowledgements
+        changes = leadership_client.get(reverse('assessment-changes'), {'since': since})
+        assert len(changes.data['assessments']) == 25
+    
+    def test_mark_all_up_to_cursor(self, leadership_client, leadership_user, faculty_user):
+        """Test that up_to only marks the pages the user has loaded"""
+        self.make_unread(leadership_user, faculty_user, 5)
+        page = leadership_client.get(reverse('assessment-mailbox'), {'cursor': '', 'limit': 2})
+        
+        response = leadership_client.post(
+            reverse('assessment-mailbox-mark-read'),
+            {'all': True, 'up_to': page.data['next_cursor']},
+            format='json'
+        )
+        
+        assert response.data == {'marked_read': 2, 'unread_count': 3}
+        marked = {row['id'] for row in page.data['results']}
+        assert {str(pk) for pk in leadership_user.assessments_acknowledged.values_list('id', flat=True)} == marked
+    
+    @pytest.mark.parametrize('body', [{}, {'ids': ['not-a-uuid']}, {'all': True, 'up_to': 'bogus'}, {'ids': [], 'all': True}])
+    def test_invalid_requests(self, leadership_client, body):
+        """Test that malformed bodies are rejected"""
+        response = leadership_client.post(reverse('assessment-mailbox-mark-read'), body, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_faculty_cannot_bulk_mark_read(self, faculty_client):
+        """Test that only leadership and admins can mark assessments read"""
+        response = faculty_client.post(reverse('assessment-mailbox-mark-read'), {'all': True}, format='json')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestMailboxCount:
+    """Test the mailbox/count endpoint"""
+    
+    def test_count_uses_stored_counter(self, leadership_client, leadership_user, faculty_user, django_assert_num_queries):
+        """Test that the count is read from the counter and follows mark-read"""
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        first, second = [
+            AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', private_comments='Note')
+            for _ in range(2)
+        ]
+        AssessmentFactory(status='submitted', private_comments='Another program')
+        url = reverse('assessment-mailbox-count')
+        
+        assert leadership_client.get(url).data['unread_count'] == 2
+        
+        leadership_client.post(reverse('assessment-mark-read', args=[first.id]))
+        # The earlier requests cached the token, leaving the counter lookup
+        with django_assert_num_queries(1):
+            response = leadership_client.get(url)
+        assert response.data['unread_count'] == 1
+    
+    def test_count_for_non_leadership(self, faculty_client):
+        """Test that other roles always get zero"""
+        response = faculty_client.get(reverse('assessment-mailbox-count'))
+        
+        assert response.data == {'unread_count': 0}
+    
+    def test_batch_submission_updates_counter(self, leadership_client, leadership_user, faculty_user):
+        """Test that bulk-created assessments are added to the counter"""
+        url = reverse('assessment-mailbox-count')
+        assert leadership_client.get(url).data['unread_count'] == 0
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        epa = EPAFactory(program=leadership_user.program)
+        
+        token, _ = Token.objects.get_or_create(user=faculty_user)
+        leadership_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        leadership_client.post(reverse('assessment-batch'), {'assessments': [{
+            'trainee': str(trainee.id),
+            'shift_date': str(date.today()),
+            'status': 'submitted',
+            'private_comments': 'Needs follow-up',
+            'assessment_epas': [{'epa': str(epa.id), 'entrustment_level': 3}],
+        }]}, format='json')
+        
+        token, _ = Token.objects.get_or_create(user=leadership_user)
+        leadership_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert leadership_client.get(url).data['unread_count'] == 1
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    """Test ?fields= and ?view=compact on the assessment lists"""
+    
+    def make_assessment(self, trainee_user, faculty_user, epa):
+        assessment = AssessmentFactory(trainee=trainee_user, evaluator=faculty_user, status='submitted')
+        AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=4)
+        return assessment
+    
+    def test_fields_limits_payload_and_sql(self, authenticated_client, trainee_user, faculty_user, epa):
+        """Test that only the requested fields are serialized and selected"""
+        assessment = self.make_assessment(trainee_user, faculty_user, epa)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(reverse('assessment-my-assessments'), {'fields': 'status,shift_date'})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [{
+            'id': str(assessment.id), 'shift_date': str(assessment.shift_date), 'status': 'submitted'
+        }]
+        assert 'entrustment_levels' not in response.data
+        page_sql = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "assessments"') and 'LIMIT' in query['sql'])
+        assert '"private_comments"' not in page_sql
+        assert 'JOIN "users"' not in page_sql
+        assert 'assessment_epas' not in ' '.join(query['sql'] for query in queries)
+    
+    def test_compact_view(self, authenticated_client, trainee_user, faculty_user, epa):
+        """Test that the compact view drops per-rating descriptions and sends a legend"""
+        self.make_assessment(trainee_user, faculty_user, epa)
+        
+        response = authenticated_client.get(reverse('assessment-list'), {'view': 'compact'})
+        
+        row = response.data['results'][0]
+        assert set(row) == set(COMPACT_ASSESSMENT_FIELDS)
+        assert row['trainee_name'] == trainee_user.name
+        assert row['epa_count'] == 1
+        assert row['assessment_epas'] == [{
+            'id': row['assessment_epas'][0]['id'], 'epa': epa.id, 'epa_code': epa.code, 'entrustment_level': 4
+        }]
+        assert response.data['entrustment_levels'][4].startswith('I needed to be there')
+    
+    def test_full_representation_unchanged(self, authenticated_client, trainee_user, faculty_user, epa):
+        """Test that lists without the parameters keep the full payload"""
+        self.make_assessment(trainee_user, faculty_user, epa)
+        
+        response = authenticated_client.get(reverse('assessment-my-assessments'))
+        
+        row = response.data['results'][0]
+        assert 'can_edit' in row
+        assert 'entrustment_level_description' in row['assessment_epas'][0]
+        assert 'entrustment_levels' not in response.data
+    
+    def test_unknown_field(self, authenticated_client):
+        """Test that unknown field names are rejected"""
+        response = authenticated_client.get(reverse('assessment-my-assessments'), {'fields': 'status,password'})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'password' in str(response.data['fields'])
+
+
+@pytest.mark.django_db
+class TestAssessmentSearch:
+    """Test full-text search over narrative comments"""
+    
+    def make_assessment(self, leadership_user, faculty_user, **comments):
+        trainee = UserFactory(role='trainee', organization=leadership_user.organization, program=leadership_user.program)
+        comments = {'what_went_well': '', 'what_could_improve': '', 'private_comments': '', **comments}
+        return AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', **comments)
+    
+    def test_ranked_program_scoped_results(self, leadership_client, leadership_user, faculty_user):
+        """Test that matches are ranked, highlighted and limited to the program's submitted assessments"""
+        strong = self.make_assessment(
+            leadership_user, faculty_user,
+            what_went_well='Excellent airway management', what_could_improve='Airway positioning before intubation'
+        )
+        weak = self.make_assessment(
+            leadership_user, faculty_user,
+            what_went_well='Good handoffs', what_could_improve='Practice airway adjuncts', private_comments='Long shift'
+        )
+        self.make_assessment(leadership_user, faculty_user, what_went_well='Great handoff')
+        AssessmentFactory(status='submitted', what_went_well='Airway in another program')
+        AssessmentFactory(
+            trainee=weak.trainee, evaluator=faculty_user, status='draft', what_went_well='Draft airway note'
+        )
+        
+        response = leadership_client.get(reverse('assessment-search'), {'q': 'airway'})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 2
+        assert [row['id'] for row in response.data['results']] == [str(strong.id), str(weak.id)]
+        assert response.data['results'][0]['search_rank'] > response.data['results'][1]['search_rank']
+        assert '**airway**' in response.data['results'][1]['search_snippet'].lower()
+    
+    def test_stemming_and_all_terms(self, leadership_client, leadership_user, faculty_user):
+        """Test that word forms match and every term is required"""
+        both = self.make_assessment(leadership_user, faculty_user, private_comments='Struggled with handoffs at night')
+        self.make_assessment(leadership_user, faculty_user, private_comments='Smooth handoff')
+        
+        response = leadership_client.get(reverse('assessment-search'), {'q': 'handoff night"'})
+        
+        assert [row['id'] for row in response.data['results']] == [str(both.id)]
+    
+    def test_index_follows_edits_and_deletes(self, leadership_client, leadership_user, faculty_user):
+        """Test that saving and deleting keep the index current"""
+        assessment = self.make_assessment(leadership_user, faculty_user, what_went_well='Sutures')
+        url = reverse('assessment-search')
+        
+        assessment.what_went_well = 'Ultrasound guided line'
+        assessment.save()
+        assert leadership_client.get(url, {'q': 'sutures'}).data['count'] == 0
+        assert leadership_client.get(url, {'q': 'ultrasound'}).data['count'] == 1
+        
+        assessment.delete()
+        assert leadership_client.get(url, {'q': 'ultrasound'}).data['count'] == 0
+    
+    def test_pagination_and_sparse_fields(self, leadership_client, leadership_user, faculty_user):
+        """Test page-number pagination and ?fields= on search results"""
+        for _ in range(3):
+            self.make_assessment(leadership_user, faculty_user, what_could_improve='Documentation')
+        
+        response = leadership_client.get(
+            reverse('assessment-search'), {'q': 'documentation', 'limit': 2, 'fields': 'status'}
+        )
+        
+        assert response.data['count'] == 3
+        assert len(response.data['results']) == 2
+        assert response.data['next'] is not None
+        assert set(response.data['results'][0]) == {'id', 'status', 'search_rank', 'search_snippet'}
+        response = leadership_client.get(response.data['next'])
+        assert len(response.data['results']) == 1
+    
+    def test_search_requires_query(self, leadership_client):
+        """Test that a query without words is rejected"""
+        response = leadership_client.get(reverse('assessment-search'), {'q': ' "* '})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_faculty_cannot_search(self, faculty_client):
+        """Test that only leadership and admins can search comments"""
+        response = faculty_client.get(reverse('assessment-search'), {'q': 'airway'})
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_rebuild_command(self, leadership_client, leadership_user, faculty_user):
+        """Test that rebuilding repopulates rows written without signals"""
+        assessment = self.make_assessment(leadership_user, faculty_user)
+        Assessment.objects.filter(pk=assessment.pk).update(what_went_well='Procedural sedation')
+        url = reverse('assessment-search')
+        assert leadership_client.get(url, {'q': 'sedation'}).data['count'] == 0
+        
+        call_command('rebuild_search_index', stdout=StringIO())
+        
+        assert leadership_client.get(url, {'q': 'sedation'}).data['count'] == 1
+
+
 @pytest.mark.django_db
 class TestAssessmentCRUDOperations:
     """Test assessment create, read, update, delete operations"""
@@ -591,7 +1413,7 @@ class TestExportViews:
         assert 'attachment' in response['Content-Disposition']
         
         # Check CSV content
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         assert trainee.name in content
         assert trainee.email in content
     
@@ -735,7 +1557,7 @@ class TestExportViews:
         })
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Should include own program's trainee
         assert trainee_own.name in content
@@ -789,7 +1611,7 @@ class TestExportViews:
         })
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Should include trainee from cohort1
         assert trainee1.name in content
@@ -833,7 +1655,7 @@ class TestExportViews:
         })
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         lines = content.strip().split('\n')
         
         # Should have header + at least 1 data row
@@ -902,7 +1724,7 @@ class TestExportViews:
         })
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Verify submitted EPA data is present
         assert epa1.code in content
@@ -911,6 +1733,117 @@ class TestExportViews:
         assert epa2.code not in content
 
 
+    
+    def test_export_gzip_on_request(self, leadership_client, leadership_user, faculty_user):
+        """Test that the export is gzip-encoded when the client accepts it"""
+        trainee = UserFactory(
+            role='trainee',
+            organization=leadership_user.organization,
+            program=leadership_user.program
+        )
+        assessment = AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted', shift_date=date.today())
+        AssessmentEPAFactory(assessment=assessment, epa=EPAFactory(program=leadership_user.program))
+        url = reverse('export_assessments')
+        params = {
+            'start_date': date.today().strftime('%Y-%m-%d'),
+            'end_date': date.today().strftime('%Y-%m-%d')
+        }
+        
+        response = leadership_client.get(url, params, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        assert content.startswith('Trainee Name,')
+        assert trainee.name in content
+        
+        plain = leadership_client.get(url, params)
+        assert not plain.has_header('Content-Encoding')
+        assert b''.join(plain.streaming_content).decode('utf-8') == content
+        
+        # An explicit q=0 refuses gzip
+        for refused in ('gzip;q=0, deflate', 'gzip; q=0.0', '*;q=0', 'br, *;q=0'):
+            response = leadership_client.get(url, params, HTTP_ACCEPT_ENCODING=refused)
+            assert not response.has_header('Content-Encoding')
+        
+        response = leadership_client.get(url, params, HTTP_ACCEPT_ENCODING='br;q=1.0, *;q=0.5')
+        assert response['Content-Encoding'] == 'gzip'
+    
+    def test_export_parquet_typed_columns(self, leadership_client, leadership_user, faculty_user, monkeypatch):
+        """Test that format=parquet writes typed, dictionary-encoded columns in row groups"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        from assessments import exports
+        monkeypatch.setattr(exports, 'EXPORT_CHUNK_SIZE', 2)
+        cohort = CohortFactory(org=leadership_user.organization, program=leadership_user.program)
+        epa = EPAFactory(program=leadership_user.program)
+        for level in (1, 3, 5):
+            assessment = AssessmentFactory(
+                trainee__program=leadership_user.program,
+                trainee__organization=leadership_user.organization,
+                trainee__cohort=cohort,
+                evaluator=faculty_user,
+                status='submitted',
+                shift_date=date.today()
+            )
+            AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=level)
+        
+        response = leadership_client.get(reverse('export_assessments'), {
+            'start_date': date.today().strftime('%Y-%m-%d'),
+            'end_date': date.today().strftime('%Y-%m-%d'),
+            'format': 'parquet'
+        })
+        
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/vnd.apache.parquet'
+        assert '.parquet' in response['Content-Disposition']
+        parquet_file = pq.ParquetFile(BytesIO(b''.join(response.streaming_content)))
+        assert parquet_file.metadata.num_rows == 3
+        assert parquet_file.metadata.num_row_groups == 2
+        table = parquet_file.read()
+        assert str(table.schema.field('entrustment_level').type) == 'int8'
+        assert str(table.schema.field('assessment_date').type) == 'date32[day]'
+        assert str(table.schema.field('epa_code').type) == 'dictionary<values=string, indices=int32, ordered=0>'
+        assert sorted(table.column('entrustment_level').to_pylist()) == [1, 3, 5]
+        assert table.column('assessment_date').to_pylist() == [date.today()] * 3
+        assert set(table.column('cohort').to_pylist()) == {cohort.name}
+    
+    def test_export_invalid_format(self, leadership_client, leadership_user):
+        """Test that unknown formats are rejected"""
+        response = leadership_client.get(reverse('export_assessments'), {
+            'start_date': '2025-01-01',
+            'end_date': '2025-01-31',
+            'format': 'json'
+        })
+        
+        assert response.status_code == 400
+        assert 'Invalid format' in response.json()['error']
+    
+    def test_export_streams_in_chunks(self, leadership_client, leadership_user, faculty_user, monkeypatch):
+        """Test that rows are read in chunks instead of materializing the queryset"""
+        from assessments import exports
+        monkeypatch.setattr(exports, 'EXPORT_CHUNK_SIZE', 2)
+        epa = EPAFactory(program=leadership_user.program)
+        for _ in range(5):
+            assessment = AssessmentFactory(
+                trainee__program=leadership_user.program,
+                trainee__organization=leadership_user.organization,
+                evaluator=faculty_user,
+                status='submitted',
+                shift_date=date.today()
+            )
+            AssessmentEPAFactory(assessment=assessment, epa=epa)
+        
+        response = leadership_client.get(reverse('export_assessments'), {
+            'start_date': date.today().strftime('%Y-%m-%d'),
+            'end_date': date.today().strftime('%Y-%m-%d')
+        })
+        
+        assert response.streaming
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        assert len(rows) == 6
+
+
 @pytest.mark.django_db
 class TestCompetencyGridExportViews:
     """Test competency grid CSV export functionality"""
@@ -954,7 +1887,7 @@ class TestCompetencyGridExportViews:
         assert response['Content-Type'] == 'text/csv'
         
         # Check content
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         assert 'Trainee Name' in content
         assert trainee.name in content
         assert competency.title in content
@@ -1011,7 +1944,7 @@ class TestCompetencyGridExportViews:
         response = leadership_client.get(url)
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Should include trainee from same program
         assert trainee_same_program.name in content
@@ -1063,7 +1996,7 @@ class TestCompetencyGridExportViews:
         })
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Parse CSV to find the row with this trainee and subcompetency
         reader = csv.DictReader(content.splitlines())
@@ -1106,7 +2039,7 @@ class TestCompetencyGridExportViews:
         response = leadership_client.get(url, {'cohort_id': str(cohort1.id)})
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Should include cohort1 name
         assert cohort1.name in content
@@ -1143,7 +2076,7 @@ class TestCompetencyGridExportViews:
         response = leadership_client.get(url)
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Check header row
         lines = content.strip().split('\n')
@@ -1189,7 +2122,7 @@ class TestCompetencyGridExportViews:
         response = leadership_client.get(url)
         
         assert response.status_code == 200
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         
         # Should include trainee name
         assert trainee.name in content
@@ -1223,3 +2156,200 @@ class TestCompetencyGridExportViews:
         data = response.json()
         assert 'Invalid end_date format' in data['error']
 
+    
+    def test_wide_layout(self, leadership_client, leadership_user, faculty_user):
+        """Test that the wide layout has one row per trainee and one column per sub-competency"""
+        trainee = UserFactory(
+            role='trainee',
+            organization=leadership_user.organization,
+            program=leadership_user.program
+        )
+        competency = CoreCompetencyFactory(program=leadership_user.program, title='Patient Care', code='PC')
+        history = SubCompetencyFactory(core_competency=competency, title='History Taking', code='PC1')
+        SubCompetencyFactory(core_competency=competency, title='Physical Exam', code='PC2')
+        epa = EPAFactory(program=leadership_user.program)
+        SubCompetencyEPAFactory(sub_competency=history, epa=epa)
+        assessment = AssessmentFactory(
+            trainee=trainee,
+            evaluator=faculty_user,
+            status='submitted',
+            shift_date=date.today()
+        )
+        AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=4)
+        
+        response = leadership_client.get(reverse('export_competency_grid'), {'layout': 'wide'})
+        
+        assert response.status_code == 200
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        assert rows[0] == ['Trainee Name', 'Cohort', 'Patient Care - History Taking', 'Patient Care - Physical Exam']
+        assert rows[1:] == [[trainee.name, trainee.cohort.name if trainee.cohort else '', '4.0', '']]
+    
+    def test_invalid_layout_error(self, leadership_client):
+        """Test that unknown layouts are rejected"""
+        response = leadership_client.get(reverse('export_competency_grid'), {'layout': 'diagonal'})
+        
+        assert response.status_code == 400
+        assert 'Invalid layout' in response.json()['error']
+    
+    def test_query_count_independent_of_trainees(self, leadership_client, leadership_user, faculty_user):
+        """Test that larger programs do not issue more queries"""
+        competency = CoreCompetencyFactory(program=leadership_user.program)
+        subcompetency = SubCompetencyFactory(core_competency=competency)
+        epa = EPAFactory(program=leadership_user.program)
+        SubCompetencyEPAFactory(sub_competency=subcompetency, epa=epa)
+        
+        def add_trainees(count):
+            for _ in range(count):
+                trainee = UserFactory(
+                    role='trainee',
+                    organization=leadership_user.organization,
+                    program=leadership_user.program
+                )
+                assessment = AssessmentFactory(trainee=trainee, evaluator=faculty_user, status='submitted')
+                AssessmentEPAFactory(assessment=assessment, epa=epa, entrustment_level=3)
+        
+        url = reverse('export_competency_grid')
+        add_trainees(1)
+        with CaptureQueriesContext(connection) as small_export:
+            b''.join(leadership_client.get(url).streaming_content)
+        
+        add_trainees(5)
+        SubCompetencyFactory(core_competency=competency)
+        with CaptureQueriesContext(connection) as large_export:
+            content = b''.join(leadership_client.get(url).streaming_content).decode('utf-8')
+        
+        assert len(content.strip().splitlines()) == 1 + 6 * 2
+        assert len(large_export.captured_queries) == len(small_export.captured_queries)
+
+
+@pytest.mark.django_db
+class TestExportJobViews:
+    """Test queueing, polling and downloading background exports"""
+    
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+    
+    def completed_job(self, leadership_client, leadership_user, faculty_user):
+        """Queue an assessment export with one row and run it"""
+        assessment = AssessmentFactory(
+            trainee__program=leadership_user.program,
+            trainee__organization=leadership_user.organization,
+            evaluator=faculty_user,
+            status='submitted',
+            shift_date=date.today()
+        )
+        AssessmentEPAFactory(assessment=assessment, epa=EPAFactory(program=leadership_user.program))
+        response = leadership_client.post(reverse('create_export_job'), {
+            'export_type': 'assessments',
+            'start_date': date.today().strftime('%Y-%m-%d'),
+            'end_date': date.today().strftime('%Y-%m-%d')
+        }, format='json')
+        assert response.status_code == 202
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        return ExportJob.objects.get(id=response.json()['id'])
+    
+    def test_enqueue_and_poll(self, leadership_client, leadership_user, faculty_user):
+        """Test that a queued job reports pending, then completed with a download link"""
+        response = leadership_client.post(reverse('create_export_job'), {
+            'export_type': 'competency_grid',
+            'layout': 'wide'
+        }, format='json')
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert data['status'] == 'pending'
+        assert data['parameters']['layout'] == 'wide'
+        assert data['download_url'] is None
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        data = leadership_client.get(reverse('export_job_status', args=[data['id']])).json()
+        assert data['status'] == 'completed'
+        assert data['progress'] == 100
+        assert data['download_url'] == reverse('download_export_job', args=[data['id']])
+    
+    def test_enqueue_validation(self, leadership_client):
+        """Test that parameters are validated like the synchronous exports"""
+        url = reverse('create_export_job')
+        
+        response = leadership_client.post(url, {'export_type': 'assessments'}, format='json')
+        assert response.status_code == 400
+        assert 'start_date and end_date are required' in response.json()['error']
+        
+        response = leadership_client.post(url, {'export_type': 'competency_grid', 'start_date': '2025/01/01'}, format='json')
+        assert response.status_code == 400
+        assert 'Invalid start_date format' in response.json()['error']
+        
+        response = leadership_client.post(url, {'export_type': 'unknown'}, format='json')
+        assert response.status_code == 400
+    
+    def test_enqueue_permissions(self, api_client, admin_user, faculty_user):
+        """Test that roles are checked like the synchronous exports"""
+        url = reverse('create_export_job')
+        
+        token, _ = Token.objects.get_or_create(user=admin_user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.post(url, {'export_type': 'competency_grid'}, format='json')
+        assert response.status_code == 403
+        
+        token, _ = Token.objects.get_or_create(user=faculty_user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.post(url, {
+            'export_type': 'assessments', 'start_date': '2025-01-01', 'end_date': '2025-01-31'
+        }, format='json')
+        assert response.status_code == 403
+    
+    def test_download_full_and_ranges(self, leadership_client, leadership_user, faculty_user):
+        """Test full downloads and resuming with a Range header"""
+        job = self.completed_job(leadership_client, leadership_user, faculty_user)
+        url = reverse('download_export_job', args=[job.id])
+        
+        response = leadership_client.get(url)
+        assert response.status_code == 200
+        assert response['Accept-Ranges'] == 'bytes'
+        content = b''.join(response.streaming_content)
+        assert content.startswith(b'Trainee Name,')
+        assert int(response['Content-Length']) == len(content)
+        
+        response = leadership_client.get(url, HTTP_RANGE='bytes=10-')
+        assert response.status_code == 206
+        assert response['Content-Range'] == f'bytes 10-{len(content) - 1}/{len(content)}'
+        assert b''.join(response.streaming_content) == content[10:]
+        
+        response = leadership_client.get(url, HTTP_RANGE='bytes=0-4')
+        assert b''.join(response.streaming_content) == content[:5]
+        
+        response = leadership_client.get(url, HTTP_RANGE='bytes=-6')
+        assert b''.join(response.streaming_content) == content[-6:]
+        
+        response = leadership_client.get(url, HTTP_RANGE=f'bytes={len(content)}-')
+        assert response.status_code == 416
+        assert response['Content-Range'] == f'bytes */{len(content)}'
+        
+        # Unparseable ranges are ignored and the whole file is sent
+        for invalid in ('bytes=abc', 'bytes=-', 'items=0-4', 'bytes=0-4,8-9', 'bytes=9-4'):
+            response = leadership_client.get(url, HTTP_RANGE=invalid)
+            assert response.status_code == 200
+            assert 'Content-Range' not in response
+            assert b''.join(response.streaming_content) == content
+    
+    def test_download_states_and_ownership(self, leadership_client, leadership_user, faculty_user):
+        """Test pending, expired and other users' jobs cannot be downloaded"""
+        job = self.completed_job(leadership_client, leadership_user, faculty_user)
+        url = reverse('download_export_job', args=[job.id])
+        
+        ExportJob.objects.filter(id=job.id).update(status='running')
+        assert leadership_client.get(url).status_code == 409
+        
+        ExportJob.objects.filter(id=job.id).update(status='expired')
+        assert leadership_client.get(url).status_code == 410
+        
+        other_leader = UserFactory(
+            role='leadership',
+            organization=leadership_user.organization,
+            program=leadership_user.program
+        )
+        token, _ = Token.objects.get_or_create(user=other_leader)
+        leadership_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert leadership_client.get(url).status_code == 404
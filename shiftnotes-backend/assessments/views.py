@@ -1,18 +1,48 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg, Count
-from django.http import JsonResponse, HttpResponse
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from datetime import datetime, timedelta
-import csv
-from .models import Assessment, AssessmentEPA
-from .serializers import AssessmentSerializer, AssessmentCreateSerializer
-from users.models import User
-from curriculum.models import CoreCompetency, EPA
+import os
+import re
+import tempfile
+import uuid
+from analytics.rollups import deferred_rollups
+from .batch import MAX_BATCH_SIZE, create_assessment_batch
+from .idempotency import idempotent
+from .mailbox import (
+    mark_read as mark_mailbox_read, read_mailbox, unread_mailbox, unread_count as mailbox_unread_count
+)
+from .models import Assessment, AssessmentTombstone, ExportJob
+from .pagination import get_page_size, paginate_assessments
+from .renderers import CSVRenderer, ParquetRenderer
+from .search import search_assessments, search_terms
+from .serializers import (
+    COMPACT_ASSESSMENT_FIELDS, ENTRUSTMENT_LEVEL_DESCRIPTIONS, AssessmentSerializer, AssessmentCreateSerializer,
+    AssessmentEPASerializer
+)
+from .sync import changes_since, decode_sync_cursor, encode_sync_cursor
+from .tasks import generate_export
+from .exports import (
+    ASSESSMENT_EXPORT_FORMATS, COMPETENCY_GRID_LAYOUTS, PARQUET_CONTENT_TYPE, assessment_export_queryset,
+    assessment_rows, competency_grid_rows, stream_csv, validate_export_parameters,
+    write_assessments_parquet
+)
+
+# List endpoints that accept ?view=compact and ?fields=
+SPARSE_FIELDSET_ACTIONS = [
+    'list', 'my_assessments', 'given_assessments', 'received_assessments', 'mailbox', 'mailbox_read', 'search'
+]
 
 class AssessmentViewSet(viewsets.ModelViewSet):
     queryset = Assessment.objects.all()
@@ -75,13 +105,58 @@ class AssessmentViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass  # Ignore invalid date format
         
-        return queryset
+        return queryset.with_list_data(user, self.sparse_fields())
 
     def get_serializer_class(self):
         if self.action == 'create':
             return AssessmentCreateSerializer
         return AssessmentSerializer
 
+    def sparse_fields(self):
+        """
+        Fieldset requested with ?view=compact or ?fields=a,b,c on the list
+        endpoints (id is always included), or None for the full representation.
+
+        Raises:
+            ValidationError: For unknown field names
+        """
+        if self.action not in SPARSE_FIELDSET_ACTIONS:
+            return None
+        if self.request.query_params.get('view') == 'compact':
+            return COMPACT_ASSESSMENT_FIELDS
+        requested = self.request.query_params.get('fields')
+        if not requested:
+            return None
+        fields = ['id'] + [name.strip() for name in requested.split(',') if name.strip() and name.strip() != 'id']
+        unknown = [name for name in fields if name not in AssessmentSerializer.Meta.fields]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.sparse_fields()
+        if fields is not None and self.get_serializer_class() is AssessmentSerializer:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def add_legend(self, data):
+        """Sparse lists carry the entrustment level descriptions once instead of per rating"""
+        fields = self.sparse_fields()
+        if fields is not None and 'assessment_epas' in fields:
+            data['entrustment_levels'] = ENTRUSTMENT_LEVEL_DESCRIPTIONS
+        return data
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if isinstance(response.data, dict):
+            self.add_legend(response.data)
+        return response
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
     def update(self, request, *args, **kwargs):
         """
         Update an assessment with validation:
@@ -120,6 +195,7 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         # All checks passed, proceed with update
         return super().update(request, *args, **kwargs)
     
+    @idempotent
     def partial_update(self, request, *args, **kwargs):
         """
         Partially update an assessment with the same validation as full update
@@ -156,6 +232,13 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         # All checks passed, proceed with partial update
         return super().partial_update(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        # Leave tombstones so delta sync clients learn about the deletion
+        # The cascade deletes each rating first; refresh the rollup bucket once
+        with transaction.atomic(), deferred_rollups():
+            AssessmentTombstone.record_deletion(instance)
+            instance.delete()
+
     def destroy(self, request, *args, **kwargs):
         """
         Delete an assessment with validation:
@@ -206,6 +289,22 @@ class AssessmentViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    def paginated_response(self, request, assessments_queryset, count_key=None):
+        """
+        Serialize one page of assessments (see assessments.pagination for the page
+        and cursor modes). count_key repeats the total under an extra name.
+        """
+        try:
+            assessments, pagination = paginate_assessments(request, assessments_queryset)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(assessments, many=True)
+        data = {'results': serializer.data, **pagination}
+        if count_key:
+            data[count_key] = pagination['count']
+        return Response(self.add_legend(data))
+
     @action(detail=False, methods=['get'])
     def my_assessments(self, request):
         """Get assessments for the current user with pagination support"""
@@ -248,52 +347,16 @@ class AssessmentViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
-        assessments_queryset = assessments_queryset.order_by('-created_at')
+        assessments_queryset = assessments_queryset.with_list_data(user, self.sparse_fields()).order_by('-created_at')
         
-        # Manual pagination
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('limit', 20))
-        
-        paginator = Paginator(assessments_queryset, page_size)
-        try:
-            assessments_page = paginator.page(page)
-        except PageNotAnInteger:
-            assessments_page = paginator.page(1)
-        except EmptyPage:
-            assessments_page = paginator.page(paginator.num_pages)
-        
-        # Build URLs for pagination
-        request_url = request.build_absolute_uri().split('?')[0]
-        query_params = request.GET.copy()
-        
-        next_url = None
-        if assessments_page.has_next():
-            query_params['page'] = assessments_page.next_page_number()
-            next_url = f"{request_url}?{query_params.urlencode()}"
-            
-        previous_url = None
-        if assessments_page.has_previous():
-            query_params['page'] = assessments_page.previous_page_number()
-            previous_url = f"{request_url}?{query_params.urlencode()}"
-        
-        serializer = self.get_serializer(assessments_page.object_list, many=True)
-        return Response({
-            'results': serializer.data,
-            'count': paginator.count,
-            'next': next_url,
-            'previous': previous_url,
-        })
+        return self.paginated_response(request, assessments_queryset)
 
     @action(detail=False, methods=['get'])
     def given_assessments(self, request):
-        """Get assessments given by the current user"""
+        """Get assessments given by the current user with pagination support"""
         user = request.user
-        assessments = Assessment.objects.filter(evaluator=user).order_by('-created_at')
-        serializer = self.get_serializer(assessments, many=True)
-        return Response({
-            'results': serializer.data,
-            'count': assessments.count()
-        })
+        assessments_queryset = Assessment.objects.filter(evaluator=user).with_list_data(user, self.sparse_fields()).order_by('-created_at')
+        return self.paginated_response(request, assessments_queryset)
 
     @action(detail=False, methods=['get'])
     def received_assessments(self, request):
@@ -334,41 +397,169 @@ class AssessmentViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
-        assessments_queryset = assessments_queryset.order_by('-created_at')
+        assessments_queryset = assessments_queryset.with_list_data(user, self.sparse_fields()).order_by('-created_at')
         
-        # Manual pagination
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('limit', 20))
+        return self.paginated_response(request, assessments_queryset)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync: assessments and EPA ratings changed since a cursor, plus deletions
+        
+        Query params:
+        - since (optional): cursor from the previous response. Without it only a
+          starting cursor is returned; load the lists normally, then sync from it.
+        
+        Also honours the list filters (trainee_id, evaluator_id, epa_id, start_date, end_date).
+        """
+        cursor = encode_sync_cursor(timezone.now())
+        since_cursor = request.GET.get('since')
+        
+        if not since_cursor:
+            return Response({
+                'assessments': [],
+                'assessment_epas': [],
+                'deleted': {'assessments': [], 'assessment_epas': []},
+                'cursor': cursor,
+            })
         
-        paginator = Paginator(assessments_queryset, page_size)
         try:
-            assessments_page = paginator.page(page)
-        except PageNotAnInteger:
-            assessments_page = paginator.page(1)
-        except EmptyPage:
-            assessments_page = paginator.page(paginator.num_pages)
-        
-        # Build URLs for pagination
-        request_url = request.build_absolute_uri().split('?')[0]
-        query_params = request.GET.copy()
+            since = decode_sync_cursor(since_cursor)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        next_url = None
-        if assessments_page.has_next():
-            query_params['page'] = assessments_page.next_page_number()
-            next_url = f"{request_url}?{query_params.urlencode()}"
-            
-        previous_url = None
-        if assessments_page.has_previous():
-            query_params['page'] = assessments_page.previous_page_number()
-            previous_url = f"{request_url}?{query_params.urlencode()}"
+        assessments, assessment_epas, tombstones = changes_since(request.user, self.get_queryset(), since)
+        
+        deleted = {'assessments': [], 'assessment_epas': []}
+        for object_type, object_id in tombstones.values_list('object_type', 'object_id'):
+            deleted[f'{object_type}s'].append(str(object_id))
+        
+        assessment_epas = list(assessment_epas)
+        epa_rows = [
+            {**data, 'assessment': str(assessment_epa.assessment_id)}
+            for assessment_epa, data in zip(assessment_epas, AssessmentEPASerializer(assessment_epas, many=True).data)
+        ]
         
-        serializer = self.get_serializer(assessments_page.object_list, many=True)
         return Response({
-            'results': serializer.data,
-            'count': paginator.count,
+            'assessments': self.get_serializer(assessments, many=True).data,
+            'assessment_epas': epa_rows,
+            'deleted': deleted,
+            'cursor': cursor,
+        })
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over narrative comments of the program's submitted assessments (Leadership/Admin only)
+
+        Query params:
+        - q (required): search words; every word must match (English stemming)
+        - page, limit (optional): page-number pagination, best matches first
+
+        Each result carries search_rank (higher is better) and search_snippet,
+        with matches wrapped in ** markers.
+        """
+        user = request.user
+
+        if user.role not in ['leadership', 'admin']:
+            return Response(
+                {'detail': 'Only leadership and admins can search assessments.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        query = request.GET.get('q', '').strip()
+        if not search_terms(query):
+            return Response(
+                {'detail': 'q is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        page_size = get_page_size(request)
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+
+        total, matches = search_assessments(user.program_id, query, page_size, (page - 1) * page_size)
+        assessments = Assessment.objects.filter(
+            pk__in=[assessment_id for assessment_id, _, _ in matches]
+        ).with_list_data(user, self.sparse_fields()).in_bulk()
+
+        results = []
+        for assessment_id, rank, snippet in matches:
+            if assessment_id in assessments:
+                data = self.get_serializer(assessments[assessment_id]).data
+                results.append({**data, 'search_rank': rank, 'search_snippet': snippet})
+
+        request_url = request.build_absolute_uri(request.path)
+        query_params = request.GET.copy()
+        next_url = previous_url = None
+        if page * page_size < total:
+            query_params['page'] = page + 1
+            next_url = f"{request_url}?{query_params.urlencode()}"
+        if page > 1:
+            query_params['page'] = page - 1
+            previous_url = f"{request_url}?{query_params.urlencode()}"
+
+        return Response(self.add_legend({
+            'results': results,
+            'count': total,
             'next': next_url,
             'previous': previous_url,
-        })
+        }))
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """
+        Submit several assessments, evaluated by the current user, in one request
+
+        Body: {"assessments": [<assessment>, ...]} with the same fields as a
+        single create, minus evaluator. Valid items are created even if others
+        fail; the response lists a result per item in request order.
+        """
+        user = request.user
+
+        if user.role == 'trainee':
+            return Response(
+                {'detail': 'Trainees cannot submit assessments.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if not user.program:
+            return Response(
+                {'detail': 'User must be assigned to a program.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items = request.data.get('assessments') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'detail': 'assessments must be a non-empty list.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(items) > MAX_BATCH_SIZE:
+            return Response(
+                {'detail': f'A batch can contain at most {MAX_BATCH_SIZE} assessments.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = create_assessment_batch(user, items)
+        created = sum(1 for result in results if result['status'] == 'created')
+
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }, status=response_status)
 
     @action(detail=True, methods=['post'])
     def acknowledge(self, request, pk=None):
@@ -393,6 +584,8 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         assessment.acknowledged_by.add(request.user)
         assessment.save()
         
+        # Reload so the read state and acknowledgers reflect the change
+        assessment = self.get_object()
         serializer = self.get_serializer(assessment)
         return Response(serializer.data)
     
@@ -408,48 +601,11 @@ class AssessmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get assessments with private comments that current user hasn't acknowledged
-        assessments_queryset = Assessment.objects.filter(
-            private_comments__isnull=False,
-            private_comments__gt='',  # Has non-empty private comments
-            status='submitted'  # Only submitted assessments
-        ).exclude(
-            acknowledged_by=user  # Exclude assessments already acknowledged by this user
-        ).select_related(
-            'trainee', 'evaluator'
-        ).prefetch_related(
-            'assessment_epas__epa'
-        ).order_by('-created_at')
-        
-        # Filter by program
-        if user.program:
-            assessments_queryset = assessments_queryset.filter(trainee__program=user.program)
-        
-        # Manual pagination implementation
-        from django.core.paginator import Paginator
-        page_number = request.GET.get('page', 1)
-        page_size = int(request.GET.get('limit', 20))
-        
-        paginator = Paginator(assessments_queryset, page_size)
-        page_obj = paginator.get_page(page_number)
-        
-        serializer = self.get_serializer(page_obj.object_list, many=True)
-        
-        # Build pagination URLs
-        next_url = None
-        previous_url = None
-        if page_obj.has_next():
-            next_url = f"{request.build_absolute_uri()}?page={page_obj.next_page_number()}&limit={page_size}"
-        if page_obj.has_previous():
-            previous_url = f"{request.build_absolute_uri()}?page={page_obj.previous_page_number()}&limit={page_size}"
+        # Submitted assessments with private comments in the user's program that the
+        # user hasn't acknowledged (NOT EXISTS on the acknowledgements)
+        assessments_queryset = unread_mailbox(user).with_list_data(user, self.sparse_fields()).order_by('-created_at')
         
-        return Response({
-            'results': serializer.data,
-            'count': paginator.count,
-            'unread_count': paginator.count,
-            'next': next_url,
-            'previous': previous_url
-        })
+        return self.paginated_response(request, assessments_queryset, count_key='unread_count')
     
     @action(detail=False, methods=['get'], url_path='mailbox/read')
     def mailbox_read(self, request):
@@ -463,47 +619,10 @@ class AssessmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get assessments with private comments that current user HAS acknowledged
-        assessments_queryset = Assessment.objects.filter(
-            private_comments__isnull=False,
-            private_comments__gt='',  # Has non-empty private comments
-            status='submitted',  # Only submitted assessments
-            acknowledged_by=user  # Only assessments acknowledged by this user
-        ).select_related(
-            'trainee', 'evaluator'
-        ).prefetch_related(
-            'assessment_epas__epa'
-        ).order_by('-created_at')
-        
-        # Filter by program
-        if user.program:
-            assessments_queryset = assessments_queryset.filter(trainee__program=user.program)
-        
-        # Manual pagination implementation
-        from django.core.paginator import Paginator
-        page_number = request.GET.get('page', 1)
-        page_size = int(request.GET.get('limit', 20))
-        
-        paginator = Paginator(assessments_queryset, page_size)
-        page_obj = paginator.get_page(page_number)
-        
-        serializer = self.get_serializer(page_obj.object_list, many=True)
-        
-        # Build pagination URLs
-        next_url = None
-        previous_url = None
-        if page_obj.has_next():
-            next_url = f"{request.build_absolute_uri()}?page={page_obj.next_page_number()}&limit={page_size}"
-        if page_obj.has_previous():
-            previous_url = f"{request.build_absolute_uri()}?page={page_obj.previous_page_number()}&limit={page_size}"
+        # Same assessments that the user HAS acknowledged (EXISTS on the acknowledgements)
+        assessments_queryset = read_mailbox(user).with_list_data(user, self.sparse_fields()).order_by('-created_at')
         
-        return Response({
-            'results': serializer.data,
-            'count': paginator.count,
-            'read_count': paginator.count,
-            'next': next_url,
-            'previous': previous_url
-        })
+        return self.paginated_response(request, assessments_queryset, count_key='read_count')
     
     @action(detail=True, methods=['post'], url_path='mark-read')
     def mark_read(self, request, pk=None):
@@ -522,7 +641,53 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         assessment.acknowledged_by.add(user)
         
         return Response({'detail': 'Assessment marked as read.'})
-    
+
+    @action(detail=False, methods=['post'], url_path='mailbox/mark-read')
+    def mailbox_mark_read(self, request):
+        """
+        Mark many mailbox assessments as read by current leadership user
+
+        Body, one of:
+        - {"ids": [<assessment id>, ...]}
+        - {"all": true} for every unread assessment, optionally with
+          "up_to": <mailbox cursor> to stop at the last page the user loaded
+        """
+        user = request.user
+
+        # Only leadership and admins can mark as read
+        if user.role not in ['leadership', 'admin']:
+            return Response(
+                {'detail': 'Only leadership and admins can mark assessments as read.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        ids = request.data.get('ids')
+        mark_all = request.data.get('all') is True
+        if mark_all == (ids is not None):
+            return Response(
+                {'detail': 'Provide either ids or all.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if ids is not None:
+            try:
+                ids = [uuid.UUID(str(assessment_id)) for assessment_id in ids]
+            except (TypeError, ValueError):
+                return Response(
+                    {'detail': 'ids must be a list of assessment IDs.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            marked = mark_mailbox_read(user, assessment_ids=ids, up_to=request.data.get('up_to'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'marked_read': marked,
+            'unread_count': mailbox_unread_count(user) if user.program_id else 0,
+        })
+
     @action(detail=False, methods=['get'], url_path='mailbox/count')
     def mailbox_count(self, request):
         """Get count of unread assessments for current leadership user"""
@@ -532,29 +697,36 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         if user.role not in ['leadership', 'admin']:
             return Response({'unread_count': 0})
         
-        # Count assessments with private comments that current user hasn't acknowledged
-        unread_count = Assessment.objects.filter(
-            private_comments__isnull=False,
-            private_comments__gt='',  # Has non-empty private comments
-            status='submitted'  # Only submitted assessments
-        ).exclude(
-            acknowledged_by=user  # Exclude assessments already acknowledged by this user
-        ).count()
-        
-        # Filter by program
-        if user.program:
-            unread_count = Assessment.objects.filter(
-                private_comments__isnull=False,
-                private_comments__gt='',
-                status='submitted',
-                trainee__program=user.program
-            ).exclude(acknowledged_by=user).count()
+        # The mailbox is scoped to the user's program
+        unread_count = mailbox_unread_count(user) if user.program_id else 0
         
         return Response({'unread_count': unread_count})
 
 
+def accepts_gzip(request):
+    """Whether Accept-Encoding allows gzip, honouring q-values (gzip;q=0 refuses it)"""
+    qualities = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, ParquetRenderer])
 def export_assessments(request):
     """
     Export assessments to CSV (Leadership/Admin only)
@@ -564,9 +736,13 @@ def export_assessments(request):
     - end_date (required): YYYY-MM-DD  
     - cohort_id (optional): Filter by cohort
     - trainee_id (optional): Filter by specific trainee
+    - format (optional): 'csv' (default) or 'parquet'
     
     Returns:
-    - CSV file with one row per AssessmentEPA
+    - Streamed CSV file with one row per AssessmentEPA, gzip-encoded when the
+      request sends Accept-Encoding: gzip
+    - With format=parquet, a Parquet file with typed columns (date, int8 entrustment
+      level, dictionary-encoded cohort/location/EPA strings)
     """
     
     # 1. PERMISSION CHECK - Leadership/Admin only
@@ -602,78 +778,46 @@ def export_assessments(request):
             status=400
         )
     
-    # Query AssessmentEPAs with all related data
-    assessment_epas = AssessmentEPA.objects.filter(
-        assessment__trainee__program=request.user.program,
-        assessment__shift_date__gte=start_date,
-        assessment__shift_date__lte=end_date,
-        assessment__status__in=['submitted', 'locked']  # Only completed assessments
-    ).select_related(
-        'assessment',
-        'assessment__trainee',
-        'assessment__trainee__cohort',
-        'assessment__evaluator',
-        'epa',
-        'epa__category'
-    ).order_by('assessment__shift_date', 'assessment__trainee__name')
-    
-    # Optional filters
-    cohort_id = request.GET.get('cohort_id')
-    if cohort_id:
-        assessment_epas = assessment_epas.filter(
-            assessment__trainee__cohort_id=cohort_id
-        )
+    assessment_epas = assessment_export_queryset(
+        request.user.program,
+        start_date,
+        end_date,
+        cohort_id=request.GET.get('cohort_id'),
+        trainee_id=request.GET.get('trainee_id')
+    )
     
-    trainee_id = request.GET.get('trainee_id')
-    if trainee_id:
-        assessment_epas = assessment_epas.filter(
-            assessment__trainee_id=trainee_id
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ASSESSMENT_EXPORT_FORMATS:
+        return JsonResponse(
+            {'error': f'Invalid format. Use one of: {", ".join(ASSESSMENT_EXPORT_FORMATS)}'},
+            status=400
         )
     
-    # 4. GENERATE CSV
-    response = HttpResponse(content_type='text/csv')
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response['Content-Disposition'] = f'attachment; filename="assessments_export_{timestamp}.csv"'
     
-    writer = csv.writer(response)
-    
-    # Header row
-    writer.writerow([
-        'Trainee Name',
-        'Trainee Email',
-        'Cohort',
-        'Evaluator Name',
-        'Assessment Date',
-        'Location',
-        'EPA Code',
-        'EPA Title',
-        'EPA Category',
-        'Entrustment Level',
-        'What Went Well',
-        'What Could Improve',
-        'Private Comments',
-        'Assessment Created',
-    ])
-    
-    # Data rows
-    for assessment_epa in assessment_epas:
-        assessment = assessment_epa.assessment
-        writer.writerow([
-            assessment.trainee.name,
-            assessment.trainee.email,
-            assessment.trainee.cohort.name if assessment.trainee.cohort else '',
-            assessment.evaluator.name,
-            assessment.shift_date.strftime('%Y-%m-%d'),
-            assessment.location,
-            assessment_epa.epa.code,
-            assessment_epa.epa.title,
-            assessment_epa.epa.category.title if assessment_epa.epa.category else '',
-            assessment_epa.entrustment_level,
-            assessment.what_went_well,
-            assessment.what_could_improve,
-            assessment.private_comments,  # Leadership can see private comments
-            assessment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
+    # 4a. PARQUET - written to a temporary file (the footer comes last), then streamed from disk
+    if export_format == 'parquet':
+        output = tempfile.TemporaryFile()
+        write_assessments_parquet(assessment_epas, output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'assessments_export_{timestamp}.parquet',
+            content_type=PARQUET_CONTENT_TYPE
+        )
+    
+    # 4b. STREAM CSV - gzip-compressed when the client accepts it
+    content = stream_csv(assessment_rows(assessment_epas))
+    gzipped = accepts_gzip(request)
+    if gzipped:
+        content = compress_sequence(content)
+    
+    response = StreamingHttpResponse(content, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="assessments_export_{timestamp}.csv"'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
     
     return response
 
@@ -688,10 +832,12 @@ def export_competency_grid(request):
     - start_date (optional): YYYY-MM-DD
     - end_date (optional): YYYY-MM-DD
     - cohort_id (optional): Filter by cohort
+    - layout (optional): 'long' (default) or 'wide'
     
     Returns:
-    - CSV file with one row per trainee-subcompetency combination
-    - Format: Trainee Name, Cohort, Core Competency, Sub-Competency, Avg Entrustment, Assessment Count
+    - Streamed CSV file. The long layout has one row per trainee-subcompetency combination
+      (Trainee Name, Cohort, Core Competency, Sub-Competency, Avg Entrustment, Assessment Count);
+      the wide layout has one row per trainee with one Avg Entrustment column per sub-competency
     """
     
     # 1. PERMISSION CHECK - Leadership only
@@ -734,92 +880,182 @@ def export_competency_grid(request):
     
     cohort_id = request.GET.get('cohort_id')
     
-    # 4. GET ALL TRAINEES IN PROGRAM (with optional cohort filter)
-    trainees = User.objects.filter(
-        role='trainee',
-        program=request.user.program
-    ).order_by('name')
-    
-    if cohort_id:
-        trainees = trainees.filter(cohort_id=cohort_id)
-    
-    # 5. GET ALL COMPETENCIES FOR THIS PROGRAM
-    competencies = CoreCompetency.objects.filter(
-        program=request.user.program
-    ).prefetch_related(
-        'sub_competencies__sub_competency_epas__epa'
-    ).order_by('code')
+    layout = request.GET.get('layout', 'long')
+    if layout not in COMPETENCY_GRID_LAYOUTS:
+        return JsonResponse(
+            {'error': f'Invalid layout. Use one of: {", ".join(COMPETENCY_GRID_LAYOUTS)}'},
+            status=400
+        )
     
-    # 6. GENERATE CSV
-    response = HttpResponse(content_type='text/csv')
+    # 4. STREAM CSV - every average comes from the program-wide competency matrix
+    rows = competency_grid_rows(
+        request.user.program,
+        start_date=start_date,
+        end_date=end_date,
+        cohort_id=cohort_id,
+        layout=layout
+    )
+    response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     response['Content-Disposition'] = f'attachment; filename="competency_grid_export_{timestamp}.csv"'
     
-    writer = csv.writer(response)
-    
-    # Header row
-    writer.writerow([
-        'Trainee Name',
-        'Cohort',
-        'Core Competency',
-        'Sub-Competency',
-        'Avg Entrustment',
-        'Assessment Count',
-    ])
-    
-    # 7. DATA ROWS - Loop through each trainee and their competency data
-    for trainee in trainees:
-        # Build assessment filter for this trainee
-        assessments_filter = Q(trainee=trainee, status='submitted')
-        
-        if start_date:
-            assessments_filter &= Q(shift_date__gte=start_date)
-        if end_date:
-            assessments_filter &= Q(shift_date__lte=end_date)
-        
-        trainee_assessments = Assessment.objects.filter(assessments_filter)
-        
-        # Get cohort name (may be None)
-        cohort_name = trainee.cohort.name if trainee.cohort else ''
-        
-        # Loop through all competencies
-        for competency in competencies:
-            # Loop through sub-competencies
-            for subcompetency in competency.sub_competencies.all().order_by('code'):
-                # Get all EPAs mapped to this sub-competency
-                mapped_epas = EPA.objects.filter(
-                    sub_competency_epas__sub_competency=subcompetency,
-                    program=request.user.program
-                ).distinct()
-                
-                # Get assessments for EPAs mapped to this sub-competency
-                subcompetency_assessments = trainee_assessments.filter(
-                    assessment_epas__epa__in=mapped_epas
-                ).distinct()
-                
-                # Calculate average entrustment level
-                avg_entrustment = subcompetency_assessments.aggregate(
-                    avg=Avg('assessment_epas__entrustment_level')
-                )['avg']
-                
-                # Count total assessment EPAs
-                total_epa_assessments = trainee_assessments.filter(
-                    assessment_epas__epa__in=mapped_epas
-                ).aggregate(
-                    count=Count('assessment_epas__id')
-                )['count'] or 0
-                
-                # Format values for CSV
-                avg_entrustment_display = round(avg_entrustment, 2) if avg_entrustment else ''
-                
-                # Write row (one row per trainee-subcompetency)
-                writer.writerow([
-                    trainee.name,
-                    cohort_name,
-                    competency.title,
-                    subcompetency.title,
-                    avg_entrustment_display,
-                    total_epa_assessments,
-                ])
-    
-    return response
\ No newline at end of file
+    return response
+
+
+# Roles allowed to run each export, matching the synchronous export endpoints
+EXPORT_JOB_ROLES = {
+    'assessments': ['leadership', 'admin', 'system-admin'],
+    'competency_grid': ['leadership'],
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def export_job_data(job):
+    """Serialize an export job for the polling API"""
+    return {
+        'id': str(job.id),
+        'export_type': job.export_type,
+        'parameters': job.parameters,
+        'status': job.status,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'download_url': reverse('download_export_job', args=[job.id]) if job.status == 'completed' else None,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_export_job(request):
+    """
+    Queue an export to be generated by the run_worker process
+    
+    Body:
+    - export_type (required): 'assessments' or 'competency_grid'
+    - start_date, end_date, cohort_id, trainee_id, layout: same as the matching export endpoint
+    
+    Returns:
+    - 202 with the job; poll export_job_status until it is completed, then download it
+    """
+    export_type = request.data.get('export_type')
+    if export_type not in EXPORT_JOB_ROLES:
+        return JsonResponse(
+            {'error': f'export_type must be one of: {", ".join(EXPORT_JOB_ROLES)}'},
+            status=400
+        )
+    
+    if request.user.role not in EXPORT_JOB_ROLES[export_type]:
+        return JsonResponse(
+            {'error': 'You do not have permission to run this export'},
+            status=403
+        )
+    
+    if not request.user.program:
+        return JsonResponse(
+            {'error': 'User not assigned to a program'},
+            status=400
+        )
+    
+    try:
+        parameters = validate_export_parameters(export_type, request.data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    job = ExportJob.objects.create(
+        program=request.user.program,
+        requested_by=request.user,
+        export_type=export_type,
+        parameters=parameters
+    )
+    generate_export.delay(str(job.id))
+    
+    return JsonResponse(export_job_data(job), status=202)
+
+
+def _get_own_export_job(request, job_id):
+    try:
+        return ExportJob.objects.get(id=job_id, requested_by=request.user)
+    except ExportJob.DoesNotExist:
+        return None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_status(request, job_id):
+    """Get the status and progress of one of the user's export jobs"""
+    job = _get_own_export_job(request, job_id)
+    if job is None:
+        return JsonResponse({'error': 'Export job not found'}, status=404)
+    
+    return JsonResponse(export_job_data(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_export_job(request, job_id):
+    """
+    Download a completed export
+    
+    Supports a single 'Range: bytes=start-end' request header so interrupted
+    downloads can resume; ranged requests return 206 Partial Content.
+    """
+    job = _get_own_export_job(request, job_id)
+    if job is None:
+        return JsonResponse({'error': 'Export job not found'}, status=404)
+    
+    if job.status == 'expired':
+        return JsonResponse({'error': 'Export has expired. Please request it again'}, status=410)
+    
+    if job.status != 'completed' or not job.file:
+        return JsonResponse({'error': 'Export is not ready yet'}, status=409)
+    
+    size = job.file.size
+    start, end = 0, size - 1
+    range_header = request.META.get('HTTP_RANGE')
+    match = RANGE_RE.match(range_header.strip()) if range_header else None
+    first, last = match.groups() if match else ('', '')
+    # A Range header that doesn't parse is ignored and the whole file sent (RFC 9110 §14.2)
+    partial = bool(first or last) and not (first and last and int(last) < int(first))
+    
+    if partial:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0) if int(last) else size
+        
+        if start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    
+    def file_chunks(length, chunk_size=64 * 1024):
+        with job.file.open('rb') as export_file:
+            export_file.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = export_file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        file_chunks(length),
+        status=206 if partial else 200,
+        content_type=PARQUET_CONTENT_TYPE if job.file.name.endswith('.parquet') else 'text/csv'
+    )
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(job.file.name)}"'
+    if partial:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    
+    return response
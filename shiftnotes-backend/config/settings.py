@@ -8,6 +8,7 @@ import os
 import json
 import boto3
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     'curriculum',
     'assessments',
     'analytics',
+    'tasks',
 ]
 
 AUTH_USER_MODEL = 'users.User'
@@ -239,10 +241,32 @@ else:
             print(f"⚠️  Warning: Error retrieving SMTP credentials: {e}")
             print("📧 Falling back to console email backend")
 
+# Email outbox (users.OutboxEmail): requests queue emails and run_worker sends them
+# in batches over one connection, retrying failures with backoff
+EMAIL_OUTBOX_POLL_SECONDS = config('EMAIL_OUTBOX_POLL_SECONDS', default=5, cast=int)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+EMAIL_OUTBOX_RETRY_SECONDS = config('EMAIL_OUTBOX_RETRY_SECONDS', default=60, cast=int)
+
+# Background tasks (tasks.Task), run by `python manage.py run_worker`: exports,
+# the email outbox and periodic purges all run in this one worker process
+TASK_WORKER_CONCURRENCY = config('TASK_WORKER_CONCURRENCY', default=2, cast=int)
+TASK_RETRY_SECONDS = config('TASK_RETRY_SECONDS', default=30, cast=int)  # Doubles on each retry
+TASK_LOCK_TIMEOUT_MINUTES = config('TASK_LOCK_TIMEOUT_MINUTES', default=30, cast=int)  # Then a running task is presumed dead
+TASK_RETENTION_HOURS = config('TASK_RETENTION_HOURS', default=168, cast=int)  # Finished tasks are kept this long
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background exports (assessments.ExportJob): hours a generated file stays downloadable
+EXPORT_RETENTION_HOURS = config('EXPORT_RETENTION_HOURS', default=24, cast=int)
+
+# How long responses to writes sent with an Idempotency-Key header are replayed
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+# How long an unfinished request holds its key before a retry may take it over
+IDEMPOTENCY_KEY_LEASE_MINUTES = config('IDEMPOTENCY_KEY_LEASE_MINUTES', default=5, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -260,12 +284,67 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        # orjson-backed JSON (stdlib fallback), same output as DRF's JSONRenderer
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
+# Cache: AU-13 lockout counters, AU-15 session activity and any response caching.
+# Every authenticated request reads its session activity stamp from here, so the
+# backend must be cheap. Shared by every worker except with CACHE_BACKEND=locmem:
+#   redis  - Redis or a compatible server at CACHE_URL (default when CACHE_URL is set)
+#   file   - files under BASE_DIR/cache (or the directory CACHE_URL names), shared
+#            by the workers of one host with no database round trip (default in
+#            production without CACHE_URL)
+#   db     - cache_table in the main database; run `python manage.py createcachetable`.
+#            Costs a SELECT on every authenticated request, plus a write when
+#            the activity stamp is refreshed
+#   locmem - per-process memory (default with DEBUG, and for tests)
+# With db and file, counters (api.cache.increment) are kept in the cache_counters
+# table, since those backends cannot increment atomically; only logins touch them.
+CACHE_URL = config('CACHE_URL', default='')
+CACHE_BACKEND = config('CACHE_BACKEND', default='redis' if CACHE_URL else ('locmem' if DEBUG else 'file'))
+CACHE_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'OPTIONS': {'socket_connect_timeout': 1, 'socket_timeout': 1},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_table',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_URL or str(BASE_DIR / 'cache'),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(f'CACHE_BACKEND must be one of {", ".join(CACHE_BACKENDS)}')
+CACHES = {
+    'default': {**CACHE_BACKENDS[CACHE_BACKEND], 'KEY_PREFIX': 'shiftnotes'},
+}
+
+# Login attempt audit log (AU-14). Failed attempts are written in batches; with
+# DEBUG every attempt is written immediately. A killed worker loses at most
+# LOGIN_AUDIT_BATCH_SIZE - 1 buffered failures from the last LOGIN_AUDIT_FLUSH_SECONDS;
+# successes and locked-out attempts are always written immediately.
+LOGIN_AUDIT_BATCH_SIZE = config('LOGIN_AUDIT_BATCH_SIZE', default=1 if DEBUG else 10, cast=int)
+LOGIN_AUDIT_FLUSH_SECONDS = config('LOGIN_AUDIT_FLUSH_SECONDS', default=1, cast=float)
+LOGIN_ATTEMPT_RETENTION_MONTHS = config('LOGIN_ATTEMPT_RETENTION_MONTHS', default=12, cast=int)
+LOGIN_ATTEMPT_ARCHIVE_DIR = config('LOGIN_ATTEMPT_ARCHIVE_DIR', default=str(BASE_DIR / 'logs' / 'audit'))
+
 # Session timeout configuration (AU-15)
 SESSION_TIMEOUT_MINUTES = 15  # Sessions expire after 15 minutes of inactivity
+AUTH_TOKEN_CACHE_SECONDS = config('AUTH_TOKEN_CACHE_SECONDS', default=30, cast=int)  # Per-process reuse of resolved tokens
+SESSION_ACTIVITY_WRITE_SECONDS = 60  # Last activity is rewritten at most this often
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -305,6 +384,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
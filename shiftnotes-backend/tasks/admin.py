@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'name', 'queue', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'queue', 'name']
+    search_fields = ['name']
+    readonly_fields = [field.name for field in Task._meta.fields]
+    ordering = ['-created_at']
+    actions = ['retry_tasks']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Run selected tasks again')
+    def retry_tasks(self, request, queryset):
+        queued = queryset.exclude(status='running').update(
+            status='pending', attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{queued} task(s) queued again')
@@ -0,0 +1,131 @@
+"""
+Management command that runs queued background tasks (tasks.queue).
+
+Each of --concurrency threads claims and runs one task at a time. Periodic
+tasks (@task(every=...)), such as sending the email outbox and purging old
+rows, are run between tasks by one thread at a time; with --once each runs
+once. SIGTERM or SIGINT stops claiming new tasks and waits for the running
+ones.
+
+Every installed app's tasks module is imported at start so its tasks are
+registered.
+
+Usage:
+    python manage.py run_worker
+    python manage.py run_worker --concurrency 4 --queues default email
+    python manage.py run_worker --once
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+from tasks.queue import claim_task, periodic_tasks, run_task
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks and periodic housekeeping'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.TASK_WORKER_CONCURRENCY,
+            help='Tasks run at the same time, one thread each (default: TASK_WORKER_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--queues',
+            nargs='+',
+            default=['default'],
+            help='Queues to take tasks from (default: default)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the periodic tasks and the tasks that are currently due, then exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Seconds to wait between polls when nothing is due (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stopping = threading.Event()
+        self.periodic_lock = threading.Lock()
+        self.periodic_last_run = {}
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        autodiscover_modules('tasks')
+
+        if options['concurrency'] <= 1:
+            # Run in this thread (and this thread's database connection)
+            self.work(worker_id)
+            return
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stopping.set())
+        threads = [
+            threading.Thread(target=self.work, args=(f'{worker_id}:{index}',), daemon=True)
+            for index in range(options['concurrency'])
+        ]
+        self.stdout.write(f'⏳ Worker {worker_id} running {len(threads)} thread(s) on {", ".join(options["queues"])}')
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_periodic_tasks(self):
+        """Call the periodic tasks that are due; only one thread does so at a time"""
+        if not self.periodic_lock.acquire(blocking=False):
+            return
+        try:
+            for name, function, every in periodic_tasks():
+                last_run = self.periodic_last_run.get(name)
+                if last_run is not None and (self.options['once'] or time.monotonic() - last_run < every):
+                    continue
+                self.periodic_last_run[name] = time.monotonic()
+                try:
+                    result = function()
+                except Exception:
+                    logger.exception(f'Periodic task {name} failed')
+                    self.stdout.write(self.style.ERROR(f'❌ Periodic task {name} failed'))
+                    continue
+                if result:
+                    self.stdout.write(f'🔁 {name}: {result}')
+        finally:
+            self.periodic_lock.release()
+
+    def work(self, worker_id):
+        try:
+            while not self.stopping.is_set():
+                self.run_periodic_tasks()
+                claimed = claim_task(worker_id, self.options['queues'])
+                if claimed is None:
+                    if self.options['once']:
+                        return
+                    self.stopping.wait(self.options['interval'])
+                    continue
+
+                claimed = run_task(claimed)
+                if claimed.status == 'succeeded':
+                    self.stdout.write(self.style.SUCCESS(f'✅ {claimed.name} ({claimed.id}) succeeded'))
+                elif claimed.status == 'failed':
+                    self.stdout.write(self.style.ERROR(f'❌ {claimed.name} ({claimed.id}) failed: {claimed.last_error}'))
+                else:
+                    self.stdout.write(f'🔁 {claimed.name} ({claimed.id}) will be retried: {claimed.last_error}')
+                close_old_connections()
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+import uuid
+
+
+class Task(models.Model):
+    """
+    A call of a @task function, run by the run_worker command (see tasks.queue).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=200, help_text='Dotted path of the task function')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    queue = models.CharField(max_length=50, default='default')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    run_at = models.DateTimeField(default=timezone.now, help_text='Not started before this time')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True, help_text='Worker running the task')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'tasks'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f"Task {self.name} ({self.status})"
@@ -0,0 +1,229 @@
+"""
+Database-backed background tasks.
+
+Decorate a function with @task and call .delay(*args, **kwargs) (or
+.apply_async() with a countdown or eta) to run it in the run_worker process
+instead of the request. Arguments must be JSON-serializable, so pass ids
+rather than model instances.
+
+Workers claim due tasks with SELECT ... FOR UPDATE SKIP LOCKED where the
+database supports it (PostgreSQL). SQLite has no row locks, so there a task is
+claimed by a conditional UPDATE that only one worker can win. A task that
+raises is retried after TASK_RETRY_SECONDS, doubling on each attempt, until
+max_attempts is reached. Tasks left running by a worker that died are picked
+up again after TASK_LOCK_TIMEOUT_MINUTES, so a task can run more than once and
+should be safe to repeat. Attempts are counted when a task is claimed, so a
+task that keeps killing its worker also stops at max_attempts.
+
+A task registered with every=<seconds> is also called directly by run_worker
+that often (without a Task row), for housekeeping such as draining the email
+outbox and purging old rows. Each worker process keeps its own schedule, so
+periodic tasks must be safe to run from several processes at once.
+"""
+import functools
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+def task(function=None, *, queue='default', max_attempts=3, every=None, bind=False):
+    """
+    Register a function as a background task.
+
+    Args:
+        queue, max_attempts: Defaults for queued calls
+        every: Seconds; when set, run_worker also calls the function (without
+            arguments) this often
+        bind: Pass the running Task as the first argument (None when the
+            function is called directly), e.g. to check task.attempts
+
+    Usage:
+        @task
+        def rebuild(program_id): ...
+
+        @task(queue='email', max_attempts=5)
+        def notify(user_id): ...
+
+        @task(every=3600)
+        def purge_old_rows(): ...
+
+        @task(bind=True)
+        def generate(task, report_id): ...
+
+        rebuild.delay(program.id)
+        notify.apply_async(args=[user.id], countdown=60)
+    """
+    def register(function):
+        name = f'{function.__module__}.{function.__qualname__}'
+        options = {'queue': queue, 'max_attempts': max_attempts, 'every': every, 'bind': bind}
+        _registry[name] = (function, options)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if bind:
+                return function(None, *args, **kwargs)
+            return function(*args, **kwargs)
+
+        wrapper.task_name = name
+        wrapper.delay = lambda *args, **kwargs: enqueue(name, args, kwargs)
+        wrapper.apply_async = lambda args=(), kwargs=None, **options: enqueue(name, args, kwargs, **options)
+        return wrapper
+
+    return register(function) if function is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, countdown=None, eta=None, queue=None, max_attempts=None):
+    """
+    Queue a call of a registered task.
+
+    Args:
+        name: Task name (dotted path of the function)
+        args, kwargs: JSON-serializable arguments
+        countdown: Seconds to wait before running
+        eta: Earliest time to run (overrides countdown)
+        queue, max_attempts: Override the task's defaults
+
+    Returns:
+        The Task
+    """
+    _, options = resolve(name)
+    run_at = eta or timezone.now() + timedelta(seconds=countdown or 0)
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        queue=queue or options['queue'],
+        max_attempts=max_attempts or options['max_attempts'],
+        run_at=run_at,
+    )
+
+
+def resolve(name):
+    """(function, options) of a task, importing its module if needed"""
+    if name not in _registry:
+        try:
+            import_string(name)  # Registers the task as a side effect
+        except ImportError:
+            pass
+    if name not in _registry:
+        raise UnknownTask(f'{name} is not a registered task')
+    return _registry[name]
+
+
+def periodic_tasks():
+    """(name, function, seconds) of every registered task with an every= interval"""
+    return [
+        (name, function, options['every'])
+        for name, (function, options) in _registry.items()
+        if options['every']
+    ]
+
+
+def due_tasks(queues, now):
+    lock_timeout = timedelta(minutes=settings.TASK_LOCK_TIMEOUT_MINUTES)
+    return Task.objects.filter(
+        Q(status='pending', run_at__lte=now) |
+        Q(status='running', locked_at__lt=now - lock_timeout),
+        queue__in=queues,
+    ).order_by('run_at')
+
+
+def claim_task(worker_id, queues=('default',)):
+    """Mark the next due task as running by this worker and return it (None when nothing is due)"""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task_id = due_tasks(queues, now).select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if task_id is None:
+                return None
+            Task.objects.filter(id=task_id).update(
+                status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+            )
+    else:
+        # No row locks: try candidates until one conditional UPDATE succeeds
+        for candidate in due_tasks(queues, now).values('id', 'status', 'locked_at')[:10]:
+            won = Task.objects.filter(
+                id=candidate['id'], status=candidate['status'], locked_at=candidate['locked_at']
+            ).update(status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1)
+            if won:
+                break
+        else:
+            return None
+        task_id = candidate['id']
+    return Task.objects.get(id=task_id)
+
+
+def retry_delay(attempts):
+    """Wait after the given number of failed attempts"""
+    return timedelta(seconds=settings.TASK_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def run_task(claimed):
+    """
+    Run a claimed task and record the outcome. Failures are recorded (and
+    retried when attempts remain) instead of raised.
+    """
+    if claimed.attempts > claimed.max_attempts:
+        # Every attempt was claimed and never finished: the task kills its worker
+        claimed.status = 'failed'
+        claimed.last_error = f'Worker stopped during each of {claimed.max_attempts} attempts'
+        claimed.finished_at = timezone.now()
+        claimed.locked_by = ''
+        claimed.locked_at = None
+        claimed.save()
+        return claimed
+
+    try:
+        function, options = resolve(claimed.name)
+        args = [claimed, *claimed.args] if options['bind'] else claimed.args
+        result = function(*args, **claimed.kwargs)
+    except Exception as e:
+        logger.exception(f'Task {claimed.name} ({claimed.id}) failed on attempt {claimed.attempts}')
+        claimed.last_error = f'{e.__class__.__name__}: {e}'
+        if claimed.attempts < claimed.max_attempts and not isinstance(e, UnknownTask):
+            claimed.status = 'pending'
+            claimed.run_at = timezone.now() + retry_delay(claimed.attempts)
+        else:
+            claimed.status = 'failed'
+            claimed.finished_at = timezone.now()
+    else:
+        claimed.status = 'succeeded'
+        claimed.result = json_result(result)
+        claimed.last_error = ''
+        claimed.finished_at = timezone.now()
+    claimed.locked_by = ''
+    claimed.locked_at = None
+    claimed.save()
+    return claimed
+
+
+def json_result(result):
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        return repr(result)
+    return result
+
+
+@task(every=3600)
+def purge_finished_tasks(now=None):
+    """Delete succeeded and failed tasks older than TASK_RETENTION_HOURS; returns the number deleted"""
+    cutoff = (now or timezone.now()) - timedelta(hours=settings.TASK_RETENTION_HOURS)
+    deleted, _ = Task.objects.filter(status__in=['succeeded', 'failed'], finished_at__lte=cutoff).delete()
+    return deleted
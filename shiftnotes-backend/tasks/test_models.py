@@ -0,0 +1,181 @@
+"""
+Tests for the database-backed task queue
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.queue import claim_task, enqueue, purge_finished_tasks, run_task, task
+from users.email_service import send_welcome_email_task
+from users.models import OutboxEmail
+from conftest import OrganizationFactory, ProgramFactory, UserFactory
+
+calls = []
+ticks = []
+
+
+@task
+def record_call(value, scale=1):
+    calls.append(value * scale)
+    return value * scale
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise KeyError('missing')
+
+
+@task(every=60)
+def tick():
+    ticks.append(timezone.now())
+
+
+@pytest.mark.django_db
+class TestTaskQueue:
+    """Test enqueueing, claiming and running background tasks"""
+    
+    def setup_method(self):
+        calls.clear()
+    
+    def test_delay_runs_in_worker(self):
+        """Test that .delay() queues the call and the worker runs it"""
+        queued = record_call.delay(3, scale=2)
+        assert queued.status == 'pending'
+        assert calls == []
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        queued.refresh_from_db()
+        assert queued.status == 'succeeded'
+        assert queued.result == 6
+        assert calls == [6]
+    
+    def test_countdown_delays_task(self):
+        """Test that scheduled tasks are not claimed before their time"""
+        queued = record_call.apply_async(args=[1], countdown=60)
+        
+        assert claim_task('worker') is None
+        
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        assert claim_task('worker').id == queued.id
+    
+    def test_task_is_claimed_once(self):
+        """Test that a claimed task is not handed to a second worker"""
+        queued = record_call.delay(1)
+        
+        claimed = claim_task('first')
+        
+        assert claimed.id == queued.id
+        assert claimed.status == 'running'
+        assert claimed.locked_by == 'first'
+        assert claimed.attempts == 1
+        assert claim_task('second') is None
+    
+    def test_skip_locked_claim(self):
+        """Test the SELECT ... FOR UPDATE SKIP LOCKED path used on PostgreSQL"""
+        queued = record_call.delay(1)
+        
+        with patch.object(connection.features, 'has_select_for_update_skip_locked', True):
+            claimed = claim_task('worker')
+            assert claim_task('other') is None
+        
+        assert claimed.id == queued.id
+        assert claimed.status == 'running'
+    
+    def test_failure_is_retried_then_failed(self, settings):
+        """Test that a failing task is retried with backoff until max_attempts"""
+        settings.TASK_RETRY_SECONDS = 30
+        queued = always_fails.delay()
+        
+        run_task(claim_task('worker'))
+        queued.refresh_from_db()
+        assert queued.status == 'pending'
+        assert queued.attempts == 1
+        assert 'KeyError' in queued.last_error
+        assert queued.run_at > timezone.now() + timedelta(seconds=20)
+        
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        run_task(claim_task('worker'))
+        queued.refresh_from_db()
+        assert queued.status == 'failed'
+        assert queued.finished_at is not None
+    
+    def test_unknown_task_fails_without_retry(self):
+        """Test that a task whose function no longer exists fails at once"""
+        Task.objects.create(name='tasks.test_models.removed_task')
+        
+        finished = run_task(claim_task('worker'))
+        
+        assert finished.status == 'failed'
+        assert 'not a registered task' in finished.last_error
+        with pytest.raises(LookupError):
+            enqueue('tasks.test_models.removed_task')
+    
+    def test_abandoned_task_is_claimed_again(self, settings):
+        """Test that a task left running by a dead worker is picked up after the lock timeout"""
+        queued = record_call.delay(1)
+        Task.objects.filter(id=queued.id).update(
+            status='running', locked_by='dead', locked_at=timezone.now() - timedelta(minutes=settings.TASK_LOCK_TIMEOUT_MINUTES + 1)
+        )
+        
+        assert claim_task('worker').id == queued.id
+    
+    def test_task_that_kills_its_worker_stops_at_max_attempts(self, settings):
+        """Test that claims count as attempts, so a task that never finishes is given up on"""
+        queued = always_fails.delay()
+        stale = timezone.now() - timedelta(minutes=settings.TASK_LOCK_TIMEOUT_MINUTES + 1)
+        for _ in range(queued.max_attempts):
+            claim_task('doomed')  # The worker dies without recording an outcome
+            Task.objects.filter(id=queued.id).update(locked_at=stale)
+        
+        finished = run_task(claim_task('worker'))
+        
+        assert finished.status == 'failed'
+        assert finished.attempts == queued.max_attempts + 1
+        assert 'Worker stopped' in finished.last_error
+        assert claim_task('worker') is None
+    
+    def test_only_listed_queues_are_claimed(self):
+        """Test that workers take tasks from their queues only"""
+        record_call.apply_async(args=[1], queue='reports')
+        
+        assert claim_task('worker', ['default']) is None
+        assert claim_task('worker', ['reports']) is not None
+    
+    def test_purge_finished_tasks(self, settings):
+        """Test that old finished tasks are deleted and pending ones kept"""
+        old = timezone.now() - timedelta(hours=settings.TASK_RETENTION_HOURS + 1)
+        Task.objects.create(name='x', status='succeeded', finished_at=old)
+        Task.objects.create(name='x', status='failed', finished_at=old)
+        Task.objects.create(name='x', status='pending')
+        
+        assert purge_finished_tasks() == 2
+        assert Task.objects.count() == 1
+    
+    def test_worker_runs_periodic_tasks(self, settings):
+        """Test that the worker calls periodic tasks, including the purge of finished tasks"""
+        ticks.clear()
+        old = timezone.now() - timedelta(hours=settings.TASK_RETENTION_HOURS + 1)
+        Task.objects.create(name='x', status='succeeded', finished_at=old)
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        assert len(ticks) == 1
+        assert not Task.objects.exists()
+    
+    def test_welcome_email_task(self):
+        """Test that the existing email task functions run through the queue"""
+        org = OrganizationFactory()
+        user = UserFactory(organization=org, program=ProgramFactory(org=org))
+        
+        send_welcome_email_task.delay(str(user.id))
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        assert Task.objects.get().status == 'succeeded'
+        assert OutboxEmail.objects.filter(to=[user.email]).exists()
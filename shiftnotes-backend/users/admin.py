@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Cohort, LoginAttempt
+from django.utils import timezone
+from .models import User, Cohort, LoginAttempt, OutboxEmail
 
 
 @admin.register(User)
@@ -45,6 +46,7 @@ class LoginAttemptAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'email', 'user', 'success', 'ip_address', 'user_agent', 'timestamp', 'failure_reason']
     date_hierarchy = 'timestamp'
     ordering = ['-timestamp']
+    list_select_related = ['user', 'agent']
     
     # Make this admin read-only for security purposes
     def has_add_permission(self, request):
@@ -58,3 +60,22 @@ class LoginAttemptAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Only superusers can delete login attempts (for data retention policies)."""
         return request.user.is_superuser
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Queued and sent emails; failed ones can be queued again"""
+    list_display = ['created_at', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = [field.name for field in OutboxEmail._meta.fields]
+    ordering = ['-created_at']
+    actions = ['retry_emails']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Queue selected emails again')
+    def retry_emails(self, request, queryset):
+        queued = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f'{queued} email(s) queued again')
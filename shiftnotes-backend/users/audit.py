@@ -0,0 +1,236 @@
+"""
+Login attempt audit log (AU-14): buffered writes and monthly archival.
+
+Failed attempts are buffered per process and written with one bulk_create once
+LOGIN_AUDIT_BATCH_SIZE have accumulated or the oldest has waited
+LOGIN_AUDIT_FLUSH_SECONDS, so a credential-stuffing burst costs a few inserts
+instead of one per request. Successful logins and attempts on locked-out
+accounts are written immediately, together with anything pending. If a write
+fails the batch is kept for the next flush, and attempts that cannot be kept
+are logged in full rather than dropped silently.
+
+The buffer lives in process memory. It is written on a normal exit, but a
+worker that is killed (gunicorn's timeout, the OOM killer) loses it: at most
+LOGIN_AUDIT_BATCH_SIZE - 1 failed attempts from its last
+LOGIN_AUDIT_FLUSH_SECONDS.
+
+Attempts older than the retention period are archived a calendar month at a
+time to gzipped JSON lines and deleted with one statement per month.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import LoginAttempt, UserAgent
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_BATCHES = 20
+
+
+class LoginAuditWriter:
+    """
+    Buffer of unsaved LoginAttempt rows.
+
+    Args:
+        batch_size: Write once this many attempts are pending (1 writes every
+            attempt immediately)
+        flush_seconds: Write pending attempts at most this long after the
+            first of them was recorded
+    """
+
+    def __init__(self, batch_size, flush_seconds):
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def record(self, immediate=False, **fields):
+        """Queue a login attempt; fields are LoginAttempt fields (user_agent as text)"""
+        attempt = LoginAttempt(**fields)
+        with self.lock:
+            self.pending.append(attempt)
+            full = len(self.pending) >= self.batch_size
+            if not full and not immediate and self.timer is None:
+                self.timer = threading.Timer(self.flush_seconds, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+        if full or immediate:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every pending attempt.
+
+        Returns:
+            Number of attempts written
+        """
+        with self.lock:
+            batch, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not batch:
+            return 0
+
+        try:
+            with transaction.atomic():
+                agent_ids = UserAgent.objects.ids_for(attempt.user_agent for attempt in batch)
+                for attempt in batch:
+                    attempt.agent_id = agent_ids.get(attempt.user_agent)
+                LoginAttempt.objects.bulk_create(batch)
+        except Exception:
+            logger.exception(f'Could not write {len(batch)} login attempt(s); keeping them for the next flush')
+            self.requeue(batch)
+            return 0
+        return len(batch)
+
+    def flush_from_timer(self):
+        # Runs on the timer's own thread, which has its own database connection
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def requeue(self, batch):
+        with self.lock:
+            self.pending = batch + self.pending
+            overflow = len(self.pending) - self.batch_size * MAX_PENDING_BATCHES
+            if overflow > 0:
+                dropped, self.pending = self.pending[:overflow], self.pending[overflow:]
+                for attempt in dropped:
+                    # Last resort: the application log keeps the audit record
+                    logger.error(
+                        'Unwritten login attempt: %s', json.dumps(attempt_record(attempt), default=str)
+                    )
+
+
+login_audit = LoginAuditWriter(
+    batch_size=getattr(settings, 'LOGIN_AUDIT_BATCH_SIZE', 1),
+    flush_seconds=getattr(settings, 'LOGIN_AUDIT_FLUSH_SECONDS', 1),
+)
+atexit.register(login_audit.flush)
+
+
+def record_login_attempt(email, success, ip_address=None, user_agent='', user=None, failure_reason='',
+                         immediate=False):
+    """
+    Log a login attempt (AU-14).
+
+    Successful logins, and any attempt with immediate=True, are written at
+    once; other failures are buffered.
+    """
+    login_audit.record(
+        immediate=success or immediate,
+        email=email,
+        user=user,
+        success=success,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        failure_reason=failure_reason,
+    )
+
+
+def attempt_record(attempt):
+    """JSON-ready dict of a login attempt, as written to archives"""
+    return {
+        'id': str(attempt.id),
+        'timestamp': attempt.timestamp.isoformat(),
+        'email': attempt.email,
+        'user_id': str(attempt.user_id) if attempt.user_id else None,
+        'success': attempt.success,
+        'ip_address': attempt.ip_address,
+        'user_agent': attempt.user_agent,
+        'failure_reason': attempt.failure_reason,
+    }
+
+
+def retention_cutoff(months, now=None):
+    """Start of the oldest calendar month that is kept"""
+    today = timezone.localdate(now or timezone.now())
+    month_index = today.year * 12 + today.month - 1 - months
+    first_kept = today.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+    return timezone.make_aware(datetime.combine(first_kept, dt_time.min))
+
+
+def _next_month(start):
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def archive_login_attempts(before, archive_dir=None, dry_run=False):
+    """
+    Archive and delete login attempts older than a month boundary.
+
+    Each calendar month is written to login_attempts_YYYY-MM.jsonl.gz in
+    archive_dir and then deleted with a single DELETE on the timestamp range.
+    A month is only deleted if every row was archived; without archive_dir
+    attempts are deleted without a copy.
+
+    Args:
+        before: Start of the oldest month to keep (see retention_cutoff)
+        archive_dir: Directory for the archives, or None to delete only
+        dry_run: Count the rows per month without writing or deleting
+
+    Returns:
+        list: (month 'YYYY-MM', number of attempts) for each month processed
+    """
+    oldest = LoginAttempt.objects.filter(timestamp__lt=before).order_by('timestamp').values_list(
+        'timestamp', flat=True
+    ).first()
+    if oldest is None:
+        return []
+    if archive_dir and not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    oldest = timezone.localtime(oldest)
+    start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
+    while start < before:
+        end = min(_next_month(start), before)
+        label = start.strftime('%Y-%m')
+        attempts = LoginAttempt.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        if dry_run:
+            months.append((label, attempts.count()))
+        else:
+            with transaction.atomic():
+                archived = _archive_month(attempts, archive_dir, label) if archive_dir else None
+                deleted, _ = attempts.delete()
+                if archived is not None and deleted != archived:
+                    raise RuntimeError(
+                        f'Login attempts for {label} changed while archiving ({archived} archived, {deleted} deleted)'
+                    )
+            months.append((label, deleted))
+        start = end
+    return [(label, count) for label, count in months if count]
+
+
+def _archive_month(attempts, archive_dir, label):
+    path = os.path.join(archive_dir, f'login_attempts_{label}.jsonl.gz')
+    suffix = 1
+    while os.path.exists(path):
+        # Never overwrite an earlier archive, e.g. of attempts that arrived late
+        suffix += 1
+        path = os.path.join(archive_dir, f'login_attempts_{label}-{suffix}.jsonl.gz')
+
+    partial_path = f'{path}.partial'
+    written = 0
+    with open(partial_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for attempt in attempts.select_related('agent').order_by('timestamp').iterator(chunk_size=2000):
+                archive.write(json.dumps(attempt_record(attempt)).encode('utf-8') + b'\n')
+                written += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial_path, path)
+    return written
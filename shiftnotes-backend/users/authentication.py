@@ -4,9 +4,21 @@ Implements hospital security requirement AU-15 (15-minute inactivity timeout).
 
 This module provides a custom token authentication class that tracks
 user activity and expires sessions after 15 minutes of inactivity.
+
+Resolved tokens are kept in a small per-process cache for a few seconds
+(AUTH_TOKEN_CACHE_SECONDS), with the user's program, organization and cohort
+loaded, so most requests authenticate without touching the database. Entries
+are dropped on logout and whenever the user is saved or the token deleted
+(see users.signals); other processes notice a logout because the shared
+last-activity entry is gone and fall back to the database.
 """
+import copy
+import threading
+import time
+
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
@@ -14,6 +26,21 @@ from datetime import timedelta
 # Session timeout configuration (15 minutes as per hospital requirement)
 SESSION_TIMEOUT_MINUTES = 15
 
+# How long a resolved token is reused before the database is checked again
+TOKEN_CACHE_SECONDS = getattr(settings, 'AUTH_TOKEN_CACHE_SECONDS', 30)
+TOKEN_CACHE_MAX_ENTRIES = 10000
+
+# Last activity is only rewritten once it is older than this. Expiry is measured
+# from the stored time, so coalescing can only end a session early, never late.
+ACTIVITY_WRITE_INTERVAL = timedelta(seconds=getattr(settings, 'SESSION_ACTIVITY_WRITE_SECONDS', 60))
+
+_resolved_tokens = {}  # token key -> (user, token, monotonic expiry)
+_resolved_tokens_lock = threading.Lock()
+
+
+def activity_cache_key(token_key):
+    return f'token_last_activity_{token_key}'
+
 
 class ExpiringTokenAuthentication(TokenAuthentication):
     """
@@ -41,10 +68,44 @@ class ExpiringTokenAuthentication(TokenAuthentication):
             AuthenticationFailed: If token is invalid, user is inactive,
                                   or session has expired
         """
+        cache_key = activity_cache_key(key)
+        last_activity = cache.get(cache_key)
+
+        # Without a shared activity entry (first request, logout, expiry) the
+        # token is always checked against the database
+        resolved = _cached_token(key) if last_activity else None
+        if resolved is None:
+            user, token = self.load_token(key)
+        else:
+            user, token = resolved
+
+        now = timezone.now()
+        if last_activity:
+            time_since_activity = now - last_activity
+            if time_since_activity > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
+                # Clear the cache entry for the expired session
+                clear_session_activity(key)
+                raise AuthenticationFailed(
+                    f'Session expired due to {SESSION_TIMEOUT_MINUTES} minutes of inactivity. '
+                    'Please log in again.'
+                )
+        
+        # Update last activity timestamp, at most once per ACTIVITY_WRITE_INTERVAL
+        # Cache for longer than timeout to ensure it persists between checks
+        if not last_activity or now - last_activity >= ACTIVITY_WRITE_INTERVAL:
+            cache.set(cache_key, now, SESSION_TIMEOUT_MINUTES * 60 * 2)
+
+        # Each request gets its own copy so views cannot leak state between requests
+        return (copy.copy(user), token)
+
+    def load_token(self, key):
+        """Fetch and validate the token and user, and cache the result"""
         model = self.get_model()
         
         try:
-            token = model.objects.select_related('user').get(key=key)
+            token = model.objects.select_related(
+                'user__program', 'user__organization', 'user__cohort'
+            ).get(key=key)
         except model.DoesNotExist:
             raise AuthenticationFailed('Invalid token.')
 
@@ -55,25 +116,49 @@ class ExpiringTokenAuthentication(TokenAuthentication):
         if hasattr(token.user, 'deactivated_at') and token.user.deactivated_at is not None:
             raise AuthenticationFailed('User account has been deactivated.')
 
-        # Check session activity timeout
-        cache_key = f'token_last_activity_{token.key}'
-        last_activity = cache.get(cache_key)
-        
-        if last_activity:
-            time_since_activity = timezone.now() - last_activity
-            if time_since_activity > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-                # Clear the cache entry for the expired session
-                cache.delete(cache_key)
-                raise AuthenticationFailed(
-                    f'Session expired due to {SESSION_TIMEOUT_MINUTES} minutes of inactivity. '
-                    'Please log in again.'
-                )
-        
-        # Update last activity timestamp
-        # Cache for longer than timeout to ensure it persists between checks
-        cache.set(cache_key, timezone.now(), SESSION_TIMEOUT_MINUTES * 60 * 2)
-        
-        return (token.user, token)
+        _cache_token(token)
+        return token.user, token
+
+
+def _cached_token(key):
+    entry = _resolved_tokens.get(key)
+    if entry is None:
+        return None
+    user, token, expires = entry
+    if expires < time.monotonic():
+        _resolved_tokens.pop(key, None)
+        return None
+    return user, token
+
+
+def _cache_token(token):
+    if TOKEN_CACHE_SECONDS <= 0:
+        return
+    with _resolved_tokens_lock:
+        if len(_resolved_tokens) >= TOKEN_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for key in [key for key, entry in _resolved_tokens.items() if entry[2] < now]:
+                del _resolved_tokens[key]
+            if len(_resolved_tokens) >= TOKEN_CACHE_MAX_ENTRIES:
+                _resolved_tokens.clear()
+        _resolved_tokens[token.key] = (token.user, token, time.monotonic() + TOKEN_CACHE_SECONDS)
+
+
+def forget_token(token_key):
+    """Drop a token from this process's cache of resolved tokens"""
+    _resolved_tokens.pop(token_key, None)
+
+
+def forget_user_tokens(user_id):
+    """Drop every cached token of a user, e.g. after the user was changed"""
+    with _resolved_tokens_lock:
+        for key in [key for key, entry in _resolved_tokens.items() if entry[0].pk == user_id]:
+            del _resolved_tokens[key]
+
+
+def clear_token_cache():
+    with _resolved_tokens_lock:
+        _resolved_tokens.clear()
 
 
 def clear_session_activity(token_key):
@@ -84,6 +169,5 @@ def clear_session_activity(token_key):
     Args:
         token_key: The authentication token key
     """
-    cache_key = f'token_last_activity_{token_key}'
-    cache.delete(cache_key)
-
+    cache.delete(activity_cache_key(token_key))
+    forget_token(token_key)
@@ -6,8 +6,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.core.mail import EmailMultiAlternatives
-from django.conf import settings
+from .outbox import enqueue_email
 import logging
 
 logger = logging.getLogger(__name__)
@@ -165,18 +164,16 @@ Reply to {data.get('email')} to respond to this inquiry.
 Submitted from: https://epanotes.com
         """
         
-        # Create and send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=['info@epanotes.com'],
+        # Queue email for the outbox worker
+        enqueue_email(
+            subject,
+            text_content,
+            ['info@epanotes.com'],
+            html_body=html_content,
             reply_to=[data.get('email')]  # Allow easy reply to inquirer
         )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
         
-        logger.info(f"Contact form submission sent from {data.get('email')} ({data.get('name')})")
+        logger.info(f"Contact form submission queued from {data.get('email')} ({data.get('name')})")
         
         return Response({
             'message': 'Contact form submitted successfully',
@@ -184,7 +181,7 @@ Submitted from: https://epanotes.com
         })
         
     except Exception as e:
-        logger.error(f"Failed to send contact form email: {str(e)}")
+        logger.error(f"Failed to queue contact form email: {str(e)}")
         return Response(
             {'error': 'Failed to submit contact form. Please try emailing us directly at info@epanotes.com'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1,14 +1,18 @@
 """
-Email service for user management functionality
+Email service for user management functionality.
+
+Emails are queued in the outbox (users.outbox) and sent by the run_worker
+process, not inside the request.
 """
 
-from django.core.mail import send_mail, EmailMultiAlternatives
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.urls import reverse
 from .email_templates import get_welcome_email_template, get_password_reset_email_template
+from .outbox import enqueue_email, outbox_email
+from tasks.queue import task
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,41 +35,36 @@ class EmailService:
         reset_url = f"{protocol}://{domain}/reset-password/{uid}/{token}/"
         return reset_url
     
+    @staticmethod
+    def welcome_email(user, request=None):
+        """Unsaved outbox email welcoming a new user, with a password setup link"""
+        reset_link = EmailService.get_password_reset_link(user, request)
+        organization_name = user.organization.name if user.organization else "Your Organization"
+        
+        subject, html_content, text_content = get_welcome_email_template(
+            user_name=user.name,
+            organization_name=organization_name,
+            reset_link=reset_link
+        )
+        return outbox_email(subject, text_content, [user.email], html_body=html_content)
+    
     @staticmethod
     def send_welcome_email(user, request=None):
-        """Send welcome email to new user with password setup link"""
+        """Queue welcome email to new user with password setup link"""
         try:
-            reset_link = EmailService.get_password_reset_link(user, request)
-            organization_name = user.organization.name if user.organization else "Your Organization"
-            
-            subject, html_content, text_content = get_welcome_email_template(
-                user_name=user.name,
-                organization_name=organization_name,
-                reset_link=reset_link
-            )
-            
-            # Create email with both HTML and text versions
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
-            )
-            email.attach_alternative(html_content, "text/html")
+            # Queue email with both HTML and text versions for the outbox worker
+            EmailService.welcome_email(user, request).save()
             
-            # Send email
-            email.send()
-            
-            logger.info(f"Welcome email sent successfully to {user.email}")
+            logger.info(f"Welcome email queued for {user.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send welcome email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue welcome email to {user.email}: {str(e)}")
             return False
     
     @staticmethod
     def send_password_reset_email(user, request=None):
-        """Send password reset email to user"""
+        """Queue password reset email to user"""
         try:
             reset_link = EmailService.get_password_reset_link(user, request)
             
@@ -74,29 +73,21 @@ class EmailService:
                 reset_link=reset_link
             )
             
-            # Create email with both HTML and text versions
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
-            )
-            email.attach_alternative(html_content, "text/html")
-            
-            # Send email
-            email.send()
+            # Queue email with both HTML and text versions for the outbox worker
+            enqueue_email(subject, text_content, [user.email], html_body=html_content)
             
-            logger.info(f"Password reset email sent successfully to {user.email}")
+            logger.info(f"Password reset email queued for {user.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send password reset email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue password reset email to {user.email}: {str(e)}")
             return False
 
 
+@task
 def send_welcome_email_task(user_id, request_data=None):
     """
-    Task function for sending welcome emails (can be used with Celery in production)
+    Background task for sending welcome emails: send_welcome_email_task.delay(user.id)
     """
     from django.contrib.auth import get_user_model
     
@@ -109,9 +100,10 @@ def send_welcome_email_task(user_id, request_data=None):
         return False
 
 
+@task
 def send_password_reset_email_task(user_id, request_data=None):
     """
-    Task function for sending password reset emails (can be used with Celery in production)
+    Background task for sending password reset emails: send_password_reset_email_task.delay(user.id)
     """
     from django.contrib.auth import get_user_model
     
@@ -2,12 +2,16 @@
 Login attempt tracking and account lockout functionality.
 Implements hospital security requirement AU-13.
 
-Uses Django's cache framework for tracking login attempts.
+Failed attempts are counted with api.cache.increment, which adds to the counter
+in a single atomic operation (in the shared cache on Redis, in the
+cache_counters table on the database tier), so concurrent failures from every
+worker are all counted.
 Locks out accounts after 5 failed login attempts for 1 hour.
 """
-from django.core.cache import cache
 from django.conf import settings
 
+from api.cache import get_count, increment, reset_count
+
 # Configuration
 LOCKOUT_THRESHOLD = 5  # Number of failed attempts before lockout
 LOCKOUT_DURATION = 3600  # Lockout duration in seconds (1 hour)
@@ -31,7 +35,7 @@ def check_login_attempts(email):
             - message: Error message if locked out, None otherwise
     """
     cache_key = get_cache_key(email)
-    attempts = cache.get(cache_key, 0)
+    attempts = get_count(cache_key)
     
     if attempts >= LOCKOUT_THRESHOLD:
         return False, f'Account locked due to {LOCKOUT_THRESHOLD} failed login attempts. Please try again in 1 hour.'
@@ -50,9 +54,7 @@ def record_failed_attempt(email):
         str: Warning message about remaining attempts or lockout status
     """
     cache_key = get_cache_key(email)
-    attempts = cache.get(cache_key, 0)
-    new_attempts = attempts + 1
-    cache.set(cache_key, new_attempts, LOCKOUT_DURATION)
+    new_attempts = increment(cache_key, timeout=LOCKOUT_DURATION)
     
     remaining = LOCKOUT_THRESHOLD - new_attempts
     if remaining > 0:
@@ -68,7 +70,7 @@ def reset_login_attempts(email):
         email: The email address to reset
     """
     cache_key = get_cache_key(email)
-    cache.delete(cache_key)
+    reset_count(cache_key)
 
 
 def get_remaining_attempts(email):
@@ -82,6 +84,6 @@ def get_remaining_attempts(email):
         int: Number of remaining attempts (0-5)
     """
     cache_key = get_cache_key(email)
-    attempts = cache.get(cache_key, 0)
+    attempts = get_count(cache_key)
     return max(0, LOCKOUT_THRESHOLD - attempts)
 
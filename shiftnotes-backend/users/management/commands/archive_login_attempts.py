@@ -0,0 +1,53 @@
+"""
+Management command that archives and deletes login attempts (AU-14) older than
+the retention period, one calendar month at a time.
+
+Each month is written to LOGIN_ATTEMPT_ARCHIVE_DIR as
+login_attempts_YYYY-MM.jsonl.gz and then removed with a single DELETE.
+
+Usage:
+    python manage.py archive_login_attempts
+    python manage.py archive_login_attempts --months 24 --dry-run
+    python manage.py archive_login_attempts --archive-dir /mnt/audit
+    python manage.py archive_login_attempts --no-archive
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.audit import archive_login_attempts, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete login attempts older than LOGIN_ATTEMPT_RETENTION_MONTHS, by month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=settings.LOGIN_ATTEMPT_RETENTION_MONTHS,
+            help='Whole months to keep besides the current one (default: LOGIN_ATTEMPT_RETENTION_MONTHS)'
+        )
+        parser.add_argument(
+            '--archive-dir', default=settings.LOGIN_ATTEMPT_ARCHIVE_DIR,
+            help='Directory for the monthly archives (default: LOGIN_ATTEMPT_ARCHIVE_DIR)'
+        )
+        parser.add_argument('--no-archive', action='store_true', help='Delete without writing archives')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+        before = retention_cutoff(options['months'])
+        archive_dir = None if options['no_archive'] else options['archive_dir']
+
+        months = archive_login_attempts(before, archive_dir=archive_dir, dry_run=options['dry_run'])
+        for label, count in months:
+            verb = 'Would archive' if options['dry_run'] else ('Archived' if archive_dir else 'Deleted')
+            self.stdout.write(f'{verb} {count} login attempt(s) from {label}')
+
+        total = sum(count for _, count in months)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Dry run: {total} login attempt(s) before {before:%Y-%m-%d}'))
+        elif archive_dir:
+            self.stdout.write(self.style.SUCCESS(f'✅ Archived {total} login attempt(s) to {archive_dir}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Deleted {total} login attempt(s) without archiving'))
@@ -0,0 +1,49 @@
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_user_agents(apps, schema_editor):
+    """Replace the user_agent text of existing attempts with UserAgent references"""
+    LoginAttempt = apps.get_model('users', 'LoginAttempt')
+    UserAgent = apps.get_model('users', 'UserAgent')
+    values = LoginAttempt.objects.exclude(user_agent='').values_list('user_agent', flat=True).distinct()
+    for value in values.iterator():
+        agent = UserAgent.objects.create(digest=hashlib.sha256(value.encode('utf-8')).hexdigest(), value=value)
+        LoginAttempt.objects.filter(user_agent=value).update(agent=agent)
+
+
+def restore_user_agents(apps, schema_editor):
+    LoginAttempt = apps.get_model('users', 'LoginAttempt')
+    UserAgent = apps.get_model('users', 'UserAgent')
+    for agent in UserAgent.objects.iterator():
+        LoginAttempt.objects.filter(agent=agent).update(user_agent=agent.value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_add_login_attempt_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('digest', models.CharField(help_text='SHA-256 of the user agent string', max_length=64, unique=True)),
+                ('value', models.TextField()),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'user_agents',
+            },
+        ),
+        migrations.AddField(
+            model_name='loginattempt',
+            name='agent',
+            field=models.ForeignKey(blank=True, help_text='Browser/client user agent string', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='login_attempts', to='users.useragent'),
+        ),
+        migrations.RunPython(move_user_agents, restore_user_agents),
+    ]
@@ -0,0 +1,21 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_login_attempt_user_agents'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='loginattempt',
+            name='user_agent',
+        ),
+        migrations.AlterField(
+            model_name='loginattempt',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
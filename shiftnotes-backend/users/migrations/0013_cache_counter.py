@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-16 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheCounter',
+            fields=[
+                ('key', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'db_table': 'cache_counters',
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+import hashlib
 import uuid
 
 class CustomUserManager(UserManager):
@@ -144,6 +146,54 @@ class Cohort(models.Model):
         return f"{self.name} - {self.program.name}"
 
 
+class UserAgentManager(models.Manager):
+    def ids_for(self, values):
+        """
+        Map user agent strings to UserAgent ids, inserting the new ones.
+
+        Args:
+            values: User agent strings (empty strings are skipped)
+
+        Returns:
+            dict: {value: id}
+        """
+        digests = {UserAgent.digest_for(value): value for value in set(values) if value}
+        if not digests:
+            return {}
+        known = dict(self.filter(digest__in=digests).values_list('digest', 'id'))
+        missing = [UserAgent(digest=digest, value=value) for digest, value in digests.items() if digest not in known]
+        if missing:
+            # Another worker may insert the same strings concurrently
+            self.bulk_create(missing, ignore_conflicts=True)
+            known = dict(self.filter(digest__in=digests).values_list('digest', 'id'))
+        return {value: known[digest] for digest, value in digests.items()}
+
+
+class UserAgent(models.Model):
+    """
+    Distinct user agent strings referenced by login attempts (AU-14).
+
+    Clients send the same few strings over and over, so each is stored once and
+    login attempts point to it.
+    """
+    id = models.BigAutoField(primary_key=True)
+    digest = models.CharField(max_length=64, unique=True, help_text='SHA-256 of the user agent string')
+    value = models.TextField()
+    first_seen = models.DateTimeField(auto_now_add=True)
+
+    objects = UserAgentManager()
+
+    class Meta:
+        db_table = 'user_agents'
+
+    @staticmethod
+    def digest_for(value):
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+    def __str__(self):
+        return self.value
+
+
 class LoginAttempt(models.Model):
     """
     Track all login attempts for security audit purposes.
@@ -170,11 +220,16 @@ class LoginAttempt(models.Model):
         blank=True,
         help_text='IP address of the login attempt'
     )
-    user_agent = models.TextField(
+    agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
         blank=True,
+        related_name='login_attempts',
         help_text='Browser/client user agent string'
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the attempt is made, not when a buffered attempt is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     failure_reason = models.CharField(
         max_length=200,
         blank=True,
@@ -191,7 +246,84 @@ class LoginAttempt(models.Model):
             models.Index(fields=['success', '-timestamp']),
         ]
     
+    def __init__(self, *args, **kwargs):
+        self._user_agent = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def user_agent(self):
+        if self._user_agent is not None:
+            return self._user_agent
+        return self.agent.value if self.agent_id else ''
+
+    @user_agent.setter
+    def user_agent(self, value):
+        # Resolved to a UserAgent on save (or by users.audit for bulk writes)
+        self._user_agent = value or ''
+
+    def save(self, *args, **kwargs):
+        if self._user_agent is not None:
+            self.agent_id = UserAgent.objects.ids_for([self._user_agent]).get(self._user_agent)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         status = 'SUCCESS' if self.success else 'FAILED'
         return f"{status}: {self.email} at {self.timestamp}"
 
+
+
+class CacheCounter(models.Model):
+    """
+    A counter for api.cache.increment when the cache backend has no atomic
+    incr() (the database and file caches). Rows past expires_at count as
+    missing and are overwritten by the next increment.
+    """
+    key = models.CharField(max_length=512, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        db_table = 'cache_counters'
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email queued by a request and delivered by the run_worker process.
+
+    Failed deliveries are retried with exponential backoff until
+    EMAIL_OUTBOX_MAX_ATTEMPTS is reached (see users.outbox).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=998)
+    body = models.TextField(help_text='Plain text version')
+    html_body = models.TextField(blank=True, help_text='HTML alternative, if any')
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text='Not sent before this time')
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text='When a worker started sending it')
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,164 @@
+"""
+Email outbox: requests queue emails, the run_worker process sends them
+(users.tasks.send_outbox_emails, every EMAIL_OUTBOX_POLL_SECONDS).
+
+enqueue_email() only inserts an OutboxEmail row, so a slow SMTP handshake no
+longer holds up the request. The worker claims due emails in batches and
+sends each batch over one SMTP connection. A failed email is retried after
+EMAIL_OUTBOX_RETRY_SECONDS, doubling on each attempt, until
+EMAIL_OUTBOX_MAX_ATTEMPTS is reached and it is marked failed. Emails claimed
+by a worker that died are picked up again after SENDING_TIMEOUT, so delivery
+is at least once.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+SENDING_TIMEOUT = timedelta(minutes=10)
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def outbox_email(subject, body, to, html_body='', reply_to=None, from_email=None):
+    """
+    Build an unsaved OutboxEmail.
+
+    Args:
+        subject: Subject line
+        body: Plain text body
+        to: Recipient addresses
+        html_body: Optional HTML alternative
+        reply_to: Optional Reply-To addresses
+        from_email: Sender (default: DEFAULT_FROM_EMAIL)
+    """
+    return OutboxEmail(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+
+
+def enqueue_email(subject, body, to, html_body='', reply_to=None, from_email=None):
+    """Queue an email for the outbox worker (arguments as for outbox_email); returns the OutboxEmail"""
+    email = outbox_email(subject, body, to, html_body=html_body, reply_to=reply_to, from_email=from_email)
+    email.save()
+    return email
+
+
+def enqueue_emails(emails):
+    """Queue many unsaved OutboxEmails with batched INSERTs"""
+    return OutboxEmail.objects.bulk_create(emails, batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE)
+
+
+def retry_delay(attempts):
+    """Wait after the given number of failed attempts"""
+    delay = timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1))
+    return min(delay, MAX_RETRY_DELAY)
+
+
+def claim_outbox_batch(limit, now=None):
+    """Mark up to limit due emails as sending and return them, oldest first"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='sending', claimed_at__lt=now - SENDING_TIMEOUT)
+            ).order_by('next_attempt_at')[:limit]
+        )
+        if emails:
+            OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+                status='sending', claimed_at=now
+            )
+    return emails
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        reply_to=email.reply_to or None,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def send_outbox_batch(limit=None):
+    """
+    Claim and send one batch of due emails over a single connection.
+
+    Returns:
+        tuple: (claimed, sent) counts; claimed is 0 when nothing was due
+    """
+    emails = claim_outbox_batch(limit or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            record_failure(email, e)
+        return len(emails), 0
+
+    try:
+        for email in emails:
+            try:
+                build_message(email, connection).send()
+            except Exception as e:
+                record_failure(email, e)
+                # Drop a connection the server may have closed; the next send reconnects
+                close_quietly(connection)
+                continue
+            email.status = 'sent'
+            email.sent_at = timezone.now()
+            email.attempts += 1
+            email.last_error = ''
+            email.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            sent += 1
+    finally:
+        close_quietly(connection)
+    return len(emails), sent
+
+
+def drain_outbox(batch_size=None):
+    """Send batches until no email is due; returns (claimed, sent) totals"""
+    total_claimed = total_sent = 0
+    claimed, sent = send_outbox_batch(batch_size)
+    while claimed:
+        total_claimed += claimed
+        total_sent += sent
+        claimed, sent = send_outbox_batch(batch_size)
+    return total_claimed, total_sent
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass  # Sent emails were already accepted; a failed QUIT does not matter
+
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error) or error.__class__.__name__
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
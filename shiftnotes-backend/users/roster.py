@@ -0,0 +1,135 @@
+"""
+Roster import: create a program's users from one CSV or JSON upload.
+
+Every row is validated before anything is written. Existing emails and the
+named cohorts are looked up with one query each for the whole roster. If any
+row is invalid nothing is imported, so a corrected file can simply be
+uploaded again. Otherwise the users are inserted with bulk_create and their
+welcome emails queued in the outbox with batched INSERTs, all in one
+transaction.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .email_service import EmailService
+from .models import Cohort, User
+from .outbox import enqueue_emails
+from .serializers import RosterRowSerializer
+
+MAX_ROSTER_SIZE = 500
+ROSTER_COLUMNS = ['email', 'name', 'role', 'cohort', 'department', 'start_date']
+
+
+def parse_roster_csv(content):
+    """
+    Rows of a CSV roster with a header line.
+
+    Column names are matched case-insensitively; unknown columns and empty
+    cells are dropped so that optional fields take their defaults.
+
+    Raises:
+        ValueError: If the file is not UTF-8 text or lacks email/name columns
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('The roster must be a UTF-8 encoded CSV file.')
+
+    reader = csv.DictReader(io.StringIO(content))
+    columns = {column: (column or '').strip().lower() for column in reader.fieldnames or []}
+    if not {'email', 'name'} <= set(columns.values()):
+        raise ValueError('The roster must have a header row with at least email and name columns.')
+
+    return [
+        {
+            columns[column]: value.strip()
+            for column, value in row.items()
+            if columns.get(column) in ROSTER_COLUMNS and isinstance(value, str) and value.strip()
+        }
+        for row in reader
+    ]
+
+
+def import_roster(admin, rows, dry_run=False, create_cohorts=False):
+    """
+    Create users in the admin's organization and program.
+
+    Args:
+        admin: Admin user running the import; must belong to a program
+        rows: List of user payloads (see RosterRowSerializer)
+        dry_run: Validate only; nothing is written
+        create_cohorts: Create cohorts named in the roster that do not exist
+            yet instead of reporting them as errors
+
+    Returns:
+        (results, cohorts_created): one result per row, in order,
+        {'index', 'status': 'created'|'valid', 'email', 'id'} or
+        {'index', 'status': 'error', 'errors'}; every row is 'valid' on a dry
+        run and none is created if any row has errors. cohorts_created lists
+        the names of new cohorts.
+    """
+    results = [None] * len(rows)
+    validated = []
+    for index, row in enumerate(rows):
+        serializer = RosterRowSerializer(data=row)
+        if serializer.is_valid():
+            validated.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    emails = {data['email'] for _, data in validated}
+    taken = set(User.objects.annotate(email_lower=Lower('email')).filter(
+        email_lower__in=emails
+    ).values_list('email_lower', flat=True))
+    cohort_names = {data['cohort'] for _, data in validated if data['cohort']}
+    cohorts = {cohort.name: cohort for cohort in Cohort.objects.filter(program=admin.program, name__in=cohort_names)}
+    new_cohorts = sorted(cohort_names - set(cohorts)) if create_cohorts else []
+    for name in new_cohorts:
+        cohorts[name] = Cohort(org=admin.organization, program=admin.program, name=name)
+
+    users = []
+    seen = set()
+    for index, data in validated:
+        errors = {}
+        if data['email'] in taken:
+            errors['email'] = ['A user with this email already exists.']
+        elif data['email'] in seen:
+            errors['email'] = ['This email appears more than once in the roster.']
+        seen.add(data['email'])
+        if data['cohort'] and data['cohort'] not in cohorts:
+            errors['cohort'] = [f'Cohort not found in your program: {data["cohort"]}']
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+            continue
+
+        user = User(
+            email=data['email'],
+            name=data['name'],
+            role=data['role'],
+            organization=admin.organization,
+            program=admin.program,
+            cohort=cohorts.get(data['cohort']),
+            department=data['department'],
+            start_date=data['start_date'],
+        )
+        user.set_unusable_password()  # They set a password from the welcome email
+        users.append(user)
+        results[index] = {'index': index, 'status': 'valid', 'email': user.email, 'id': str(user.id)}
+
+    if dry_run or any(result['status'] == 'error' for result in results):
+        for result in results:
+            result.pop('id', None)
+        return results, new_cohorts
+
+    with transaction.atomic():
+        Cohort.objects.bulk_create(cohorts[name] for name in new_cohorts)
+        User.objects.bulk_create(users)
+        enqueue_emails([EmailService.welcome_email(user) for user in users])
+
+    for result in results:
+        result['status'] = 'created'
+    return results, new_cohorts
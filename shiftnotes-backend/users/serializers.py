@@ -32,6 +32,26 @@ class UserCreateSerializer(serializers.ModelSerializer):
         
         return user
 
+class RosterRowSerializer(serializers.Serializer):
+    """
+    One user of a roster import. Cohorts are given by name and, like email
+    uniqueness, are checked for the whole roster at once by users.roster.
+    """
+    email = serializers.EmailField()
+    name = serializers.CharField(max_length=150)
+    role = serializers.ChoiceField(choices=['trainee', 'faculty', 'leadership', 'admin'], default='trainee')
+    cohort = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    department = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    start_date = serializers.DateField(required=False, allow_null=True, default=None)
+
+    def validate_email(self, value):
+        return value.strip().lower()
+
+    def validate(self, data):
+        if data['role'] == 'trainee' and not data['cohort']:
+            raise serializers.ValidationError({'cohort': ['Cohort is required for trainees.']})
+        return data
+
 class CohortSerializer(serializers.ModelSerializer):
     org_name = serializers.CharField(source='org.name', read_only=True)
     program_name = serializers.CharField(source='program.name', read_only=True)
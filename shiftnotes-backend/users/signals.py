@@ -0,0 +1,29 @@
+"""
+Signal handlers for users.
+
+Keep the per-process cache of resolved auth tokens (users.authentication) in
+step with the database: a saved user is reloaded on their next request, and a
+deleted token or deactivated user also loses the shared last-activity entry so
+that other processes stop trusting their cached copy.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import clear_session_activity, forget_user_tokens
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user_tokens(sender, instance, **kwargs):
+    forget_user_tokens(instance.pk)
+    if not instance.is_active or instance.deactivated_at is not None:
+        for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+            clear_session_activity(key)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    clear_session_activity(instance.key)
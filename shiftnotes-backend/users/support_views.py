@@ -6,8 +6,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.core.mail import EmailMultiAlternatives
-from django.conf import settings
+from .outbox import enqueue_email
 import logging
 
 logger = logging.getLogger(__name__)
@@ -194,18 +193,16 @@ Submitted: {data.get('submitted_at', 'N/A')}
 Reply to {user.email} to respond to this request
         """
         
-        # Create and send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=['support@epanotes.com'],
+        # Queue email for the outbox worker
+        enqueue_email(
+            subject,
+            text_content,
+            ['support@epanotes.com'],
+            html_body=html_content,
             reply_to=[user.email]  # Allow easy reply to user
         )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
         
-        logger.info(f"Support request sent from {user.email}: {data.get('subject')}")
+        logger.info(f"Support request queued from {user.email}: {data.get('subject')}")
         
         return Response({
             'message': 'Support request submitted successfully',
@@ -214,7 +211,7 @@ Reply to {user.email} to respond to this request
         })
         
     except Exception as e:
-        logger.error(f"Failed to send support request from {request.user.email}: {str(e)}")
+        logger.error(f"Failed to queue support request from {request.user.email}: {str(e)}")
         return Response(
             {'error': 'Failed to submit support request. Please try again later.'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -0,0 +1,21 @@
+"""
+Background tasks of the users app, run by the run_worker command.
+"""
+from django.conf import settings
+
+from api.cache import purge_expired_counters
+from tasks.queue import task
+from .outbox import drain_outbox
+
+
+@task(every=settings.EMAIL_OUTBOX_POLL_SECONDS)
+def send_outbox_emails():
+    """Send every due outbox email; returns the number sent"""
+    _, sent = drain_outbox()
+    return sent
+
+
+@task(every=3600)
+def purge_cache_counters():
+    """Delete expired lockout counters (database cache tier); returns the number deleted"""
+    return purge_expired_counters()
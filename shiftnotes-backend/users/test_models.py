@@ -1,12 +1,25 @@
 """
 Tests for User and Cohort models
 """
+import gzip
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest.mock import patch
+
 import pytest
+from django.core import mail
 from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import DatabaseError
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from users.models import Cohort, LoginAttempt
+from users.audit import LoginAuditWriter, archive_login_attempts, retention_cutoff
+from users.models import Cohort, LoginAttempt, OutboxEmail, UserAgent
+from users.outbox import enqueue_email, retry_delay, send_outbox_batch
 from users.validators import ComplexityValidator
 from conftest import (
     OrganizationFactory, ProgramFactory, CohortFactory, UserFactory
@@ -309,6 +322,190 @@ class TestLoginAttemptModel:
         assert attempt.email is not None  # Email is preserved
 
 
+
+@pytest.mark.django_db
+class TestLoginAuditWriter:
+    """Test buffered login attempt logging and the user agent dictionary (AU-14)"""
+    
+    def test_failed_attempts_are_written_in_one_batch(self, django_assert_max_num_queries):
+        """Test that attempts wait in the buffer until the batch is full"""
+        writer = LoginAuditWriter(batch_size=3, flush_seconds=3600)
+        writer.record(email='one@example.com', success=False, user_agent='Bot/1.0')
+        writer.record(email='two@example.com', success=False, user_agent='Bot/1.0')
+        assert LoginAttempt.objects.count() == 0
+        
+        # Savepoint and release, user agent lookup, insert and re-read, then one INSERT for the attempts
+        with django_assert_max_num_queries(6):
+            writer.record(email='three@example.com', success=False, user_agent='Other/2.0')
+        
+        assert LoginAttempt.objects.count() == 3
+        assert UserAgent.objects.count() == 2
+        assert writer.timer is None
+    
+    def test_immediate_attempt_flushes_buffer(self):
+        """Test that a successful login writes itself and everything pending"""
+        writer = LoginAuditWriter(batch_size=10, flush_seconds=3600)
+        writer.record(email='failed@example.com', success=False)
+        writer.record(immediate=True, email='ok@example.com', success=True, user_agent='Browser/1.0')
+        
+        assert LoginAttempt.objects.count() == 2
+        assert writer.pending == []
+    
+    def test_timestamp_is_time_of_attempt(self):
+        """Test that buffered attempts keep the time they were recorded"""
+        writer = LoginAuditWriter(batch_size=10, flush_seconds=3600)
+        before = timezone.now()
+        writer.record(email='late@example.com', success=False)
+        writer.flush()
+        
+        attempt = LoginAttempt.objects.get()
+        assert before <= attempt.timestamp <= timezone.now()
+    
+    def test_user_agent_text_round_trips(self):
+        """Test that the user agent string is stored once and read back"""
+        for _ in range(3):
+            LoginAttempt.objects.create(email='ua@example.com', success=True, user_agent='Mozilla/5.0 Shared')
+        
+        assert UserAgent.objects.count() == 1
+        assert {attempt.user_agent for attempt in LoginAttempt.objects.all()} == {'Mozilla/5.0 Shared'}
+    
+    def test_failed_write_keeps_attempts(self):
+        """Test that attempts survive a failed flush and are written by the next one"""
+        writer = LoginAuditWriter(batch_size=10, flush_seconds=3600)
+        writer.record(email='kept@example.com', success=False)
+        with patch.object(LoginAttempt.objects, 'bulk_create', side_effect=DatabaseError('down')):
+            assert writer.flush() == 0
+        
+        assert writer.flush() == 1
+        assert LoginAttempt.objects.filter(email='kept@example.com').exists()
+
+
+@pytest.mark.django_db
+class TestLoginAttemptArchival:
+    """Test monthly archival and deletion of old login attempts (AU-14)"""
+    
+    def create_attempt(self, email, when):
+        return LoginAttempt.objects.create(email=email, success=False, user_agent='Archiver/1.0', timestamp=when)
+    
+    def test_old_months_are_archived_and_deleted(self, tmp_path):
+        """Test that each old month is written to its own archive before deletion"""
+        now = timezone.now()
+        cutoff = retention_cutoff(12, now)
+        self.create_attempt('old1@example.com', cutoff - timedelta(days=40))
+        self.create_attempt('old2@example.com', cutoff - timedelta(days=1))
+        recent = self.create_attempt('recent@example.com', now)
+        
+        out = StringIO()
+        call_command('archive_login_attempts', '--archive-dir', str(tmp_path), stdout=out)
+        
+        assert list(LoginAttempt.objects.values_list('id', flat=True)) == [recent.id]
+        archives = sorted(tmp_path.glob('login_attempts_*.jsonl.gz'))
+        assert len(archives) == 2
+        rows = [json.loads(line) for archive in archives for line in gzip.open(archive, 'rt')]
+        assert {row['email'] for row in rows} == {'old1@example.com', 'old2@example.com'}
+        assert rows[0]['user_agent'] == 'Archiver/1.0'
+        assert 'Archived 2 login attempt(s)' in out.getvalue()
+    
+    def test_existing_archive_is_not_overwritten(self, tmp_path):
+        """Test that a second archive of the same month gets a new name"""
+        cutoff = retention_cutoff(12)
+        self.create_attempt('first@example.com', cutoff - timedelta(days=1))
+        archive_login_attempts(cutoff, archive_dir=str(tmp_path))
+        self.create_attempt('second@example.com', cutoff - timedelta(days=1))
+        archive_login_attempts(cutoff, archive_dir=str(tmp_path))
+        
+        assert len(list(tmp_path.glob('login_attempts_*.jsonl.gz'))) == 2
+    
+    def test_dry_run_keeps_attempts(self, tmp_path):
+        """Test that a dry run only reports"""
+        self.create_attempt('old@example.com', retention_cutoff(12) - timedelta(days=1))
+        
+        months = archive_login_attempts(retention_cutoff(12), archive_dir=str(tmp_path), dry_run=True)
+        
+        assert [count for _, count in months] == [1]
+        assert LoginAttempt.objects.count() == 1
+        assert not list(tmp_path.iterdir())
+    
+    def test_retention_cutoff_is_month_start(self):
+        """Test that the cutoff is the first day of the month N months ago"""
+        now = timezone.make_aware(datetime(2026, 3, 15, 12, 0))
+        
+        cutoff = retention_cutoff(12, now)
+        
+        assert (cutoff.year, cutoff.month, cutoff.day, cutoff.hour) == (2025, 3, 1, 0)
+
+
+
+@pytest.mark.django_db
+class TestEmailOutbox:
+    """Test outbox delivery by the run_worker process"""
+    
+    def test_batch_is_sent_over_one_connection(self):
+        """Test that due emails are sent together and marked sent"""
+        for index in range(3):
+            enqueue_email(f'Subject {index}', 'Body', [f'user{index}@example.com'], html_body='<p>Body</p>')
+        
+        with patch('users.outbox.get_connection', wraps=get_connection) as connect:
+            claimed, sent = send_outbox_batch()
+        
+        assert (claimed, sent) == (3, 3)
+        assert connect.call_count == 1
+        assert len(mail.outbox) == 3
+        assert mail.outbox[0].alternatives[0][1] == 'text/html'
+        assert set(OutboxEmail.objects.values_list('status', flat=True)) == {'sent'}
+    
+    def test_failure_is_retried_with_backoff(self, settings):
+        """Test that a failed send is rescheduled with a doubling delay"""
+        settings.EMAIL_OUTBOX_RETRY_SECONDS = 60
+        email = enqueue_email('Retry me', 'Body', ['retry@example.com'])
+        
+        with patch('users.outbox.EmailMultiAlternatives.send', side_effect=SMTPException('busy')):
+            assert send_outbox_batch() == (1, 0)
+        email.refresh_from_db()
+        assert email.status == 'pending'
+        assert email.attempts == 1
+        assert 'busy' in email.last_error
+        assert email.next_attempt_at > timezone.now() + timedelta(seconds=50)
+        
+        # Not due yet
+        assert send_outbox_batch() == (0, 0)
+        assert retry_delay(3) == timedelta(seconds=240)
+    
+    def test_email_fails_after_max_attempts(self, settings):
+        """Test that an email is given up on after EMAIL_OUTBOX_MAX_ATTEMPTS"""
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+        email = enqueue_email('Doomed', 'Body', ['doomed@example.com'])
+        
+        with patch('users.outbox.EmailMultiAlternatives.send', side_effect=SMTPException('rejected')):
+            send_outbox_batch()
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            send_outbox_batch()
+        
+        email.refresh_from_db()
+        assert email.status == 'failed'
+        assert email.attempts == 2
+    
+    def test_stuck_email_is_claimed_again(self):
+        """Test that emails left sending by a dead worker are sent later"""
+        email = enqueue_email('Stuck', 'Body', ['stuck@example.com'])
+        OutboxEmail.objects.update(status='sending', claimed_at=timezone.now() - timedelta(minutes=30))
+        
+        assert send_outbox_batch() == (1, 1)
+        email.refresh_from_db()
+        assert email.status == 'sent'
+    
+    def test_worker_drains_outbox(self, settings):
+        """Test that the worker command sends every due email in batches"""
+        settings.EMAIL_OUTBOX_BATCH_SIZE = 2
+        for index in range(5):
+            enqueue_email(f'Batch {index}', 'Body', ['batch@example.com'])
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        
+        assert len(mail.outbox) == 5
+        assert not OutboxEmail.objects.exclude(status='sent').exists()
+
+
 @pytest.mark.django_db
 class TestPasswordComplexityValidator:
     """Test password complexity validator (AU-08)"""
@@ -1,19 +1,32 @@
 """
 Tests for User API views and authentication
 """
+import threading
+from io import StringIO
+
 import pytest
 from django.urls import reverse
+from django.core import mail
 from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 from unittest.mock import patch, MagicMock
 from datetime import timedelta
 
-from users.models import User, LoginAttempt
+from api.cache import increment
+from users.models import User, Cohort, CacheCounter, LoginAttempt, OutboxEmail
+from users.audit import LoginAuditWriter
+from users.authentication import ExpiringTokenAuthentication, activity_cache_key, clear_token_cache
 from users.lockout import (
     check_login_attempts, record_failed_attempt, 
-    reset_login_attempts, get_remaining_attempts, LOCKOUT_THRESHOLD
+    reset_login_attempts, get_remaining_attempts, get_cache_key, LOCKOUT_THRESHOLD
 )
 from conftest import (
     OrganizationFactory, ProgramFactory, CohortFactory,
@@ -325,6 +338,126 @@ class TestUserManagementViews:
         assert not User.objects.filter(id=user_id).exists()
 
 
+
+@pytest.mark.django_db
+class TestRosterImport:
+    """Test bulk roster import of users"""
+    
+    def roster(self, count, cohort_name='PGY-1 2026'):
+        return [
+            {'email': f'Resident{index}@Example.com', 'name': f'Resident {index}', 'cohort': cohort_name}
+            for index in range(count)
+        ]
+    
+    def test_import_creates_users_and_queues_emails(self, admin_client, admin_user):
+        """Test that a JSON roster creates users in the admin's program with welcome emails"""
+        cohort = CohortFactory(org=admin_user.organization, program=admin_user.program, name='PGY-1 2026')
+        
+        response = admin_client.post(reverse('user-import-roster'), {'users': self.roster(3)}, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 3
+        assert [result['status'] for result in response.data['results']] == ['created'] * 3
+        user = User.objects.get(email='resident0@example.com')
+        assert user.program == admin_user.program
+        assert user.organization == admin_user.organization
+        assert user.cohort == cohort
+        assert user.role == 'trainee'
+        assert not user.has_usable_password()
+        assert OutboxEmail.objects.count() == 3
+        assert len(mail.outbox) == 0
+    
+    def test_query_count_independent_of_roster_size(self, admin_client, admin_user):
+        """Test that larger rosters do not issue per-row queries (both fit in one INSERT batch)"""
+        CohortFactory(org=admin_user.organization, program=admin_user.program, name='PGY-1 2026')
+        url = reverse('user-import-roster')
+        
+        with CaptureQueriesContext(connection) as small_roster:
+            admin_client.post(url, {'users': self.roster(2)}, format='json')
+        User.objects.filter(email__startswith='resident').delete()
+        with CaptureQueriesContext(connection) as large_roster:
+            response = admin_client.post(url, {'users': self.roster(20)}, format='json')
+        
+        assert response.data['created'] == 20
+        assert len(large_roster.captured_queries) == len(small_roster.captured_queries)
+    
+    def test_csv_upload(self, admin_client, admin_user):
+        """Test that a CSV roster is parsed with optional columns left empty"""
+        CohortFactory(org=admin_user.organization, program=admin_user.program, name='PGY-2')
+        content = (
+            'Email,Name,Role,Cohort,Start_Date\n'
+            'csv.resident@example.com,CSV Resident,trainee,PGY-2,2026-07-01\n'
+            'csv.faculty@example.com,CSV Faculty,faculty,,\n'
+        )
+        upload = SimpleUploadedFile('roster.csv', content.encode('utf-8'), content_type='text/csv')
+        
+        response = admin_client.post(reverse('user-import-roster'), {'file': upload}, format='multipart')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        resident = User.objects.get(email='csv.resident@example.com')
+        assert str(resident.start_date) == '2026-07-01'
+        assert User.objects.get(email='csv.faculty@example.com').cohort is None
+    
+    def test_invalid_rows_import_nothing(self, admin_client, admin_user):
+        """Test that row errors are reported per row and no user is created"""
+        CohortFactory(org=admin_user.organization, program=admin_user.program, name='PGY-1 2026')
+        UserFactory(email='taken@example.com', organization=admin_user.organization, program=admin_user.program)
+        rows = self.roster(1) + [
+            {'email': 'TAKEN@example.com', 'name': 'Existing', 'role': 'faculty'},
+            {'email': 'resident0@example.com', 'name': 'Duplicate', 'cohort': 'PGY-1 2026'},
+            {'email': 'nocohort@example.com', 'name': 'No Cohort'},
+            {'email': 'unknown@example.com', 'name': 'Unknown', 'cohort': 'PGY-9'},
+            {'email': 'not-an-email', 'name': 'Bad'},
+        ]
+        
+        response = admin_client.post(reverse('user-import-roster'), {'users': rows}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        results = response.data['results']
+        assert results[0]['status'] == 'valid'
+        assert 'already exists' in str(results[1]['errors']['email'])
+        assert 'more than once' in str(results[2]['errors']['email'])
+        assert 'cohort' in results[3]['errors']
+        assert 'PGY-9' in str(results[4]['errors']['cohort'])
+        assert 'email' in results[5]['errors']
+        assert not User.objects.filter(email='resident0@example.com').exists()
+        assert OutboxEmail.objects.count() == 0
+    
+    def test_dry_run_writes_nothing(self, admin_client, admin_user):
+        """Test that a dry run validates and reports without creating users or cohorts"""
+        response = admin_client.post(
+            reverse('user-import-roster') + '?dry_run=true&create_cohorts=true',
+            {'users': self.roster(2, cohort_name='PGY-3')},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 0
+        assert response.data['cohorts_created'] == ['PGY-3']
+        assert [result['status'] for result in response.data['results']] == ['valid', 'valid']
+        assert not User.objects.filter(email__startswith='resident').exists()
+        assert not Cohort.objects.filter(name='PGY-3').exists()
+    
+    def test_create_cohorts(self, admin_client, admin_user):
+        """Test that missing cohorts are created when requested"""
+        response = admin_client.post(
+            reverse('user-import-roster'),
+            {'users': self.roster(2, cohort_name='PGY-1 2027'), 'create_cohorts': True},
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        cohort = Cohort.objects.get(name='PGY-1 2027')
+        assert cohort.program == admin_user.program
+        assert cohort.users.count() == 2
+    
+    def test_non_admin_forbidden(self, faculty_client):
+        """Test that only admins can import rosters"""
+        response = faculty_client.post(reverse('user-import-roster'), {'users': self.roster(1)}, format='json')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 @pytest.mark.django_db
 class TestCohortViews:
     """Test cohort management views"""
@@ -543,6 +676,22 @@ class TestLoginAttemptLogging:
         assert lockout_attempt is not None
         assert lockout_attempt.success is False
     
+    def test_lockout_attempt_is_not_buffered(self, api_client):
+        """Test that attempts on a locked account are written at once, with the failures before them"""
+        url = reverse('user-login')
+        email = 'lockout-burst@example.com'
+        writer = LoginAuditWriter(batch_size=50, flush_seconds=3600)
+        
+        with patch('users.audit.login_audit', writer):
+            for i in range(LOCKOUT_THRESHOLD):
+                api_client.post(url, {'email': email, 'password': 'wrongpassword'}, format='json')
+            assert LoginAttempt.objects.filter(email=email).count() == 0
+            
+            api_client.post(url, {'email': email, 'password': 'whatever'}, format='json')
+        
+        assert LoginAttempt.objects.filter(email=email).count() == LOCKOUT_THRESHOLD + 1
+        assert writer.pending == []
+    
     def test_login_attempt_captures_ip_and_user_agent(self, api_client):
         """Test that IP address and user agent are captured"""
         org = OrganizationFactory()
@@ -673,6 +822,143 @@ class TestSessionTimeout:
         assert 'expired' in response.data['detail'].lower() or 'inactivity' in response.data['detail'].lower()
 
 
+
+@pytest.mark.django_db
+class TestAuthenticationFastPath:
+    """Test the per-process cache of resolved tokens and coalesced activity writes"""
+    
+    def setup_method(self):
+        """Clear both caches before each test"""
+        cache.clear()
+        clear_token_cache()
+    
+    def make_token(self):
+        org = OrganizationFactory()
+        program = ProgramFactory(org=org)
+        user = UserFactory(organization=org, program=program)
+        return Token.objects.create(user=user)
+    
+    def test_cached_token_needs_no_queries(self, django_assert_num_queries):
+        """Test that a repeated request authenticates without touching the database"""
+        token = self.make_token()
+        auth = ExpiringTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+        
+        with django_assert_num_queries(0):
+            user, returned_token = auth.authenticate_credentials(token.key)
+            assert user.program.name == token.user.program.name
+            assert user.organization_id == token.user.organization_id
+        assert returned_token.key == token.key
+    
+    def test_missing_activity_entry_falls_back_to_database(self, django_assert_num_queries):
+        """Test that a cleared activity entry (logout elsewhere) forces a database check"""
+        token = self.make_token()
+        auth = ExpiringTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+        cache.delete(activity_cache_key(token.key))
+        
+        with django_assert_num_queries(1):
+            auth.authenticate_credentials(token.key)
+    
+    def test_logout_invalidates_cached_token(self, api_client):
+        """Test that a logged out token is rejected even though it was cached"""
+        token = self.make_token()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(reverse('user-me')).status_code == status.HTTP_200_OK
+        
+        api_client.post(reverse('user-logout'))
+        response = api_client.get(reverse('user-me'))
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_deactivation_invalidates_cached_token(self, api_client):
+        """Test that a deactivated user is rejected on their next request"""
+        token = self.make_token()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(reverse('user-me')).status_code == status.HTTP_200_OK
+        
+        token.user.deactivate()
+        response = api_client.get(reverse('user-me'))
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert 'deactivated' in response.data['detail'].lower()
+    
+    def test_user_changes_are_picked_up(self, api_client):
+        """Test that a saved user is reloaded instead of served from the cache"""
+        token = self.make_token()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        api_client.get(reverse('user-me'))
+        
+        token.user.name = 'Renamed User'
+        token.user.save()
+        response = api_client.get(reverse('user-me'))
+        
+        assert response.data['name'] == 'Renamed User'
+    
+    def test_recent_activity_is_not_rewritten(self):
+        """Test that last activity is only written once it is older than the interval"""
+        token = self.make_token()
+        auth = ExpiringTokenAuthentication()
+        cache_key = activity_cache_key(token.key)
+        
+        recent = timezone.now() - timedelta(seconds=10)
+        cache.set(cache_key, recent, 60 * 60)
+        auth.authenticate_credentials(token.key)
+        assert cache.get(cache_key) == recent
+        
+        stale = timezone.now() - timedelta(minutes=2)
+        cache.set(cache_key, stale, 60 * 60)
+        auth.authenticate_credentials(token.key)
+        assert cache.get(cache_key) > stale
+    
+    def test_timeout_enforced_for_cached_token(self):
+        """Test that AU-15 expiry applies to tokens served from the cache"""
+        token = self.make_token()
+        auth = ExpiringTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+        cache.set(activity_cache_key(token.key), timezone.now() - timedelta(minutes=16), 60 * 60)
+        
+        with pytest.raises(AuthenticationFailed):
+            auth.authenticate_credentials(token.key)
+
+
+
+@pytest.mark.django_db
+class TestQueuedEmails:
+    """Test that views queue emails in the outbox instead of sending them"""
+    
+    def test_password_reset_is_queued(self, api_client):
+        """Test that a reset request queues the email without sending it"""
+        org = OrganizationFactory()
+        user = UserFactory(email='reset-me@example.com', organization=org, program=ProgramFactory(org=org))
+        
+        response = api_client.post(reverse('request_password_reset'), {'email': user.email}, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(mail.outbox) == 0
+        queued = OutboxEmail.objects.get()
+        assert queued.to == [user.email]
+        assert queued.html_body
+    
+    def test_support_request_is_queued(self, authenticated_client, trainee_user):
+        """Test that a support request is queued with the user as Reply-To"""
+        response = authenticated_client.post(reverse('submit_support_request'), {
+            'subject': 'Cannot submit',
+            'category': 'bug',
+            'priority': 'high',
+            'description': 'The submit button does nothing',
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(mail.outbox) == 0
+        queued = OutboxEmail.objects.get()
+        assert queued.to == ['support@epanotes.com']
+        assert queued.reply_to == [trainee_user.email]
+        
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        assert mail.outbox[0].reply_to == [trainee_user.email]
+
+
 @pytest.mark.django_db
 class TestLockoutHelperFunctions:
     """Test lockout helper functions directly"""
@@ -709,6 +995,53 @@ class TestLockoutHelperFunctions:
         result = record_failed_attempt(email)
         assert '3' in result  # 5 - 2 = 3 remaining
     
+    def test_record_failed_attempt_counts_concurrent_failures(self):
+        """Test that failures recorded by concurrent workers are all counted"""
+        email = 'concurrent@example.com'
+        threads = [threading.Thread(target=record_failed_attempt, args=(email,)) for _ in range(LOCKOUT_THRESHOLD)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert get_remaining_attempts(email) == 0
+        assert check_login_attempts(email)[0] is False
+    
+    def test_increment_restarts_expiry(self):
+        """Test that the counter helper creates, increments and re-arms the key"""
+        assert increment('counter-test', timeout=60) == 1
+        assert increment('counter-test', 2, timeout=60) == 3
+        
+        with patch('api.cache.cache.touch') as touch:
+            increment('counter-test', timeout=120)
+        touch.assert_called_once_with('counter-test', 120)
+    
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_table',
+    }})
+    def test_database_tier_counts_with_single_update(self):
+        """Test that without an atomic cache incr() the counter is a row updated in place"""
+        email = 'db-tier@example.com'
+        for i in range(LOCKOUT_THRESHOLD - 1):
+            record_failed_attempt(email)
+        
+        with CaptureQueriesContext(connection) as queries:
+            record_failed_attempt(email)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        
+        assert len(updates) == 1
+        assert '"value" + ' in updates[0]
+        assert CacheCounter.objects.get().value == LOCKOUT_THRESHOLD
+        assert check_login_attempts(email)[0] is False
+        
+        # An expired counter starts again
+        CacheCounter.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        assert get_remaining_attempts(email) == LOCKOUT_THRESHOLD
+        assert increment(get_cache_key(email)) == 1
+        
+        reset_login_attempts(email)
+        assert not CacheCounter.objects.exists()
+    
     def test_reset_login_attempts_clears_counter(self):
         """Test that reset clears the attempt counter"""
         email = 'reset@example.com'
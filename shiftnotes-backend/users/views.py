@@ -6,9 +6,11 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from .models import User, Cohort, LoginAttempt
+from .models import User, Cohort
+from .audit import record_login_attempt
 from .serializers import UserSerializer, UserCreateSerializer, CohortSerializer
 from .email_service import EmailService
+from .roster import MAX_ROSTER_SIZE, import_roster, parse_roster_csv
 from .lockout import check_login_attempts, record_failed_attempt, reset_login_attempts
 from .authentication import clear_session_activity
 import logging
@@ -94,14 +96,15 @@ class UserViewSet(viewsets.ModelViewSet):
         # Check if account is locked out (AU-13)
         allowed, lockout_message = check_login_attempts(email)
         if not allowed:
-            # Log the lockout attempt
-            LoginAttempt.objects.create(
+            # Log the lockout attempt; written at once so it survives a killed worker
+            record_login_attempt(
                 email=email,
                 user=None,
                 success=False,
                 ip_address=ip_address,
                 user_agent=user_agent,
-                failure_reason='Account locked out'
+                failure_reason='Account locked out',
+                immediate=True
             )
             logger.warning(f"Blocked login attempt for locked account: {email} from {ip_address}")
             return Response(
@@ -115,7 +118,7 @@ class UserViewSet(viewsets.ModelViewSet):
         if user:
             # Check if user is deactivated
             if hasattr(user, 'deactivated_at') and user.deactivated_at is not None:
-                LoginAttempt.objects.create(
+                record_login_attempt(
                     email=email,
                     user=user,
                     success=False,
@@ -134,7 +137,7 @@ class UserViewSet(viewsets.ModelViewSet):
             token, created = Token.objects.get_or_create(user=user)
             
             # Log successful login (AU-14)
-            LoginAttempt.objects.create(
+            record_login_attempt(
                 email=email,
                 user=user,
                 success=True,
@@ -152,7 +155,7 @@ class UserViewSet(viewsets.ModelViewSet):
             attempts_warning = record_failed_attempt(email)
             
             # Log failed login (AU-14)
-            LoginAttempt.objects.create(
+            record_login_attempt(
                 email=email,
                 user=None,
                 success=False,
@@ -236,6 +239,76 @@ class UserViewSet(viewsets.ModelViewSet):
             'count': faculty.count()
         })
 
+    @action(detail=False, methods=['post'], url_path='import-roster')
+    def import_roster(self, request):
+        """
+        Create many users in the admin's program from a roster (admins only)
+        
+        Body: multipart with a CSV `file` (header row: email, name, role,
+        cohort, department, start_date), or JSON {"users": [{...}, ...]}.
+        Options (query string or body): dry_run=true validates without writing;
+        create_cohorts=true creates cohorts the roster names that do not exist.
+        Nothing is imported if any row is invalid; the response lists a result
+        per row in roster order.
+        """
+        user = request.user
+        if not user.is_admin_user:
+            return Response(
+                {'error': 'Only admins can import rosters.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not user.program:
+            return Response(
+                {'error': 'User must be assigned to a program.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                rows = parse_roster_csv(upload.read())
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('users') if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'Provide a CSV file or a non-empty users list.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_ROSTER_SIZE:
+            return Response(
+                {'error': f'A roster can contain at most {MAX_ROSTER_SIZE} users.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        def option(name):
+            value = request.query_params.get(name, request.data.get(name, False))
+            return value is True or str(value).lower() in ('true', '1', 'yes')
+        
+        dry_run = option('dry_run')
+        results, cohorts_created = import_roster(
+            user, rows, dry_run=dry_run, create_cohorts=option('create_cohorts')
+        )
+        errors = sum(1 for result in results if result['status'] == 'error')
+        if not errors:
+            logger.info(f"Roster import by {user.email}: {len(results)} user(s){' (dry run)' if dry_run else ''}")
+        
+        if errors:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif dry_run:
+            response_status = status.HTTP_200_OK
+        else:
+            response_status = status.HTTP_201_CREATED
+        
+        return Response({
+            'dry_run': dry_run,
+            'created': 0 if errors or dry_run else len(results),
+            'errors': errors,
+            'cohorts_created': [] if errors else cohorts_created,
+            'results': results
+        }, status=response_status)
+
 class CohortViewSet(viewsets.ModelViewSet):
     queryset = Cohort.objects.all()
     serializer_class = CohortSerializer